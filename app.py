@@ -1,13 +1,30 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, send_file, send_from_directory, session, g, has_app_context, Response
 import sqlite3
 import os
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
 import json
-from werkzeug.utils import secure_filename
+import re
+import hashlib
+import mimetypes
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
+from contextlib import contextmanager
 import threading
 import time
+import queue
+import io
+import atexit
+from collections import OrderedDict
+
+from utils.thumbnails import generate_thumbnails, build_srcset
+from utils.image_store import store_image, CONTENT_ADDRESSED_NAME
+from utils.menu_keys import menu_key, category_key, migrate_menu_keys, migrate_categories, ensure_category
+from utils.menu_search import migrate_menu_search, search_menu_ids
+from utils.escpos import render_bill as render_bill_escpos, PAPER_WIDTHS
+from utils.print_spooler import PrintSpooler, check_printer_device, migrate_print_jobs
+from utils.log_writer import LogWriter
+from utils.log_archive import LogArchiver, read_archived_logs
+from update_menu_from_json import MenuFileReader, menu_format_for, sync_menu
 
 app = Flask(__name__)
 app.secret_key = 'restaurant_billing_secret_key_2024'
@@ -21,54 +38,149 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs('database', exist_ok=True)
 
-# Database connection lock for thread safety
-db_lock = threading.Lock()
+DATABASE_PATH = 'database/restaurant.db'
+# Monthly databases of log rows past the retention period (see utils/log_archive.py)
+LOG_ARCHIVE_DIR = os.path.join(os.path.dirname(DATABASE_PATH), 'log_archive')
 
-def get_db_connection():
-    """Get a database connection with proper error handling and timeout"""
-    max_retries = 3
-    retry_delay = 0.1
-    
-    for attempt in range(max_retries):
-        try:
-            with db_lock:
-                conn = sqlite3.connect('database/restaurant.db', timeout=10.0)
+
+class ConnectionPool:
+    """Pool of SQLite connections that are checked out by one thread at a time.
+
+    PRAGMAs are applied once when a connection is opened instead of on every
+    checkout. Idle connections are kept (up to ``max_idle``) and handed to the
+    next request, so a request only pays for opening a connection when the
+    pool is empty.
+    """
+
+    def __init__(self, database, max_idle=8, timeout=10.0):
+        self.database = database
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=max_idle)
+
+    def _open(self):
+        """Open a new connection with retry/backoff and apply PRAGMAs once"""
+        max_retries = 3
+        retry_delay = 0.1
+
+        for attempt in range(max_retries):
+            try:
+                # Connections move between request threads, but only one
+                # thread holds a connection at any time.
+                new_database = not os.path.exists(self.database) or os.path.getsize(self.database) == 0
+                conn = sqlite3.connect(self.database, timeout=self.timeout, check_same_thread=False)
+                if new_database:
+                    # New databases use incremental auto-vacuum so archived
+                    # logs give their space back. It has to be set before the
+                    # switch to WAL writes the file header. Existing databases
+                    # are converted by a VACUUM (--archive-logs); setting it on
+                    # them here would take a lock on every connection opened.
+                    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
                 # Enable WAL mode for better concurrency
                 conn.execute('PRAGMA journal_mode=WAL')
                 conn.execute('PRAGMA synchronous=NORMAL')
                 conn.execute('PRAGMA cache_size=1000')
                 conn.execute('PRAGMA temp_store=MEMORY')
                 return conn
-        except sqlite3.OperationalError as e:
-            if "database is locked" in str(e).lower() and attempt < max_retries - 1:
-                print(f"Database locked, retrying in {retry_delay}s... (attempt {attempt + 1}/{max_retries})")
-                time.sleep(retry_delay)
-                retry_delay *= 2  # Exponential backoff
-            else:
-                print(f"Database error: {e}")
+            except sqlite3.OperationalError as e:
+                if "database is locked" in str(e).lower() and attempt < max_retries - 1:
+                    print(f"Database locked, retrying in {retry_delay}s... (attempt {attempt + 1}/{max_retries})")
+                    time.sleep(retry_delay)
+                    retry_delay *= 2  # Exponential backoff
+                else:
+                    print(f"Database error: {e}")
+                    raise e
+            except Exception as e:
+                print(f"Unexpected database error: {e}")
                 raise e
-        except Exception as e:
-            print(f"Unexpected database error: {e}")
-            raise e
-    
-    raise sqlite3.OperationalError("Could not acquire database lock after multiple attempts")
+
+        raise sqlite3.OperationalError("Could not acquire database lock after multiple attempts")
+
+    def acquire(self):
+        """Check out an idle connection, opening a new one if none is free"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._open()
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+
+db_pool = ConnectionPool(DATABASE_PATH)
+
+# Connections owned by threads that run outside a Flask app context
+# (startup code, background workers). Each such thread keeps its own.
+_thread_db = threading.local()
+
+def get_db_connection():
+    """Get the database connection for the current request or thread.
+
+    Inside a Flask app context the connection is checked out of the pool on
+    first use and returned by ``release_db_connection`` at teardown. Callers
+    must not close it.
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = db_pool.acquire()
+        return g.db
+
+    conn = getattr(_thread_db, 'conn', None)
+    if conn is None:
+        conn = db_pool.acquire()
+        _thread_db.conn = conn
+    return conn
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Return the request's connection to the pool"""
+    conn = g.pop('db', None)
+    if conn is not None:
+        db_pool.release(conn)
 
 def safe_db_operation(operation_func, *args, **kwargs):
-    """Safely execute database operations with proper connection management"""
-    conn = None
+    """Run operation_func(conn, ...) in a transaction on the pooled connection"""
+    conn = get_db_connection()
     try:
-        conn = get_db_connection()
         result = operation_func(conn, *args, **kwargs)
         conn.commit()
         return result
     except Exception as e:
-        if conn:
-            conn.rollback()
+        conn.rollback()
         print(f"Database operation failed: {e}")
         raise e
-    finally:
-        if conn:
-            conn.close()
+
+@contextmanager
+def immediate_transaction(conn):
+    """Run a block inside BEGIN IMMEDIATE on conn, committing on success.
+
+    The write lock is taken up front, so concurrent writers queue on the
+    busy timeout instead of failing when they upgrade a read lock.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn.cursor()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
 
 def check_and_fix_database():
     """Check and fix database lock issues"""
@@ -85,7 +197,6 @@ def check_and_fix_database():
         cursor.execute('PRAGMA database_list')
         databases = cursor.fetchall()
         
-        conn.close()
         print("Database is accessible and not locked")
         return True
         
@@ -94,7 +205,7 @@ def check_and_fix_database():
             print("Database is locked, attempting to fix...")
             try:
                 # Try to force unlock by creating a new connection with immediate mode
-                conn = sqlite3.connect('database/restaurant.db', timeout=1.0)
+                conn = sqlite3.connect(DATABASE_PATH, timeout=1.0)
                 conn.execute('PRAGMA journal_mode=DELETE')  # Switch to DELETE mode to release locks
                 conn.execute('PRAGMA journal_mode=WAL')     # Switch back to WAL mode
                 conn.close()
@@ -110,6 +221,105 @@ def check_and_fix_database():
         print(f"Unexpected database error: {e}")
         return False
 
+class EventHub:
+    """In-process publish/subscribe hub behind the /api/events SSE stream.
+
+    Each subscriber gets a bounded queue. A client that falls
+    ``max_queue`` events behind is dropped rather than buffered; its
+    EventSource reconnects and reloads current state.
+    """
+
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def is_subscribed(self, q):
+        with self._lock:
+            return q in self._subscribers
+
+    def publish(self, event, data=None):
+        """Send an event to every subscriber without blocking the caller"""
+        message = (event, json.dumps(data or {}))
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            try:
+                q.put_nowait(message)
+            except queue.Full:
+                print(f"Dropping slow event subscriber ({self.max_queue} events behind)")
+                self.unsubscribe(q)
+
+
+event_hub = EventHub()
+
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+_asset_manifest = {'mtime': None, 'files': {}, 'hashed': frozenset()}
+
+def get_asset_manifest():
+    """Load static/build/manifest.json (written by build_assets.py), reloading when it changes"""
+    path = os.path.join(app.static_folder, 'build', 'manifest.json')
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+    if mtime != _asset_manifest['mtime']:
+        files = {}
+        if mtime is not None:
+            try:
+                with open(path) as f:
+                    files = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading asset manifest: {e}")
+        _asset_manifest.update(mtime=mtime, files=files, hashed=frozenset(files.values()))
+    return _asset_manifest
+
+@app.template_global()
+def asset_url(filename):
+    """url_for('static') that resolves to the content-hashed build of an asset when one exists"""
+    return url_for('static', filename=get_asset_manifest()['files'].get(filename, filename))
+
+def is_content_addressed_image(filename):
+    """True for images/<hash>.<ext> and their thumbnails (see utils/image_store.py)"""
+    directory, _, name = filename.rpartition('/')
+    return directory in ('images', 'images/thumbs') and bool(CONTENT_ADDRESSED_NAME.match(name))
+
+def serve_static(filename):
+    """Static handler that serves hashed assets precompressed and cached as immutable"""
+    if is_content_addressed_image(filename):
+        response = app.send_static_file(filename)
+        response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+        return response
+    if filename not in get_asset_manifest()['hashed']:
+        return app.send_static_file(filename)
+    
+    mimetype = mimetypes.guess_type(filename)[0]
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, mimetype=mimetype)
+    
+    # The name changes whenever the content does, so it never needs revalidating
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+app.view_functions['static'] = serve_static
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -140,9 +350,9 @@ def user_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def init_db():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect('database/restaurant.db')
+def init_db(start_workers=True):
+    """Initialize the database with required tables (and start the background workers)"""
+    conn = get_db_connection()
     cursor = conn.cursor()
     
     # Menu items table
@@ -154,8 +364,11 @@ def init_db():
             category TEXT NOT NULL,
             price REAL NOT NULL,
             image TEXT,
+            image_variants TEXT,
             description TEXT,
             description_te TEXT,
+            name_key TEXT,
+            category_key TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
     ''')
@@ -170,6 +383,23 @@ def init_db():
         cursor.execute('ALTER TABLE menu ADD COLUMN description_te TEXT')
     except sqlite3.OperationalError:
         pass  # Column already exists
+    
+    # JSON list of generated thumbnails: [{file, format, width, height}, ...]
+    try:
+        cursor.execute('ALTER TABLE menu ADD COLUMN image_variants TEXT')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    
+    # Normalized name/category keys with a UNIQUE index; merges existing duplicates once
+    merged = migrate_menu_keys(cursor)
+    if merged:
+        print(f"Merged {merged} duplicate menu items")
+    
+    # Categories with their own display order; menu.category_id references them
+    migrate_categories(cursor)
+    
+    # FTS5 index over item names/descriptions (English + Telugu) for /api/search
+    migrate_menu_search(cursor)
 
     # Sequences to support daily sequence numbers for bills
     cursor.execute('''
@@ -197,7 +427,79 @@ def init_db():
             tax_amount REAL NOT NULL,
             service_charge REAL NOT NULL,
             total REAL NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            client_id TEXT,
+            sale_day TEXT
+        )
+    ''')
+    
+    # Idempotency key sent by the billing page (see commit_bill)
+    try:
+        cursor.execute('ALTER TABLE bills ADD COLUMN client_id TEXT')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    
+    # Local day of the sale ('YYYY-MM-DD'), the date in the bill number.
+    # created_at is UTC; the sales rollups and "today" use sale_day, so a
+    # bill made just after local midnight counts toward the day it is
+    # numbered for. Older rows take their bill_sequence date.
+    try:
+        cursor.execute('ALTER TABLE bills ADD COLUMN sale_day TEXT')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_sale_day ON bills(sale_day)')
+    cursor.execute('''
+        UPDATE bills SET sale_day = COALESCE(
+            (SELECT seq_date FROM bill_sequence s WHERE s.bill_number = bills.bill_number),
+            date(created_at, 'localtime')
+        )
+        WHERE sale_day IS NULL
+    ''')
+    backfilled_sale_days = cursor.rowcount > 0
+    
+    # Normalized bill line items (one row per item on a bill) for analytics
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bill_lines (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bill_id INTEGER NOT NULL REFERENCES bills(id),
+            menu_id INTEGER,
+            name TEXT NOT NULL,
+            unit_price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            line_total REAL NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bill_lines_bill_id ON bill_lines(bill_id)')
+    
+    # Per-day sales rollups, maintained by commit_bill and delete_bill so
+    # report totals do not need to scan the bills table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            day TEXT PRIMARY KEY,
+            bill_count INTEGER NOT NULL DEFAULT 0,
+            subtotal REAL NOT NULL DEFAULT 0,
+            tax REAL NOT NULL DEFAULT 0,
+            service REAL NOT NULL DEFAULT 0,
+            total REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Item rollups are keyed on the menu item (see item_rollup_key), so a
+    # renamed item keeps one history; tables keyed on the name are rebuilt
+    cursor.execute("SELECT name FROM pragma_table_info('daily_item_sales')")
+    item_columns = {row[0] for row in cursor.fetchall()}
+    rekey_item_sales = bool(item_columns) and 'item_key' not in item_columns
+    if rekey_item_sales:
+        cursor.execute('DROP TABLE daily_item_sales')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_item_sales (
+            day TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            menu_id INTEGER,
+            name TEXT NOT NULL,
+            qty INTEGER NOT NULL DEFAULT 0,
+            amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, item_key)
         )
     ''')
     
@@ -211,6 +513,15 @@ def init_db():
         )
     ''')
     
+    # Version counters for in-process caches (bumped on every write so
+    # other worker processes can tell their cached copy is stale)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
     # User login logs table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_login_logs (
@@ -249,6 +560,17 @@ def init_db():
         )
     ''')
     
+    # Indexes for date-range report queries and log lookups. Date filters
+    # compare created_at against half-open ranges (see date_bounds) so
+    # these indexes can be used. daily_sequence.seq_date is its PRIMARY
+    # KEY and is already indexed.
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bills_created_at ON bills(created_at)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_bills_client_id ON bills(client_id)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_activity_logs_created_at ON user_activity_logs(created_at)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_login_logs_user_open ON user_login_logs(username, logout_time, login_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_user_login_logs_login_time ON user_login_logs(login_time)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_bill_sequence_seq_date ON bill_sequence(seq_date, seq_number)')
+    
     # Insert default settings if not exists
     default_settings = [
         ('tax_rate', '10.0'),
@@ -256,7 +578,12 @@ def init_db():
         ('restaurant_name', 'My Restaurant'),
         ('restaurant_address', '123 Main Street, City'),
         ('restaurant_phone', '+1-234-567-8900'),
-        ('restaurant_gst', '')
+        ('restaurant_gst', ''),
+        # Empty printer_device keeps printing in the browser
+        ('printer_device', ''),
+        ('printer_paper', '58'),
+        # Days of login/activity logs kept in the main database; 0 keeps them all
+        ('log_retention_days', '90')
     ]
     
     for key, value in default_settings:
@@ -276,54 +603,573 @@ def init_db():
             cursor.execute('INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)', 
                          (username, password_hash, role))
     
+    # One-shot migration of JSON line items into bill_lines
+    backfilled = backfill_bill_lines(cursor)
+    if backfilled:
+        print(f"Backfilled line items for {backfilled} bills")
+    
+    # Build the sales rollups the first time they are introduced
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM daily_sales), EXISTS (SELECT 1 FROM bills)')
+    has_rollups, has_bills = cursor.fetchone()
+    if has_bills and (rekey_item_sales or backfilled_sale_days or not has_rollups):
+        rebuild_sales_rollups(cursor)
+        print("Built daily sales rollups")
+    
+    # Queue for the thermal-printer spooler
+    migrate_print_jobs(cursor)
+    
     conn.commit()
-    conn.close()
+    
+    if start_workers:
+        # Finish copies that were still queued when the app last stopped
+        print_spooler.resume(conn)
+        log_archiver.start()
 
-def get_setting(key, default=None):
-    """Get a setting value from database"""
-    def _get_setting(conn):
-        cursor = conn.cursor()
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        result = cursor.fetchone()
-        return result[0] if result else default
+def parse_bill_items(raw_items):
+    """Parse a bills.items JSON blob into a list, tolerating bad data"""
+    try:
+        items = json.loads(raw_items) if isinstance(raw_items, str) else raw_items
+    except (json.JSONDecodeError, TypeError):
+        return []
+    return items if isinstance(items, list) else []
+
+def bill_line_rows(bill_id, items):
+    """Build bill_lines rows for a bill's items"""
+    rows = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        price = item.get('price') or 0
+        quantity = item.get('quantity') or 0
+        menu_id = item.get('id')
+        rows.append((
+            bill_id,
+            menu_id if isinstance(menu_id, int) else None,
+            item.get('name') or 'Unknown',
+            price,
+            quantity,
+            price * quantity
+        ))
+    return rows
+
+def backfill_bill_lines(cursor):
+    """Create bill_lines rows for bills that only have the JSON items blob"""
+    cursor.execute('''
+        SELECT id, items FROM bills
+        WHERE NOT EXISTS (SELECT 1 FROM bill_lines WHERE bill_lines.bill_id = bills.id)
+    ''')
+    bills = cursor.fetchall()
+    
+    rows = []
+    for bill_id, raw_items in bills:
+        rows.extend(bill_line_rows(bill_id, parse_bill_items(raw_items)))
+    
+    cursor.executemany('''
+        INSERT INTO bill_lines (bill_id, menu_id, name, unit_price, quantity, line_total)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return len(bills)
+
+# SQL for item_rollup_key over bill_lines columns
+ITEM_KEY_SQL = "COALESCE('id:' || l.menu_id, 'name:' || l.name)"
+
+def item_rollup_key(menu_id, name):
+    """daily_item_sales key: the menu item's id, or its name for lines without one"""
+    return f'id:{menu_id}' if menu_id is not None else f'name:{name}'
+
+def update_sales_rollups(cursor, day, subtotal, tax_amount, service_charge, total, line_rows, sign=1):
+    """Add (sign=1) or remove (sign=-1) one bill from the daily rollups.
+
+    line_rows are bill_lines tuples (bill_id, menu_id, name, unit_price,
+    quantity, line_total). Must run inside the bill's own transaction.
+    """
+    cursor.execute('''
+        INSERT INTO daily_sales (day, bill_count, subtotal, tax, service, total)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day) DO UPDATE SET
+            bill_count = bill_count + excluded.bill_count,
+            subtotal = subtotal + excluded.subtotal,
+            tax = tax + excluded.tax,
+            service = service + excluded.service,
+            total = total + excluded.total
+    ''', (day, sign, sign * subtotal, sign * tax_amount, sign * service_charge, sign * total))
+    
+    cursor.executemany('''
+        INSERT INTO daily_item_sales (day, item_key, menu_id, name, qty, amount)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, item_key) DO UPDATE SET
+            qty = qty + excluded.qty,
+            amount = amount + excluded.amount
+    ''', [(day, item_rollup_key(menu_id, name), menu_id, name, sign * quantity, sign * line_total)
+          for _, menu_id, name, _, quantity, line_total in line_rows])
     
+    if sign < 0:
+        cursor.execute('DELETE FROM daily_sales WHERE day = ? AND bill_count <= 0', (day,))
+        cursor.execute('DELETE FROM daily_item_sales WHERE day = ? AND qty <= 0', (day,))
+
+def rebuild_sales_rollups(cursor):
+    """Recompute daily_sales and daily_item_sales from bills and bill_lines"""
+    cursor.execute('DELETE FROM daily_sales')
+    cursor.execute('''
+        INSERT INTO daily_sales (day, bill_count, subtotal, tax, service, total)
+        SELECT sale_day, COUNT(*), SUM(subtotal), SUM(tax_amount),
+               SUM(service_charge), SUM(total)
+        FROM bills
+        GROUP BY sale_day
+    ''')
+    cursor.execute('DELETE FROM daily_item_sales')
+    cursor.execute(f'''
+        INSERT INTO daily_item_sales (day, item_key, menu_id, name, qty, amount)
+        SELECT b.sale_day, {ITEM_KEY_SQL}, l.menu_id, MAX(l.name), SUM(l.quantity), SUM(l.line_total)
+        FROM bill_lines l JOIN bills b ON b.id = l.bill_id
+        GROUP BY b.sale_day, {ITEM_KEY_SQL}
+    ''')
+
+def sales_summary(cursor, start=None, end=None):
+    """(bill_count, total) for a half-open [start, end) day range from daily_sales"""
+    where, params = created_at_filter(start, end, column='day')
+    cursor.execute(f'SELECT COALESCE(SUM(bill_count), 0), COALESCE(SUM(total), 0) FROM daily_sales {where}', params)
+    return cursor.fetchone()
+
+def today_sale_day():
+    """Today's sale day: the local date used by bill numbers, bills.sale_day and the rollups"""
+    return datetime.now().strftime('%Y-%m-%d')
+
+
+class LiveSalesCounter:
+    """Today's bill count and revenue, kept in memory.
+
+    The bill-commit and delete paths commit their transaction through
+    ``commit()``, which counts the bills under the same lock, so dashboard
+    polls do not touch the bills table. After a restart, on a new day, or
+    every ``resync_interval`` seconds (to pick up bills written by other
+    processes) it is reloaded from the daily_sales rollup, also under that
+    lock: a resync reads either before a commit (which is then counted)
+    or after it (which then already includes it), never in between.
+    """
+
+    def __init__(self, resync_interval=60.0):
+        self.resync_interval = resync_interval
+        self._lock = threading.Lock()
+        self._day = None
+        self._bill_count = 0
+        self._revenue = 0.0
+        self._synced_at = 0.0
+
+    def _resync(self, day):
+        cursor = get_db_connection().cursor()
+        cursor.execute('SELECT bill_count, total FROM daily_sales WHERE day = ?', (day,))
+        self._bill_count, self._revenue = cursor.fetchone() or (0, 0.0)
+        self._day = day
+        self._synced_at = time.monotonic()
+
+    def snapshot(self):
+        """Return (day, bill_count, revenue) for today"""
+        day = today_sale_day()
+        with self._lock:
+            if self._day != day or time.monotonic() - self._synced_at >= self.resync_interval:
+                self._resync(day)
+            return self._day, self._bill_count, self._revenue
+
+    def commit(self, conn, bills, sign=1):
+        """Commit conn's transaction and add (sign=1) or remove (sign=-1) its (sale_day, total) bills"""
+        with self._lock:
+            conn.commit()
+            for day, total in bills:
+                if self._day == day:
+                    self._bill_count += sign
+                    self._revenue += sign * total
+
+
+live_sales = LiveSalesCounter()
+
+def date_bounds(from_date=None, to_date=None):
+    """Half-open [start, end) sale-day bounds covering whole days.
+
+    Dates are 'YYYY-MM-DD' strings (either may be empty). Comparing the raw
+    day column against these bounds lets SQLite use the index, unlike
+    wrapping the column in DATE() or strftime(). Use created_at_bounds()
+    to filter the UTC created_at column.
+    """
+    start = datetime.strptime(from_date, '%Y-%m-%d').strftime('%Y-%m-%d') if from_date else None
+    end = None
+    if to_date:
+        end = (datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+    return start, end
+
+def month_bounds(month):
+    """Half-open [start, end) sale-day bounds for a 'YYYY-MM' month"""
+    first = datetime.strptime(month, '%Y-%m')
+    next_month = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return first.strftime('%Y-%m-%d'), next_month.strftime('%Y-%m-%d')
+
+def created_at_bounds(start, end):
+    """UTC created_at bounds for half-open [start, end) local sale-day bounds"""
+    def local_midnight(day):
+        # A naive datetime is taken as local time by astimezone()
+        return datetime.strptime(day, '%Y-%m-%d').astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    return (local_midnight(start) if start else None), (local_midnight(end) if end else None)
+
+def created_at_filter(start, end, column='created_at'):
+    """SQL WHERE fragment and params for a half-open created_at range"""
+    conditions = []
+    params = []
+    if start:
+        conditions.append(f'{column} >= ?')
+        params.append(start)
+    if end:
+        conditions.append(f'{column} < ?')
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    return where, params
+
+def get_cache_version(conn, name):
+    """Get the current version counter for a named cache"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT version FROM cache_versions WHERE name = ?', (name,))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def bump_cache_version(conn, name):
+    """Increment a named cache version; call inside the writing transaction"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO cache_versions (name, version) VALUES (?, 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''', (name,))
+
+
+class SettingsCache:
+    """In-memory copy of the settings table.
+
+    The whole table is loaded with one query and reads are served from
+    memory. Writes in this process invalidate it immediately; writes from
+    other processes are picked up by re-checking the ``settings`` version
+    counter at most once every ``check_interval`` seconds.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load(self, conn):
+        cursor = conn.cursor()
+        cursor.execute('SELECT key, value FROM settings')
+        self._values = dict(cursor.fetchall())
+        self._version = get_cache_version(conn, 'settings')
+        self._checked_at = time.monotonic()
+
+    def _snapshot(self):
+        """Return (values, version), reloading if missing or stale"""
+        values, version = self._values, self._version
+        if values is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return values, version
+        with self._lock:
+            conn = get_db_connection()
+            if self._values is None:
+                self._load(conn)
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                if get_cache_version(conn, 'settings') != self._version:
+                    self._load(conn)
+                else:
+                    self._checked_at = time.monotonic()
+            return self._values, self._version
+
+    def get(self, key, default=None):
+        return self._snapshot()[0].get(key, default)
+
+    def get_all(self):
+        return dict(self._snapshot()[0])
+
+    @property
+    def version(self):
+        return self._snapshot()[1]
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+            self._version = None
+
+
+settings_cache = SettingsCache()
+
+def menu_image_fields(image_variants):
+    """Catalogue fields describing an item's thumbnails (srcset per format, intrinsic size)"""
     try:
-        return safe_db_operation(_get_setting)
+        variants = json.loads(image_variants) if image_variants else []
+    except ValueError:
+        variants = []
+    if not variants:
+        return {'srcset': None, 'image_width': None, 'image_height': None}
+    largest = max(variants, key=lambda v: v['width'])
+    return {
+        'srcset': build_srcset(variants, '/static/images/'),
+        'image_width': largest['width'],
+        'image_height': largest['height']
+    }
+
+def save_menu_image(file):
+    """Save an uploaded menu photo and its thumbnails; return (filename, image_variants JSON)"""
+    # Stored under a hash of the bytes, so re-uploading the same photo reuses the file
+    extension = file.filename.rsplit('.', 1)[1].lower()
+    filename = store_image(app.config['UPLOAD_FOLDER'], file.read(), extension)
+    variants = generate_thumbnails(app.config['UPLOAD_FOLDER'], filename)
+    return filename, (json.dumps(variants) if variants else None)
+
+# Body and ETag served for a category that has no items
+EMPTY_CATALOG = (b'[]', hashlib.sha1(b'[]').hexdigest())
+
+
+class MenuCatalogCache:
+    """Serialized menu catalogue served from memory with a strong ETag.
+
+    The JSON bodies for the full menu and for each category, and the
+    ordered category list used by the server-rendered pages, are built
+    from one query once per ``menu`` cache version. Menu writes in this process
+    invalidate it immediately; writes from other processes (e.g.
+    ``update_menu_from_json.py``) are picked up by re-checking the
+    version counter at most once every ``check_interval`` seconds.
+
+    The loaded catalogue is one ``(items, categories, entries, version)``
+    tuple in ``_state``, replaced or cleared as a whole, so lock-free
+    readers never see parts of two different loads.
+    """
+
+    def __init__(self, check_interval=1.0):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._state = None
+        self._checked_at = 0.0
+
+    def _load(self, conn):
+        cursor = conn.cursor()
+        # Items come back grouped by category in billing-screen order
+        cursor.execute('''
+            SELECT m.id, m.name, COALESCE(c.name, m.category), m.price, m.image, m.description, m.image_variants
+            FROM menu m
+            LEFT JOIN categories c ON c.id = m.category_id
+            ORDER BY COALESCE(c.sort_order, 0), COALESCE(c.name, m.category), m.name
+        ''')
+        items = [{
+            'id': item[0],
+            'name': item[1],
+            'category': item[2],
+            'price': item[3],
+            'image': item[4],
+            'description': item[5],
+            **menu_image_fields(item[6])
+        } for item in cursor.fetchall()]
+        categories = list(dict.fromkeys(item['category'] for item in items))
+        self._state = (items, categories, {}, get_cache_version(conn, 'menu'))
+        self._checked_at = time.monotonic()
+
+    def _snapshot(self):
+        """Return (items, categories, entries), reloading if missing or stale"""
+        state = self._state
+        if state is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return state[:3]
+        with self._lock:
+            conn = get_db_connection()
+            if self._state is None:
+                self._load(conn)
+            elif time.monotonic() - self._checked_at >= self.check_interval:
+                if get_cache_version(conn, 'menu') != self._state[3]:
+                    self._load(conn)
+                else:
+                    self._checked_at = time.monotonic()
+            return self._state[:3]
+
+    def get(self, category=None):
+        """Return (body, etag) for the whole menu or a single category.
+
+        Only categories in the catalogue are cached; the category comes
+        from the URL, so any other name gets the empty list uncached and
+        can't grow the cache.
+        """
+        items, categories, entries = self._snapshot()
+        entry = entries.get(category)
+        if entry is None and category is not None and category not in categories:
+            return EMPTY_CATALOG
+        if entry is None:
+            if category is not None:
+                # Same order the per-category query used to return
+                items = sorted((item for item in items if item['category'] == category),
+                               key=lambda item: item['name'])
+            body = json.dumps(items, ensure_ascii=False).encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()
+            entry = entries[category] = (body, etag)
+        return entry
+
+    def lookup(self, ids):
+        """Catalogue entries for ids, in the given order (unknown ids are skipped)"""
+        items, _, _ = self._snapshot()
+        by_id = {item['id']: item for item in items}
+        return [by_id[item_id] for item_id in ids if item_id in by_id]
+
+    def page_data(self):
+        """Return (categories, items) for server-rendered menu pages"""
+        items, categories, _ = self._snapshot()
+        return categories, items
+
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+
+menu_cache = MenuCatalogCache()
+
+def menu_catalog_response(category=None):
+    """Serve a cached catalogue body, or 304 if the client's copy is current"""
+    body, etag = menu_cache.get(category)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # Let browsers keep the copy but revalidate it on every load
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+class BillPrintCache:
+    """Rendered bill_print.html pages in a bounded LRU.
+
+    Keyed on ``(bill_number, copy_type, settings_version)``. A bill never
+    changes once written, and a settings change bumps the version, so
+    stale pages are simply never looked up again and age out. Deleting
+    a bill evicts its pages.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def evict_bill(self, bill_number):
+        with self._lock:
+            for key in [key for key in self._pages if key[0] == bill_number]:
+                del self._pages[key]
+
+
+bill_print_cache = BillPrintCache()
+
+# Copy types bill_print.html knows; the billing page prints the last two
+BILL_COPY_TYPES = ('student', 'customer', 'kitchen')
+PRINTED_COPY_TYPES = ('customer', 'kitchen')
+
+def bill_print_settings():
+    """Restaurant details printed on the bill"""
+    return {
+        'restaurant_name': get_setting('restaurant_name', 'My Restaurant'),
+        'restaurant_address': get_setting('restaurant_address', '123 Main Street, City'),
+        'restaurant_phone': get_setting('restaurant_phone', '+1-234-567-8900'),
+        'restaurant_gst': get_setting('restaurant_gst', '')
+    }
+
+def render_bill_prints(bill_data, copy_types=PRINTED_COPY_TYPES):
+    """Render and cache bill_print.html for each copy type; returns {copy_type: html}"""
+    version = settings_cache.version
+    settings_data = bill_print_settings()
+    pages = {}
+    for copy_type in copy_types:
+        pages[copy_type] = render_template('bill_print.html', bill=bill_data, settings=settings_data,
+                                           copy_type=copy_type)
+        bill_print_cache.put((bill_data['bill_number'], copy_type, version), pages[copy_type])
+    return pages
+
+def configured_printer():
+    """The thermal printer bills are spooled to, or '' to print through the browser"""
+    return (get_setting('printer_device', '') or '').strip()
+
+print_spooler = PrintSpooler(get_db_connection, configured_printer)
+
+def spool_bill_prints(*bills):
+    """Queue the printed copies of bills as ESC/POS jobs; False if no printer is configured"""
+    if not configured_printer():
+        return False
+    width = PAPER_WIDTHS.get(get_setting('printer_paper', '58'), PAPER_WIDTHS['58'])
+    settings_data = bill_print_settings()
+    print_spooler.enqueue(get_db_connection(), [
+        (bill_data['bill_number'], copy_type, render_bill_escpos(bill_data, settings_data, copy_type, width))
+        for bill_data in bills for copy_type in PRINTED_COPY_TYPES
+    ])
+    return True
+
+def get_setting(key, default=None):
+    """Get a setting value (served from the in-memory settings cache)"""
+    try:
+        return settings_cache.get(key, default)
     except Exception as e:
         print(f"Error getting setting {key}: {e}")
         return default
 
-def set_setting(key, value):
-    """Set a setting value in database"""
-    def _set_setting(conn):
+def set_settings(values):
+    """Write several settings in one transaction and invalidate the cache"""
+    def _set_settings(conn):
         cursor = conn.cursor()
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)', (key, value))
+        cursor.executemany(
+            'INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)',
+            list(values.items())
+        )
+        bump_cache_version(conn, 'settings')
         return True
     
     try:
-        return safe_db_operation(_set_setting)
+        return safe_db_operation(_set_settings)
     except Exception as e:
-        print(f"Error setting {key}: {e}")
+        print(f"Error setting {', '.join(values.keys())}: {e}")
         return False
+    finally:
+        settings_cache.invalidate()
+
+def set_setting(key, value):
+    """Set a setting value in database"""
+    return set_settings({key: value})
+
+# Login and activity rows are written in batches by a background thread,
+# off the request path; queued rows are written on exit
+log_writer = LogWriter(get_db_connection, db_pool)
+atexit.register(log_writer.stop)
+
+def log_retention_days():
+    """Configured log retention in days; 0 (or an invalid value) keeps every row"""
+    try:
+        return max(int(get_setting('log_retention_days', '90')), 0)
+    except ValueError:
+        return 0
+
+log_archiver = LogArchiver(get_db_connection, LOG_ARCHIVE_DIR, log_retention_days)
 
 def log_user_login(username, role, ip_address=None, user_agent=None):
     """Log user login"""
-    def _log_login(conn):
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO user_login_logs (username, role, ip_address, user_agent)
-            VALUES (?, ?, ?, ?)
-        ''', (username, role, ip_address, user_agent))
-        return True
-    
     try:
-        return safe_db_operation(_log_login)
+        log_writer.write('user_login_logs', (username, role, ip_address, user_agent))
+        return True
     except Exception as e:
         print(f"Error logging user login: {e}")
         return False
 
 def log_user_logout(username):
     """Log user logout and calculate session duration"""
+    log_writer.flush()  # The login row may still be queued
+    
     def _log_logout(conn):
         cursor = conn.cursor()
         
@@ -356,16 +1202,9 @@ def log_user_logout(username):
 
 def log_user_activity(username, activity_type, description, bill_number=None):
     """Log user activity"""
-    def _log_activity(conn):
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO user_activity_logs (username, activity_type, activity_description, bill_number)
-            VALUES (?, ?, ?, ?)
-        ''', (username, activity_type, description, bill_number))
-        return True
-    
     try:
-        return safe_db_operation(_log_activity)
+        log_writer.write('user_activity_logs', (username, activity_type, description, bill_number))
+        return True
     except Exception as e:
         print(f"Error logging user activity: {e}")
         return False
@@ -419,6 +1258,230 @@ def change_user_password(username, old_password, new_password):
         print(f"Error changing password: {e}")
         return False
 
+def get_bill_prefix(hour):
+    """Bill number prefix for the time of day.
+
+    A: 00:00 - 12:59 (till 1 PM)
+    F: 13:00 - 17:59 (1 PM to 6 PM)
+    E: 18:00 - 23:59 (after 6 PM)
+    """
+    if hour < 13:
+        return "A"
+    elif hour < 18:
+        return "F"
+    return "E"
+
+def find_bills_by_client_ids(cursor, client_ids):
+    """Bills already saved under these idempotency keys, as {client_id: bill}.
+
+    Each bill is shaped like commit_bill's result, with duplicate=True.
+    """
+    cursor.execute('''
+        SELECT b.client_id, b.id, b.bill_number, b.created_at, s.seq_number, b.subtotal,
+               b.tax_amount, b.service_charge, b.total
+        FROM bills b
+        LEFT JOIN bill_sequence s ON s.bill_number = b.bill_number
+        WHERE b.client_id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(client_ids)),))
+    return {row[0]: dict(zip(('id', 'bill_number', 'created_at', 'seq_number', 'subtotal', 'tax_amount',
+                              'service_charge', 'total'), row[1:]), duplicate=True)
+            for row in cursor.fetchall()}
+
+def bill_totals(items, tax_rate, service_charge_rate):
+    """(subtotal, tax_amount, service_charge, total) for a bill's items"""
+    subtotal = sum(item['price'] * item['quantity'] for item in items)
+    tax_amount = (subtotal * tax_rate) / 100
+    service_charge = (subtotal * service_charge_rate) / 100
+    return subtotal, tax_amount, service_charge, subtotal + tax_amount + service_charge
+
+def commit_bill(conn, items, tax_rate, service_charge_rate, username=None, client_id=None):
+    """Allocate the daily sequence and write a bill in one immediate transaction.
+
+    The sequence number, the bill row, its bill_sequence mapping and the
+    activity-log row are all written atomically, so concurrent terminals
+    never share a sequence number.
+
+    ``client_id`` is the billing page's idempotency key: if a bill was
+    already saved under it (a retried or replayed submission), that bill
+    is returned with ``duplicate=True`` and nothing is written.
+    """
+    subtotal, tax_amount, service_charge, total = bill_totals(items, tax_rate, service_charge_rate)
+    
+    now = datetime.now()
+    prefix = get_bill_prefix(now.hour)
+    date_str = now.strftime('%d-%m-%Y')
+    today_str = now.strftime('%Y-%m-%d')
+    
+    with immediate_transaction(conn) as cursor:
+        # Writers are serialized from here on, so check-then-insert is safe
+        if client_id:
+            existing = find_bills_by_client_ids(cursor, [client_id]).get(client_id)
+            if existing:
+                return existing
+        
+        cursor.execute('''
+            INSERT INTO daily_sequence (seq_date, last_seq) VALUES (?, 1)
+            ON CONFLICT(seq_date) DO UPDATE SET last_seq = last_seq + 1
+            RETURNING last_seq
+        ''', (today_str,))
+        next_seq = cursor.fetchone()[0]
+        
+        # Create bill number in format: A/F/E + DD-MM-YYYY + / + sequence
+        # Examples: A15-12-2024/001, F15-12-2024/002, E15-12-2024/003
+        bill_number = f"{prefix}{date_str}/{next_seq:03d}"
+        
+        cursor.execute('''
+            INSERT INTO bills (bill_number, items, subtotal, tax_amount, service_charge, total, client_id, sale_day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            RETURNING id, created_at
+        ''', (bill_number, json.dumps(items), subtotal, tax_amount, service_charge, total, client_id, today_str))
+        bill_id, created_at = cursor.fetchone()
+        
+        line_rows = bill_line_rows(bill_id, items)
+        cursor.executemany('''
+            INSERT INTO bill_lines (bill_id, menu_id, name, unit_price, quantity, line_total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', line_rows)
+        
+        update_sales_rollups(cursor, today_str, subtotal, tax_amount, service_charge, total, line_rows)
+        
+        # Save bill's daily sequence mapping
+        cursor.execute('INSERT OR REPLACE INTO bill_sequence (bill_number, seq_date, seq_number) VALUES (?, ?, ?)',
+                       (bill_number, today_str, next_seq))
+        
+        if username:
+            cursor.execute('''
+                INSERT INTO user_activity_logs (username, activity_type, activity_description, bill_number)
+                VALUES (?, ?, ?, ?)
+            ''', (username, 'bill_generated',
+                  f'Generated bill {bill_number} with {len(items)} items, total: ₹{total:.2f}',
+                  bill_number))
+        
+        live_sales.commit(conn, [(today_str, total)])
+    
+    return {
+        'id': bill_id,
+        'bill_number': bill_number,
+        'created_at': created_at,
+        'seq_number': next_seq,
+        'subtotal': subtotal,
+        'tax_amount': tax_amount,
+        'service_charge': service_charge,
+        'total': total
+    }
+
+def add_bills_to_rollups(cursor, bill_ids):
+    """Add a set of just-written bills to the daily rollups with one statement per table"""
+    ids = json.dumps(list(bill_ids))
+    cursor.execute('''
+        INSERT INTO daily_sales (day, bill_count, subtotal, tax, service, total)
+        SELECT sale_day, COUNT(*), SUM(subtotal), SUM(tax_amount),
+               SUM(service_charge), SUM(total)
+        FROM bills
+        WHERE id IN (SELECT value FROM json_each(?))
+        GROUP BY sale_day
+        ON CONFLICT(day) DO UPDATE SET
+            bill_count = bill_count + excluded.bill_count,
+            subtotal = subtotal + excluded.subtotal,
+            tax = tax + excluded.tax,
+            service = service + excluded.service,
+            total = total + excluded.total
+    ''', (ids,))
+    cursor.execute(f'''
+        INSERT INTO daily_item_sales (day, item_key, menu_id, name, qty, amount)
+        SELECT b.sale_day, {ITEM_KEY_SQL}, l.menu_id, MAX(l.name), SUM(l.quantity), SUM(l.line_total)
+        FROM bill_lines l JOIN bills b ON b.id = l.bill_id
+        WHERE l.bill_id IN (SELECT value FROM json_each(?))
+        GROUP BY b.sale_day, {ITEM_KEY_SQL}
+        ON CONFLICT(day, item_key) DO UPDATE SET
+            qty = qty + excluded.qty,
+            amount = amount + excluded.amount
+    ''', (ids,))
+
+def commit_bills(conn, bills, tax_rate, service_charge_rate, username=None):
+    """Write a batch of bills in one immediate transaction.
+
+    ``bills`` are dicts with ``client_id``, ``items`` and ``created_at``
+    (an aware datetime, the client's time of sale). Keys that are already
+    saved, or repeated within the batch, are returned as duplicates.
+    Sequence numbers are allocated with one statement per day, in order of
+    sale; rows are written with ``executemany`` and the rollups updated
+    once. Returns {client_id: bill} shaped like commit_bill's result.
+    """
+    results = {}
+    with immediate_transaction(conn) as cursor:
+        results.update(find_bills_by_client_ids(cursor, [bill['client_id'] for bill in bills]))
+        
+        new_bills = []
+        for bill in sorted(bills, key=lambda bill: bill['created_at']):
+            if bill['client_id'] not in results:
+                results[bill['client_id']] = None  # Later copies in the batch become duplicates
+                new_bills.append(bill)
+        
+        # Reserve a block of sequence numbers per (local) day
+        per_day = {}
+        for bill in new_bills:
+            bill['local_time'] = bill['created_at'].astimezone().replace(tzinfo=None)
+            per_day.setdefault(bill['local_time'].strftime('%Y-%m-%d'), []).append(bill)
+        for seq_date, day_bills in per_day.items():
+            cursor.execute('''
+                INSERT INTO daily_sequence (seq_date, last_seq) VALUES (?, ?)
+                ON CONFLICT(seq_date) DO UPDATE SET last_seq = last_seq + excluded.last_seq
+                RETURNING last_seq
+            ''', (seq_date, len(day_bills)))
+            last_seq = cursor.fetchone()[0]
+            for seq_number, bill in enumerate(day_bills, last_seq - len(day_bills) + 1):
+                local_time = bill['local_time']
+                bill['seq_date'] = seq_date
+                bill['seq_number'] = seq_number
+                bill['bill_number'] = f"{get_bill_prefix(local_time.hour)}{local_time.strftime('%d-%m-%Y')}/{seq_number:03d}"
+                bill['stored_at'] = bill['created_at'].astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+                bill['totals'] = bill_totals(bill['items'], tax_rate, service_charge_rate)
+        
+        cursor.executemany('''
+            INSERT INTO bills (bill_number, items, subtotal, tax_amount, service_charge, total, created_at, client_id,
+                               sale_day)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(bill['bill_number'], json.dumps(bill['items']), *bill['totals'], bill['stored_at'], bill['client_id'],
+               bill['seq_date']) for bill in new_bills])
+        cursor.execute('''
+            SELECT client_id, id FROM bills WHERE client_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps([bill['client_id'] for bill in new_bills]),))
+        bill_ids = dict(cursor.fetchall())
+        
+        cursor.executemany('''
+            INSERT INTO bill_lines (bill_id, menu_id, name, unit_price, quantity, line_total)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [row for bill in new_bills for row in bill_line_rows(bill_ids[bill['client_id']], bill['items'])])
+        add_bills_to_rollups(cursor, bill_ids.values())
+        
+        cursor.executemany('INSERT OR REPLACE INTO bill_sequence (bill_number, seq_date, seq_number) VALUES (?, ?, ?)',
+                           [(bill['bill_number'], bill['seq_date'], bill['seq_number']) for bill in new_bills])
+        
+        if username:
+            cursor.executemany('''
+                INSERT INTO user_activity_logs (username, activity_type, activity_description, bill_number)
+                VALUES (?, ?, ?, ?)
+            ''', [(username, 'bill_generated',
+                   f"Generated bill {bill['bill_number']} with {len(bill['items'])} items, total: ₹{bill['totals'][3]:.2f}",
+                   bill['bill_number']) for bill in new_bills])
+        
+        live_sales.commit(conn, [(bill['seq_date'], bill['totals'][3]) for bill in new_bills])
+    
+    for bill in new_bills:
+        subtotal, tax_amount, service_charge, total = bill['totals']
+        results[bill['client_id']] = {
+            'id': bill_ids[bill['client_id']],
+            'bill_number': bill['bill_number'],
+            'created_at': bill['stored_at'],
+            'seq_number': bill['seq_number'],
+            'subtotal': subtotal,
+            'tax_amount': tax_amount,
+            'service_charge': service_charge,
+            'total': total
+        }
+    return results
+
 # Authentication routes
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -522,30 +1585,47 @@ def unauthorized():
 @app.route('/api/user_dashboard')
 @user_required
 def api_user_dashboard():
-    """API endpoint for user dashboard data"""
-    conn = sqlite3.connect('database/restaurant.db')
-    cursor = conn.cursor()
-    
-    # Get today's bills count and total revenue
-    today = date.today().strftime('%Y-%m-%d')
-    cursor.execute('''
-        SELECT COUNT(*), COALESCE(SUM(total_amount), 0) 
-        FROM bills 
-        WHERE DATE(created_at) = ?
-    ''', (today,))
-    
-    result = cursor.fetchone()
-    today_bills = result[0] if result else 0
-    total_revenue = result[1] if result else 0
-    
-    conn.close()
+    """API endpoint for user dashboard data, served from the live sales counter"""
+    try:
+        day, today_bills, total_revenue = live_sales.snapshot()
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
     
     return jsonify({
         'success': True,
+        'date': day,
         'today_bills': today_bills,
         'total_revenue': total_revenue
     })
 
+@app.route('/api/events')
+@login_required
+def events():
+    """Server-Sent Events stream of bill, menu and settings changes"""
+    keepalive_interval = 15
+    
+    def stream():
+        q = event_hub.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event, payload = q.get(timeout=keepalive_interval)
+                except queue.Empty:
+                    if not event_hub.is_subscribed(q):
+                        break
+                    # Comment line keeps proxies and the browser from timing out
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: {event}\ndata: {payload}\n\n'
+        finally:
+            event_hub.unsubscribe(q)
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/')
 def root():
     """Root route - redirect to login or dashboard based on authentication"""
@@ -560,125 +1640,53 @@ def root():
 @login_required
 def index():
     """Main billing page"""
-    conn = sqlite3.connect('database/restaurant.db')
-    cursor = conn.cursor()
-    
-    # Get all categories
-    cursor.execute('SELECT DISTINCT category FROM menu ORDER BY category')
-    categories = [row[0] for row in cursor.fetchall()]
-    
-    # Get all menu items
-    cursor.execute('SELECT * FROM menu ORDER BY category, name')
-    menu_items = cursor.fetchall()
-    
-    conn.close()
-    
-    # Convert to list of dictionaries
-    items = []
-    for item in menu_items:
-        items.append({
-            'id': item[0],
-            'name': item[1],
-            'category': item[2],
-            'price': item[3],
-            'image': item[4],
-            'description': item[5]
-        })
-    
+    categories, items = menu_cache.page_data()
     return render_template('billing.html', categories=categories, menu_items=items)
 
 @app.route('/menu')
 @admin_required
 def menu_management():
     """Menu management page"""
-    conn = sqlite3.connect('database/restaurant.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT DISTINCT category FROM menu ORDER BY category')
-    categories = [row[0] for row in cursor.fetchall()]
-    cursor.execute('SELECT * FROM menu ORDER BY category, name')
-    menu_items = cursor.fetchall()
-    conn.close()
-    
-    items = []
-    for item in menu_items:
-        items.append({
-            'id': item[0],
-            'name': item[1],
-            'category': item[2],
-            'price': item[3],
-            'image': item[4],
-            'description': item[5]
-        })
-    
+    categories, items = menu_cache.page_data()
     return render_template('menu.html', menu_items=items, categories=categories)
 
 @app.route('/reports')
 @admin_required
 def reports():
-    """Reports and bills history page"""
+    """Reports and bills history page.
+
+    Only the summary figures are computed here (from the daily_sales
+    rollup); bill rows are fetched page by page from /api/bills as the
+    user scrolls.
+    """
     # Get month filter from request
     selected_month = request.args.get('month', '')
     
-    conn = sqlite3.connect('database/restaurant.db')
+    conn = get_db_connection()
     cursor = conn.cursor()
     
-    # Build query based on month filter
-    if selected_month:
-        cursor.execute('SELECT * FROM bills WHERE strftime("%Y-%m", created_at) = ? ORDER BY created_at DESC', (selected_month,))
-    else:
-        cursor.execute('SELECT * FROM bills ORDER BY created_at DESC')
-    
-    bills = cursor.fetchall()
-    conn.close()
-    
-    bill_list = []
-    total_sales = 0
-    today_sales = 0
-    monthly_sales = 0
-    today = datetime.now().strftime('%Y-%m-%d')
-    current_month = datetime.now().strftime('%Y-%m')
+    try:
+        bounds = month_bounds(selected_month) if selected_month else (None, None)
+    except ValueError:
+        selected_month = ''
+        bounds = (None, None)
+    # Totals come from the daily_sales rollup, not the bills table
+    bill_count, total_sales = sales_summary(cursor, *bounds)
     
-    for bill in bills:
-        # Parse items JSON string safely
-        try:
-            items = json.loads(bill[2]) if isinstance(bill[2], str) else bill[2]
-            # Ensure items is a list
-            if not isinstance(items, list):
-                items = []
-        except (json.JSONDecodeError, TypeError):
-            items = []
-            
-        bill_data = {
-            'id': bill[0],
-            'bill_number': bill[1],
-            'bill_items': items,  # Renamed from 'items' to 'bill_items' to avoid conflict
-            'subtotal': bill[3],
-            'tax_amount': bill[4],
-            'service_charge': bill[5],
-            'total': bill[6],
-            'created_at': bill[7]
-        }
-        bill_list.append(bill_data)
-        
-        # Calculate totals
-        total_sales += bill[6]
-        if bill[7].startswith(today):
-            today_sales += bill[6]
-        if bill[7].startswith(current_month):
-            monthly_sales += bill[6]
+    # Same (UTC) day as the rollup rows and the live dashboard counter
+    today = today_sale_day()
+    today_sales = sales_summary(cursor, *date_bounds(today, today))[1]
+    monthly_sales = sales_summary(cursor, *month_bounds(today[:7]))[1]
     
     # Calculate average bill
-    avg_bill = total_sales / len(bill_list) if bill_list else 0
+    avg_bill = total_sales / bill_count if bill_count else 0
     
     # Get available months for dropdown
-    conn = sqlite3.connect('database/restaurant.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT DISTINCT strftime("%Y-%m", created_at) as month FROM bills ORDER BY month DESC')
+    cursor.execute('SELECT DISTINCT substr(day, 1, 7) AS month FROM daily_sales ORDER BY month DESC')
     available_months = [row[0] for row in cursor.fetchall()]
-    conn.close()
     
     return render_template('reports.html', 
-                         bills=bill_list, 
+                         bill_count=bill_count, 
                          total_sales=total_sales,
                          today_sales=today_sales,
                          monthly_sales=monthly_sales,
@@ -686,6 +1694,106 @@ def reports():
                          selected_month=selected_month,
                          available_months=available_months)
 
+@app.route('/api/bills')
+@admin_required
+def get_bills_page():
+    """API endpoint returning one page of bills, newest first.
+
+    Uses keyset pagination on (created_at, id): pass the returned
+    next_cursor back as ``cursor`` to get the following page. The first
+    page (no cursor) also carries a summary of the whole filtered range.
+    """
+    try:
+        from_date = request.args.get('from_date', '')
+        to_date = request.args.get('to_date', '')
+        search = request.args.get('q', '').strip()
+        cursor_arg = request.args.get('cursor', '')
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+        
+        try:
+            bounds = date_bounds(from_date, to_date)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format'})
+        where, params = created_at_filter(*created_at_bounds(*bounds))
+        conditions = [where[len('WHERE '):]] if where else []
+        if search:
+            conditions.append('bill_number LIKE ?')
+            params.append(f'%{search}%')
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        summary = None
+        if not cursor_arg:
+            if search:
+                filter_sql = f"WHERE {' AND '.join(conditions)}"
+                cursor.execute(f'SELECT COUNT(*), COALESCE(SUM(total), 0) FROM bills {filter_sql}', params)
+                count, sales = cursor.fetchone()
+            else:
+                count, sales = sales_summary(cursor, *bounds)
+            summary = {'bill_count': count, 'total_sales': sales}
+        
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if cursor_arg:
+            try:
+                cursor_created_at, cursor_id = cursor_arg.rsplit('|', 1)
+                cursor_id = int(cursor_id)
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Invalid cursor'})
+            page_conditions.append('(created_at, id) < (?, ?)')
+            page_params.extend([cursor_created_at, cursor_id])
+        page_sql = f"WHERE {' AND '.join(page_conditions)}" if page_conditions else ''
+        
+        cursor.execute(f'''
+            SELECT id, bill_number, subtotal, tax_amount, service_charge, total, created_at
+            FROM bills
+            {page_sql}
+            ORDER BY created_at DESC, id DESC
+            LIMIT ?
+        ''', page_params + [limit + 1])
+        rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        # Line items for this page only
+        lines_by_bill = {}
+        if rows:
+            placeholders = ', '.join('?' * len(rows))
+            cursor.execute(f'''
+                SELECT bill_id, name, quantity, unit_price FROM bill_lines
+                WHERE bill_id IN ({placeholders})
+                ORDER BY id
+            ''', [row[0] for row in rows])
+            for bill_id, name, quantity, unit_price in cursor.fetchall():
+                lines_by_bill.setdefault(bill_id, []).append({
+                    'name': name,
+                    'quantity': quantity,
+                    'price': unit_price
+                })
+        
+        bills = [{
+            'id': row[0],
+            'bill_number': row[1],
+            'bill_items': lines_by_bill.get(row[0], []),
+            'subtotal': row[2],
+            'tax_amount': row[3],
+            'service_charge': row[4],
+            'total': row[5],
+            'created_at': row[6]
+        } for row in rows]
+        
+        next_cursor = f"{rows[-1][6]}|{rows[-1][0]}" if has_more else None
+        
+        return jsonify({
+            'success': True,
+            'bills': bills,
+            'next_cursor': next_cursor,
+            'summary': summary
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
 @app.route('/settings')
 @admin_required
 def settings():
@@ -696,53 +1804,41 @@ def settings():
         'restaurant_name': get_setting('restaurant_name', 'My Restaurant'),
         'restaurant_address': get_setting('restaurant_address', '123 Main Street, City'),
         'restaurant_phone': get_setting('restaurant_phone', '+1-234-567-8900'),
-        'restaurant_gst': get_setting('restaurant_gst', '')
+        'restaurant_gst': get_setting('restaurant_gst', ''),
+        'printer_device': get_setting('printer_device', ''),
+        'printer_paper': get_setting('printer_paper', '58'),
+        'log_retention_days': get_setting('log_retention_days', '90')
     }
     return render_template('settings.html', settings=settings_data)
 
 @app.route('/api/all_menu_items')
 def get_all_menu_items():
     """API endpoint to get all menu items for instant category switching"""
-    conn = sqlite3.connect('database/restaurant.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM menu ORDER BY category, name')
-    items = cursor.fetchall()
-    conn.close()
-    
-    result = []
-    for item in items:
-        result.append({
-            'id': item[0],
-            'name': item[1],
-            'category': item[2],
-            'price': item[3],
-            'image': item[4],
-            'description': item[5]
-        })
+    return menu_catalog_response()
+
+@app.route('/api/search')
+def search_menu():
+    """API endpoint for ranked menu search (prefix, initials like "cfr", typo fallback)"""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 50)
+    if not query:
+        return jsonify([])
     
-    return jsonify(result)
+    ids = search_menu_ids(get_db_connection().cursor(), query, limit)
+    if ids is None:
+        # No FTS5 index in this SQLite build: plain substring match on the catalogue
+        needle = query.lower()
+        _, items = menu_cache.page_data()
+        return jsonify([item for item in items
+                        if needle in item['name'].lower()
+                        or needle in item['category'].lower()
+                        or needle in (item['description'] or '').lower()][:limit])
+    return jsonify(menu_cache.lookup(ids))
 
 @app.route('/api/menu_items/<category>')
 def get_menu_items_by_category(category):
     """API endpoint to get menu items by category"""
-    conn = sqlite3.connect('database/restaurant.db')
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM menu WHERE category = ? ORDER BY name', (category,))
-    items = cursor.fetchall()
-    conn.close()
-    
-    result = []
-    for item in items:
-        result.append({
-            'id': item[0],
-            'name': item[1],
-            'category': item[2],
-            'price': item[3],
-            'image': item[4],
-            'description': item[5]
-        })
-    
-    return jsonify(result)
+    return menu_catalog_response(category)
 
 @app.route('/api/add_menu_item', methods=['POST'])
 def add_menu_item():
@@ -755,24 +1851,29 @@ def add_menu_item():
         
         # Handle file upload
         image = None
+        image_variants = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Add timestamp to make filename unique
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                filename = timestamp + filename
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-                image = filename
-        
-        conn = sqlite3.connect('database/restaurant.db')
+                image, image_variants = save_menu_image(file)
+        
+        conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO menu (name, category, price, image, description)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (name, category, price, image, description))
+        try:
+            cursor.execute('''
+                INSERT INTO menu (name, category, price, image, description, image_variants,
+                                  name_key, category_key, category_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (name, category, price, image, description, image_variants,
+                  menu_key(name), category_key(category), ensure_category(cursor, category)))
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return jsonify({'success': False, 'message': f'{name} already exists in {category}'})
+        item_id = cursor.lastrowid
+        bump_cache_version(conn, 'menu')
         conn.commit()
-        conn.close()
+        menu_cache.invalidate()
+        event_hub.publish('menu_changed', {'action': 'added', 'id': item_id})
         
         # Log user activity
         if 'username' in session:
@@ -795,35 +1896,34 @@ def update_menu_item(item_id):
         price = float(request.form.get('price'))
         description = request.form.get('description', '')
         
-        conn = sqlite3.connect('database/restaurant.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         
         # Handle file upload if new image provided
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                filename = timestamp + filename
-                file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
+                filename, image_variants = save_menu_image(file)
                 
                 cursor.execute('''
-                    UPDATE menu SET name=?, category=?, price=?, image=?, description=?
+                    UPDATE menu SET image=?, image_variants=?
                     WHERE id=?
-                ''', (name, category, price, filename, description, item_id))
-            else:
-                cursor.execute('''
-                    UPDATE menu SET name=?, category=?, price=?, description=?
-                    WHERE id=?
-                ''', (name, category, price, description, item_id))
-        else:
+                ''', (filename, image_variants, item_id))
+        
+        try:
             cursor.execute('''
-                UPDATE menu SET name=?, category=?, price=?, description=?
+                UPDATE menu SET name=?, category=?, price=?, description=?, name_key=?, category_key=?, category_id=?
                 WHERE id=?
-            ''', (name, category, price, description, item_id))
+            ''', (name, category, price, description, menu_key(name), category_key(category),
+                  ensure_category(cursor, category), item_id))
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return jsonify({'success': False, 'message': f'{name} already exists in {category}'})
         
+        bump_cache_version(conn, 'menu')
         conn.commit()
-        conn.close()
+        menu_cache.invalidate()
+        event_hub.publish('menu_changed', {'action': 'updated', 'id': item_id})
         
         # Log user activity
         if 'username' in session:
@@ -841,11 +1941,13 @@ def update_menu_item(item_id):
 def delete_menu_item(item_id):
     """API endpoint to delete a menu item"""
     try:
-        conn = sqlite3.connect('database/restaurant.db')
+        conn = get_db_connection()
         cursor = conn.cursor()
         cursor.execute('DELETE FROM menu WHERE id = ?', (item_id,))
+        bump_cache_version(conn, 'menu')
         conn.commit()
-        conn.close()
+        menu_cache.invalidate()
+        event_hub.publish('menu_changed', {'action': 'deleted', 'id': item_id})
         
         # Log user activity
         if 'username' in session:
@@ -859,102 +1961,304 @@ def delete_menu_item(item_id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
+@app.route('/api/category_order', methods=['POST'])
+@admin_required
+def update_category_order():
+    """API endpoint to set the order categories are shown in on the billing screen"""
+    try:
+        names = (request.get_json(silent=True) or {}).get('categories') or []
+        if not isinstance(names, list) or not names:
+            return jsonify({'success': False, 'message': 'categories must be a non-empty list of names'})
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.executemany(
+            'UPDATE categories SET sort_order = ? WHERE category_key = ?',
+            [(position, category_key(name)) for position, name in enumerate(names, 1)]
+        )
+        bump_cache_version(conn, 'menu')
+        conn.commit()
+        menu_cache.invalidate()
+        event_hub.publish('menu_changed', {'action': 'reordered'})
+        
+        if 'username' in session:
+            log_user_activity(
+                session['username'],
+                'category_order_updated',
+                f'Reordered menu categories: {", ".join(names)}'
+            )
+        
+        return jsonify({'success': True, 'message': 'Category order updated successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/import_menu', methods=['POST'])
+@admin_required
+def import_menu():
+    """API endpoint to sync the menu from an uploaded JSON/NDJSON/CSV file"""
+    max_preview = 200
+    try:
+        file = request.files.get('file')
+        if not file or not file.filename:
+            return jsonify({'success': False, 'message': 'No file uploaded'})
+        file_format = menu_format_for(file.filename)
+        if not file_format:
+            return jsonify({'success': False, 'message': 'Unsupported file type (use .json, .ndjson or .csv)'})
+        
+        dry_run = request.form.get('dry_run') == 'true'
+        prune = request.form.get('prune') == 'true'
+        
+        changes = []
+        def collect_change(change):
+            if len(changes) < max_preview:
+                action, item_id, category, old_name, old_price, name, price = change
+                changes.append({
+                    'action': action,
+                    'id': item_id,
+                    'category': category,
+                    'old_name': old_name,
+                    'old_price': old_price,
+                    'name': name,
+                    'price': price
+                })
+        
+        # The upload is read as a stream; large files are spooled to disk by Werkzeug
+        stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')
+        reader = MenuFileReader(stream, file_format)
+        stats = sync_menu(get_db_connection(), reader, dry_run=dry_run, prune=prune,
+                          on_change=collect_change)
+        
+        summary = f"{stats['added']} added, {stats['updated']} updated, {stats['deleted']} deleted"
+        if not dry_run and (stats['added'] or stats['updated'] or stats['deleted']):
+            menu_cache.invalidate()
+            event_hub.publish('menu_changed', {'action': 'imported'})
+            log_user_activity(
+                session['username'],
+                'menu_imported',
+                f'Imported menu from {file.filename}: {summary}'
+            )
+        
+        return jsonify({
+            'success': True,
+            'message': f"{'Dry run: ' if dry_run else ''}{summary}, {stats['unchanged']} unchanged",
+            'dry_run': dry_run,
+            'stats': stats,
+            'changes': changes,
+            'invalid_rows': reader.invalid,
+            'errors': reader.errors
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# Idempotency keys: UUIDs from the billing page (or any similar opaque token)
+CLIENT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+@app.route('/sw.js')
+def service_worker():
+    """Serve the bill-outbox service worker from the root so it covers every page"""
+    response = send_from_directory(os.path.join(app.static_folder, 'js'), 'sw.js', mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/api/generate_bill', methods=['POST'])
 def generate_bill():
-    """API endpoint to generate a bill"""
+    """API endpoint to generate a bill.
+
+    ``client_id`` (a UUID from the billing page) makes the call idempotent:
+    resubmitting it returns the bill saved the first time.
+    """
     try:
         data = request.get_json()
         items = data.get('items', [])
+        client_id = data.get('client_id') or None
         
         if not items:
             return jsonify({'success': False, 'message': 'No items in bill'})
+        if client_id is not None and not CLIENT_ID_PATTERN.match(str(client_id)):
+            return jsonify({'success': False, 'message': 'Invalid client_id'})
         
-        # Calculate totals
-        subtotal = sum(item['price'] * item['quantity'] for item in items)
         tax_rate = float(get_setting('tax_rate', '10.0'))
         service_charge_rate = float(get_setting('service_charge_rate', '5.0'))
         
-        tax_amount = (subtotal * tax_rate) / 100
-        service_charge = (subtotal * service_charge_rate) / 100
-        total = subtotal + tax_amount + service_charge
-        
-        # Generate bill number in new format: A/F/E + DD-MM-YYYY + / + sequence
-        current_time = datetime.now()
-        current_hour = current_time.hour
-        today = date.today()
-        
-        # Determine prefix by time of day
-        # A: 00:00 - 12:59 (till 1 PM)
-        # F: 13:00 - 17:59 (1 PM to 6 PM)
-        # E: 18:00 - 23:59 (after 6 PM)
-        if current_hour < 13:
-            prefix = "A"
-        elif current_hour < 18:
-            prefix = "F"
-        else:
-            prefix = "E"
-        
-        # Format date as DD-MM-YYYY
-        date_str = today.strftime('%d-%m-%Y')
-        
-        # Get or create daily sequence number
-        conn = sqlite3.connect('database/restaurant.db')
-        cursor = conn.cursor()
-        today_str = today.strftime('%Y-%m-%d')
-        cursor.execute('SELECT last_seq FROM daily_sequence WHERE seq_date = ?', (today_str,))
-        row = cursor.fetchone()
-        last_seq = row[0] if row else 0
-        next_seq = (last_seq + 1) if last_seq else 1
-        
-        # Update sequence number
-        if row:
-            cursor.execute('UPDATE daily_sequence SET last_seq = ? WHERE seq_date = ?', (next_seq, today_str))
-        else:
-            cursor.execute('INSERT INTO daily_sequence (seq_date, last_seq) VALUES (?, ?)', (today_str, next_seq))
-        
-        # Create bill number in format: A/F/E + DD-MM-YYYY + / + sequence
-        # Examples: A15-12-2024/001, F15-12-2024/002, E15-12-2024/003
-        bill_number = f"{prefix}{date_str}/{next_seq:03d}"
+        bill = commit_bill(get_db_connection(), items, tax_rate, service_charge_rate,
+                           session.get('username'), client_id)
+        
+        if bill.get('duplicate'):
+            # Already saved (and spooled) by an earlier attempt whose response was lost
+            return jsonify({
+                'success': True,
+                'duplicate': True,
+                'bill_number': bill['bill_number'],
+                'subtotal': bill['subtotal'],
+                'tax_amount': bill['tax_amount'],
+                'service_charge': bill['service_charge'],
+                'total': bill['total'],
+                'printing': 'spooler' if configured_printer() else 'browser'
+            })
         
-        # Save to database
-        cursor.execute('''
-            INSERT INTO bills (bill_number, items, subtotal, tax_amount, service_charge, total)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (bill_number, json.dumps(items), subtotal, tax_amount, service_charge, total))
-
-        # Save bill's daily sequence mapping
-        cursor.execute('INSERT OR REPLACE INTO bill_sequence (bill_number, seq_date, seq_number) VALUES (?, ?, ?)', (bill_number, today_str, next_seq))
-        conn.commit()
-        conn.close()
+        # Print both copies on the thermal printer in the background, or have
+        # the pages ready for the billing screen to print through the browser
+        printing = 'browser'
+        try:
+            bill_data = {**bill, 'bill_items': parse_bill_items(items)}
+            if spool_bill_prints(bill_data):
+                printing = 'spooler'
+            else:
+                render_bill_prints(bill_data)
+        except Exception as e:
+            print(f"Error preparing prints for bill {bill['bill_number']}: {e}")
         
-        # Log user activity for bill generation
-        if 'username' in session:
-            log_user_activity(
-                session['username'], 
-                'bill_generated', 
-                f'Generated bill {bill_number} with {len(items)} items, total: ₹{total:.2f}',
-                bill_number
-            )
+        event_hub.publish('bill_generated', {
+            'bill_number': bill['bill_number'],
+            'total': bill['total'],
+            'created_at': bill['created_at']
+        })
         
         return jsonify({
             'success': True,
-            'bill_number': bill_number,
-            'subtotal': subtotal,
-            'tax_amount': tax_amount,
-            'service_charge': service_charge,
-            'total': total
+            'bill_number': bill['bill_number'],
+            'subtotal': bill['subtotal'],
+            'tax_amount': bill['tax_amount'],
+            'service_charge': bill['service_charge'],
+            'total': bill['total'],
+            'printing': printing
         })
+    except sqlite3.OperationalError as e:
+        # Typically "database is locked" at peak; the billing page queues and retries
+        return jsonify({'success': False, 'message': str(e), 'retryable': True})
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+# Most bills one /api/bills/batch request may carry
+BILL_BATCH_LIMIT = 500
+
+def parse_client_time(value):
+    """Aware datetime for a client's ISO 8601 timestamp (naive = server local time); None if invalid"""
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return moment if moment.tzinfo else moment.astimezone()
+
+def valid_bill_items(items):
+    """True for a non-empty list of items with numeric price and quantity"""
+    return isinstance(items, list) and bool(items) and all(
+        isinstance(item, dict)
+        and isinstance(item.get('price'), (int, float))
+        and isinstance(item.get('quantity'), (int, float))
+        for item in items
+    )
+
+@app.route('/api/bills/batch', methods=['POST'])
+@login_required
+def generate_bills_batch():
+    """API endpoint to save many bills in one transaction (offline replays, outlet sync).
+
+    Body: ``{"bills": [{"client_id", "items", "created_at"}, ...], "print": false}``.
+    ``client_id`` is required and makes every bill idempotent; ``created_at``
+    is the client's ISO 8601 time of sale (defaults to, and is capped at,
+    now). Invalid bills
+    are reported without stopping the rest. Returns one result per bill,
+    in request order.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        bills = data.get('bills')
+        if not isinstance(bills, list) or not bills:
+            return jsonify({'success': False, 'message': 'bills must be a non-empty list'})
+        if len(bills) > BILL_BATCH_LIMIT:
+            return jsonify({'success': False, 'message': f'At most {BILL_BATCH_LIMIT} bills per batch'})
+        
+        now = datetime.now(timezone.utc)
+        errors = {}
+        accepted = []
+        for index, bill in enumerate(bills):
+            bill = bill if isinstance(bill, dict) else {}
+            client_id = bill.get('client_id')
+            created_at = parse_client_time(bill['created_at']) if bill.get('created_at') else now
+            if not client_id or not CLIENT_ID_PATTERN.match(str(client_id)):
+                errors[index] = 'Invalid client_id'
+            elif not valid_bill_items(bill.get('items')):
+                errors[index] = 'No valid items in bill'
+            elif created_at is None:
+                errors[index] = 'Invalid created_at'
+            else:
+                # A terminal whose clock runs ahead can't date bills into the future
+                accepted.append({'client_id': client_id, 'items': bill['items'], 'created_at': min(created_at, now)})
+        
+        saved = {}
+        if accepted:
+            tax_rate = float(get_setting('tax_rate', '10.0'))
+            service_charge_rate = float(get_setting('service_charge_rate', '5.0'))
+            saved = commit_bills(get_db_connection(), accepted, tax_rate, service_charge_rate,
+                                 session.get('username'))
+        
+        new_bills = [bill for bill in saved.values() if not bill.get('duplicate')]
+        printing = 'spooler' if configured_printer() else 'browser'
+        if new_bills and data.get('print') and printing == 'spooler':
+            items_by_id = {bill['client_id']: bill['items'] for bill in accepted}
+            try:
+                spool_bill_prints(*[{**saved[client_id], 'bill_items': parse_bill_items(items)}
+                                    for client_id, items in items_by_id.items()
+                                    if not saved[client_id].get('duplicate')])
+            except Exception as e:
+                print(f"Error spooling batch prints: {e}")
+        if new_bills:
+            event_hub.publish('bill_generated', {
+                'count': len(new_bills),
+                'total': sum(bill['total'] for bill in new_bills)
+            })
+        
+        results = []
+        seen = set()
+        for index, bill in enumerate(bills):
+            if index in errors:
+                results.append({'success': False, 'message': errors[index],
+                                'client_id': bill.get('client_id') if isinstance(bill, dict) else None})
+                continue
+            client_id = bill['client_id']
+            result = saved[client_id]
+            results.append({
+                'success': True,
+                'client_id': client_id,
+                'duplicate': bool(result.get('duplicate')) or client_id in seen,
+                'bill_number': result['bill_number'],
+                'created_at': result['created_at'],
+                'subtotal': result['subtotal'],
+                'tax_amount': result['tax_amount'],
+                'service_charge': result['service_charge'],
+                'total': result['total'],
+                'printing': printing
+            })
+            seen.add(client_id)
+        
+        return jsonify({'success': True, 'saved': len(new_bills), 'results': results})
+    except sqlite3.OperationalError as e:
+        return jsonify({'success': False, 'message': str(e), 'retryable': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
 
 @app.route('/api/update_settings', methods=['POST'])
+@admin_required
 def update_settings():
     """API endpoint to update settings"""
     try:
         data = request.get_json()
-        
-        for key, value in data.items():
-            set_setting(key, value)
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'message': 'Invalid settings'})
+        
+        # The spooler writes bills to this device, so only real printers are accepted
+        if 'printer_device' in data:
+            data['printer_device'] = str(data['printer_device'] or '').strip()
+            if data['printer_device']:
+                try:
+                    check_printer_device(data['printer_device'])
+                except ValueError as e:
+                    return jsonify({'success': False, 'message': str(e)})
+        
+        if not set_settings(data):
+            return jsonify({'success': False, 'message': 'Could not save settings'})
+        event_hub.publish('settings_changed', {'keys': list(data.keys())})
         
         # Log user activity
         if 'username' in session:
@@ -987,25 +2291,27 @@ def get_settings():
 @app.route('/bill/<path:bill_number>')
 def view_bill(bill_number):
     """View printable bill"""
+    copy_type = request.args.get('copy', 'student')
+    if copy_type not in BILL_COPY_TYPES:
+        copy_type = 'student'
+    
+    page = bill_print_cache.get((bill_number, copy_type, settings_cache.version))
+    if page is not None:
+        return page
+    
     def _get_bill(conn):
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM bills WHERE bill_number = ?', (bill_number,))
-        bill = cursor.fetchone()
-        
-        # Fetch sequence number if available
-        seq_number = None
-        try:
-            cursor.execute('SELECT seq_number FROM bill_sequence WHERE bill_number = ?', (bill_number,))
-            row = cursor.fetchone()
-            if row:
-                seq_number = row[0]
-        except sqlite3.OperationalError:
-            seq_number = None
-        
-        return bill, seq_number
+        cursor.execute('''
+            SELECT b.id, b.bill_number, b.items, b.subtotal, b.tax_amount, b.service_charge,
+                   b.total, b.created_at, s.seq_number
+            FROM bills b
+            LEFT JOIN bill_sequence s ON s.bill_number = b.bill_number
+            WHERE b.bill_number = ?
+        ''', (bill_number,))
+        return cursor.fetchone()
     
     try:
-        bill, seq_number = safe_db_operation(_get_bill)
+        bill = safe_db_operation(_get_bill)
     except Exception as e:
         print(f"Error fetching bill {bill_number}: {e}")
         flash('Error loading bill', 'error')
@@ -1015,87 +2321,106 @@ def view_bill(bill_number):
         flash('Bill not found', 'error')
         return redirect(url_for('reports'))
     
-    # Parse items JSON string
-    try:
-        items = json.loads(bill[2]) if isinstance(bill[2], str) else bill[2]
-        # Ensure items is a list
-        if not isinstance(items, list):
-            items = []
-    except (json.JSONDecodeError, TypeError):
-        items = []
-    
     bill_data = {
         'id': bill[0],
         'bill_number': bill[1],
-        'bill_items': items,  # Renamed from 'items' to 'bill_items' to avoid conflict
+        'bill_items': parse_bill_items(bill[2]),  # Renamed from 'items' to 'bill_items' to avoid conflict
         'subtotal': bill[3],
         'tax_amount': bill[4],
         'service_charge': bill[5],
         'total': bill[6],
         'created_at': bill[7],
-        'seq_number': seq_number
-    }
-    
-    # Get restaurant settings
-    settings_data = {
-        'restaurant_name': get_setting('restaurant_name', 'My Restaurant'),
-        'restaurant_address': get_setting('restaurant_address', '123 Main Street, City'),
-        'restaurant_phone': get_setting('restaurant_phone', '+1-234-567-8900'),
-        'restaurant_gst': get_setting('restaurant_gst', '')
+        'seq_number': bill[8]
     }
     
-    copy_type = request.args.get('copy', 'student')
-    return render_template('bill_print.html', bill=bill_data, settings=settings_data, copy_type=copy_type)
+    # Render the other printed copies too, so printing them needs no further queries
+    pages = render_bill_prints(bill_data, dict.fromkeys((copy_type,) + PRINTED_COPY_TYPES))
+    return pages[copy_type]
 
 @app.route('/api/user_logs')
 @admin_required
 def get_user_logs():
-    """API endpoint to get user login and activity logs"""
+    """API endpoint to get user login and activity logs, newest first.
+
+    Query parameters: ``log`` (``login`` or ``activity``; both by default),
+    ``limit`` (default 100) and ``archived=1`` to continue into the monthly
+    log archives once the main database runs out of rows. Like
+    /api/bills, each log is paged with a keyset on (timestamp, id): pass
+    the log's entry in ``next_cursor`` back as ``cursor`` (together with
+    ``log``) to get the following page. It is null once no older rows
+    are left.
+    """
     try:
-        conn = sqlite3.connect('database/restaurant.db')
+        log_writer.flush()  # Include rows still waiting to be written
+        conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Get login logs
-        cursor.execute('''
-            SELECT username, role, login_time, logout_time, session_duration, ip_address
-            FROM user_login_logs 
-            ORDER BY login_time DESC 
-            LIMIT 100
-        ''')
-        login_logs = []
-        for row in cursor.fetchall():
-            login_logs.append({
-                'username': row[0],
-                'role': row[1],
-                'login_time': row[2],
-                'logout_time': row[3],
-                'session_duration': row[4],
-                'ip_address': row[5]
-            })
-        
-        # Get activity logs
-        cursor.execute('''
-            SELECT username, activity_type, activity_description, bill_number, created_at
-            FROM user_activity_logs 
-            ORDER BY created_at DESC 
-            LIMIT 100
-        ''')
-        activity_logs = []
-        for row in cursor.fetchall():
-            activity_logs.append({
-                'username': row[0],
-                'activity_type': row[1],
-                'activity_description': row[2],
-                'bill_number': row[3],
-                'created_at': row[4]
-            })
-        
-        conn.close()
+        requested = request.args.get('log')
+        limit = min(max(request.args.get('limit', 100, type=int), 1), 500)
+        archived = request.args.get('archived') == '1'
+        before = None
+        cursor_arg = request.args.get('cursor', '')
+        if cursor_arg:
+            try:
+                cursor_time, cursor_id = cursor_arg.rsplit('|', 1)
+                before = (cursor_time, int(cursor_id))
+            except ValueError:
+                return jsonify({'success': False, 'message': 'Invalid cursor'})
+        
+        def read_logs(table, columns, time_column):
+            """(rows as dicts, cursor for the next page or None)"""
+            page_sql = f'WHERE ({time_column}, id) < (?, ?)' if before else ''
+            cursor.execute(f'''
+                SELECT id, {', '.join(columns)} FROM {table}
+                {page_sql}
+                ORDER BY {time_column} DESC, id DESC
+                LIMIT ?
+            ''', list(before or ()) + [limit + 1])
+            rows = cursor.fetchall()
+            if archived and len(rows) <= limit:
+                # Archived rows are older than everything left in the main database
+                oldest = (rows[-1][columns.index(time_column) + 1], rows[-1][0]) if rows else before
+                rows += [row[:len(columns) + 1]
+                         for row in read_archived_logs(LOG_ARCHIVE_DIR, table, limit + 1 - len(rows), oldest)]
+            next_cursor = None
+            # Without archived=1 the archives may still hold older rows
+            if len(rows) > limit or (rows and not archived):
+                rows = rows[:limit]
+                next_cursor = f"{rows[-1][columns.index(time_column) + 1]}|{rows[-1][0]}"
+            return [dict(zip(columns, row[1:])) for row in rows], next_cursor
+        
+        login_logs, activity_logs, next_cursor = [], [], {}
+        if requested in (None, 'login'):
+            login_logs, next_cursor['login'] = read_logs(
+                'user_login_logs', ('username', 'role', 'login_time', 'logout_time', 'session_duration', 'ip_address'),
+                'login_time')
+        if requested in (None, 'activity'):
+            activity_logs, next_cursor['activity'] = read_logs(
+                'user_activity_logs', ('username', 'activity_type', 'activity_description', 'bill_number', 'created_at'),
+                'created_at')
         
         return jsonify({
             'success': True,
             'login_logs': login_logs,
-            'activity_logs': activity_logs
+            'activity_logs': activity_logs,
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)})
+
+@app.route('/api/archive_logs', methods=['POST'])
+@admin_required
+def archive_logs_now():
+    """API endpoint to move logs past the retention period into the archives now"""
+    try:
+        if log_retention_days() <= 0:
+            return jsonify({'success': False, 'message': 'Log retention is off (keep logs for 0 days)'})
+        log_writer.flush()
+        moved = log_archiver.run_once()
+        return jsonify({
+            'success': True,
+            'moved': moved,
+            'message': f"Archived {moved.get('user_login_logs', 0)} login and {moved.get('user_activity_logs', 0)} activity log rows"
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -1112,6 +2437,17 @@ def check_database():
     except Exception as e:
         return jsonify({'success': False, 'message': f'Database check failed: {str(e)}'})
 
+@app.route('/api/rebuild_rollups', methods=['POST'])
+@admin_required
+def rebuild_rollups():
+    """API endpoint to recompute the daily sales rollups from the bills"""
+    try:
+        with immediate_transaction(get_db_connection()) as cursor:
+            rebuild_sales_rollups(cursor)
+        return jsonify({'success': True, 'message': 'Sales rollups rebuilt successfully'})
+    except Exception as e:
+        return jsonify({'success': False, 'message': f'Rebuild failed: {str(e)}'})
+
 @app.route('/api/delete_bill/<path:bill_number>', methods=['DELETE'])
 @admin_required
 def delete_bill(bill_number):
@@ -1121,15 +2457,27 @@ def delete_bill(bill_number):
             cursor = conn.cursor()
             
             # First check if bill exists
-            cursor.execute('SELECT id, total FROM bills WHERE bill_number = ?', (bill_number,))
+            cursor.execute('''
+                SELECT id, subtotal, tax_amount, service_charge, total, sale_day
+                FROM bills WHERE bill_number = ?
+            ''', (bill_number,))
             bill = cursor.fetchone()
             
             if not bill:
                 return False, "Bill not found"
             
-            bill_id, bill_total = bill
+            bill_id, subtotal, tax_amount, service_charge, bill_total, sale_day = bill
+            
+            # Take the bill out of the sales rollups
+            cursor.execute('''
+                SELECT bill_id, menu_id, name, unit_price, quantity, line_total
+                FROM bill_lines WHERE bill_id = ?
+            ''', (bill_id,))
+            update_sales_rollups(cursor, sale_day, subtotal, tax_amount, service_charge,
+                                 bill_total, cursor.fetchall(), sign=-1)
             
-            # Delete the bill
+            # Delete the bill and its line items
+            cursor.execute('DELETE FROM bill_lines WHERE bill_id = ?', (bill_id,))
             cursor.execute('DELETE FROM bills WHERE bill_number = ?', (bill_number,))
             
             # Also delete from bill_sequence table if it exists
@@ -1139,11 +2487,15 @@ def delete_bill(bill_number):
                 # Table might not exist in older versions, ignore
                 pass
             
+            live_sales.commit(conn, [(sale_day, bill_total)], sign=-1)
             return True, f"Bill {bill_number} deleted successfully"
         
         success, message = safe_db_operation(_delete_bill)
         
         if success:
+            bill_print_cache.evict_bill(bill_number)
+            event_hub.publish('bill_deleted', {'bill_number': bill_number})
+            
             # Log the deletion activity
             if 'username' in session:
                 log_user_activity(
@@ -1172,84 +2524,38 @@ def get_item_analysis():
         conn = get_db_connection()
         cursor = conn.cursor()
         
-        # Build query based on date range
-        if from_date and to_date:
-            cursor.execute('''
-                SELECT bill_items, total, created_at 
-                FROM bills 
-                WHERE DATE(created_at) BETWEEN ? AND ? 
-                ORDER BY created_at DESC
-            ''', (from_date, to_date))
-        elif from_date:
-            cursor.execute('''
-                SELECT bill_items, total, created_at 
-                FROM bills 
-                WHERE DATE(created_at) >= ? 
-                ORDER BY created_at DESC
-            ''', (from_date,))
-        elif to_date:
-            cursor.execute('''
-                SELECT bill_items, total, created_at 
-                FROM bills 
-                WHERE DATE(created_at) <= ? 
-                ORDER BY created_at DESC
-            ''', (to_date,))
-        else:
-            cursor.execute('''
-                SELECT bill_items, total, created_at 
-                FROM bills 
-                ORDER BY created_at DESC
-            ''')
-        
-        bills = cursor.fetchall()
-        conn.close()
-        
-        # Analyze items
-        item_analysis = {}
-        total_sales = 0
-        
-        for bill in bills:
-            try:
-                items = json.loads(bill[0]) if isinstance(bill[0], str) else bill[0]
-                bill_total = bill[1]
-                total_sales += bill_total
-                
-                if isinstance(items, list):
-                    for item in items:
-                        item_name = item.get('name', 'Unknown')
-                        quantity = item.get('quantity', 0)
-                        price = item.get('price', 0)
-                        item_total = price * quantity
-                        
-                        if item_name in item_analysis:
-                            item_analysis[item_name]['quantity'] += quantity
-                            item_analysis[item_name]['total_sales'] += item_total
-                        else:
-                            item_analysis[item_name] = {
-                                'quantity': quantity,
-                                'price': price,
-                                'total_sales': item_total
-                            }
-            except (json.JSONDecodeError, TypeError, KeyError):
-                continue
-        
-        # Sort by total sales (highest first)
-        sorted_items = sorted(
-            item_analysis.items(), 
-            key=lambda x: x[1]['total_sales'], 
-            reverse=True
-        )
+        # Build the half-open day range
+        try:
+            bounds = date_bounds(from_date, to_date)
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Dates must be in YYYY-MM-DD format'})
+        
+        # Bill totals for the range
+        total_bills, total_sales = sales_summary(cursor, *bounds)
+        
+        # Per-item totals from the daily_item_sales rollup, sorted by total
+        # sales (highest first). Items are grouped on their menu id and
+        # shown under their current menu name, so renames don't split them.
+        where, params = created_at_filter(*bounds, column='s.day')
+        cursor.execute(f'''
+            SELECT COALESCE(m.name, MAX(s.name)), SUM(s.qty), SUM(s.amount)
+            FROM daily_item_sales s
+            LEFT JOIN menu m ON m.id = s.menu_id
+            {where}
+            GROUP BY s.item_key
+            ORDER BY SUM(s.amount) DESC
+        ''', params)
         
         return jsonify({
             'success': True,
             'item_analysis': [{
                 'name': name,
-                'quantity': data['quantity'],
-                'price': data['price'],
-                'total_sales': data['total_sales']
-            } for name, data in sorted_items],
+                'quantity': quantity,
+                'price': item_sales / quantity if quantity else 0,
+                'total_sales': item_sales
+            } for name, quantity, item_sales in cursor.fetchall()],
             'total_sales': total_sales,
-            'total_bills': len(bills)
+            'total_bills': total_bills
         })
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
@@ -1296,5 +2602,17 @@ def test_bill_number():
         return jsonify({'success': False, 'message': str(e)})
 
 if __name__ == '__main__':
-    init_db()
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    import sys
+    
+    # app.run(debug=True) reloads through a parent process that only watches
+    # files and a child (WERKZEUG_RUN_MAIN set) that serves requests; only
+    # the child runs the background workers
+    init_db(start_workers=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
+    if len(sys.argv) > 1 and sys.argv[1] == '--rebuild-rollups':
+        with immediate_transaction(get_db_connection()) as cursor:
+            rebuild_sales_rollups(cursor)
+        print("✓ Sales rollups rebuilt")
+    elif len(sys.argv) > 1 and sys.argv[1] == '--archive-logs':
+        print(f"✓ Archived old logs: {log_archiver.run_once(convert=True)}")
+    else:
+        app.run(debug=True, host='0.0.0.0', port=5000)
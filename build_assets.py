@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Build fingerprinted, precompressed copies of the static CSS/JS assets
+
+Writes content-hashed files (e.g. css/style.3f2a1b9c0d.css) under
+static/build/ together with .gz and, when the optional ``brotli``
+package is installed, .br variants, plus a manifest.json mapping each
+source path to its hashed name. The app's ``asset_url()`` template
+helper reads the manifest; run this script again after editing any
+CSS/JS file (build_exe.py runs it for every release).
+"""
+
+import gzip
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = Path('static')
+BUILD_DIR = STATIC_DIR / 'build'
+SOURCE_DIRS = ['css', 'js']
+EXTENSIONS = {'.css', '.js'}
+# Copied unchanged so relative url(...) references in the CSS keep working
+COPY_DIRS = ['css/fonts']
+
+def hashed_name(path, data):
+    """Return path with a short content hash inserted before the extension"""
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return path.with_name(f"{path.stem}.{digest}{path.suffix}")
+
+def write_compressed(target, data):
+    """Write .gz/.br variants next to target when they are smaller"""
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            target.with_name(target.name + suffix).write_bytes(compressed)
+            written.append(f"{suffix[1:]} {len(compressed) // 1024} KB")
+    return written
+
+def main():
+    """Build static/build/ and its manifest"""
+    print("📦 Building static assets...")
+
+    if not STATIC_DIR.exists():
+        print("❌ Error: static/ not found. Please run this script from the project root directory.")
+        return False
+
+    if brotli is None:
+        print("⚠️  brotli not installed - writing gzip variants only (pip install brotli)")
+
+    # Start from a clean build so stale hashed files don't pile up
+    if BUILD_DIR.exists():
+        shutil.rmtree(BUILD_DIR)
+    BUILD_DIR.mkdir(parents=True)
+
+    manifest = {}
+    for source_dir in SOURCE_DIRS:
+        for source in sorted((STATIC_DIR / source_dir).glob('*')):
+            if source.suffix not in EXTENSIONS or not source.is_file():
+                continue
+
+            data = source.read_bytes()
+            relative = source.relative_to(STATIC_DIR)
+            target = BUILD_DIR / hashed_name(relative, data)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+
+            variants = write_compressed(target, data)
+            manifest[relative.as_posix()] = target.relative_to(STATIC_DIR).as_posix()
+            print(f"✅ {relative.as_posix()} -> {target.name} ({len(data) // 1024} KB; {', '.join(variants) or 'uncompressed'})")
+
+    for copy_dir in COPY_DIRS:
+        if (STATIC_DIR / copy_dir).exists():
+            shutil.copytree(STATIC_DIR / copy_dir, BUILD_DIR / copy_dir)
+
+    with open(BUILD_DIR / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    print(f"\n🎉 Built {len(manifest)} assets into {BUILD_DIR.as_posix()}/")
+    return True
+
+if __name__ == "__main__":
+    main()
@@ -100,6 +100,11 @@ def main():
         print("❌ Failed to install requirements")
         sys.exit(1)
     
+    # Fingerprint and precompress CSS/JS so terminals cache them per release
+    if not run_command("python build_assets.py", "Building static assets"):
+        print("❌ Failed to build static assets")
+        sys.exit(1)
+    
     # Kill any running processes that might be using files
     print("🔄 Checking for running processes...")
     try:
@@ -105,7 +105,9 @@ class SriVengamambaFoodCourtDesktopApp:
         """Start Flask server in background thread"""
         def run_flask():
             try:
-                from app import app
+                from app import app, init_db
+                # Create missing tables and run schema migrations
+                init_db()
                 app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False, threaded=True)
             except Exception as e:
                 self.root.after(0, lambda: self.show_error(str(e)))
@@ -24,8 +24,56 @@ let allMenuItems = []; // Store all menu items
 document.addEventListener('DOMContentLoaded', function() {
     preloadAllMenuItems();
     loadSettings();
+    
+    // Keep the billing screen in step with edits made on other terminals
+    if (document.getElementById('menu-items-container')) {
+        onLiveEvent('menu_changed', refreshMenuItems);
+        onLiveEvent('settings_changed', () => loadSettings());
+        // Send any bills that were queued while the server was unreachable
+        initBillOutbox();
+    }
 });
 
+// Live updates pushed by the server over /api/events (one shared connection per page)
+let liveEventSource = null;
+
+function onLiveEvent(type, handler) {
+    if (typeof EventSource === 'undefined') {
+        return;
+    }
+    if (!liveEventSource) {
+        liveEventSource = new EventSource('/api/events');
+    }
+    if (type === 'open') {
+        // Fired on every (re)connect; use it to reload anything missed while offline
+        liveEventSource.addEventListener('open', () => handler({}));
+        return;
+    }
+    liveEventSource.addEventListener(type, event => {
+        let data = {};
+        try {
+            data = JSON.parse(event.data);
+        } catch (error) {
+            console.error('Invalid live event payload:', error);
+        }
+        handler(data);
+    });
+}
+
+// Reload the menu cache after another terminal changed it
+async function refreshMenuItems() {
+    menuItemsCache = {};
+    allMenuItems = [];
+    await preloadAllMenuItems();
+    
+    const searchInput = document.getElementById('menu-search');
+    if (searchInput && searchInput.value.trim()) {
+        searchAllItems();
+    } else if (currentCategory) {
+        displayMenuItems(currentCategory);
+    }
+}
+
 // Load settings (tax and service charge rates)
 async function loadSettings() {
     try {
@@ -173,12 +221,33 @@ function createMenuItemCard(item) {
     
     const imageSrc = item.image ? `/static/images/${item.image}` : '/static/images/placeholder.svg';
     
-    card.innerHTML = `
+    // Thumbnails (when generated) let the browser pick a card-sized file
+    let imageHtml = `
         <img src="${imageSrc}" 
              alt="${item.name}" 
              class="menu-item-image" 
              loading="lazy"
-             onerror="this.src='/static/images/placeholder.svg'">
+             onerror="this.src='/static/images/placeholder.svg'">`;
+    if (item.srcset && item.srcset.jpeg) {
+        const sizes = '(max-width: 576px) 45vw, 220px';
+        imageHtml = `
+        <picture>
+            ${item.srcset.webp ? `<source type="image/webp" srcset="${item.srcset.webp}" sizes="${sizes}">` : ''}
+            <img src="${imageSrc}" 
+                 srcset="${item.srcset.jpeg}" 
+                 sizes="${sizes}" 
+                 width="${item.image_width}" 
+                 height="${item.image_height}" 
+                 alt="${item.name}" 
+                 class="menu-item-image" 
+                 loading="lazy"
+                 decoding="async"
+                 onerror="this.srcset=''; this.src='/static/images/placeholder.svg'">
+        </picture>`;
+    }
+    
+    card.innerHTML = `
+        ${imageHtml}
         <div class="menu-item-info">
             <div class="menu-item-name">${item.name}</div>
             <div class="menu-item-price">₹${item.price.toFixed(2)}</div>
@@ -356,39 +425,122 @@ async function generateBill() {
 
 // Confirm and print bill (direct print)
 async function confirmAndPrintBill() {
-    try {
-        const response = await fetch('/api/generate_bill', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                items: currentBill
-            })
-        });
-        
-        const result = await response.json();
-        
-        if (result.success) {
-            // Hide modal
-            const modal = bootstrap.Modal.getInstance(document.getElementById('billConfirmationModal'));
-            modal.hide();
-            
-            // Clear current bill
-            currentBill = [];
+    const bill = {
+        client_id: newBillId(),
+        items: currentBill,
+        queued_at: new Date().toISOString()
+    };
+    
+    // A few quick retries ride out a busy database; the client id makes them safe
+    let result = null;
+    for (const delay of [0, 300, 1000]) {
+        await new Promise(r => setTimeout(r, delay));
+        try {
+            result = await submitBill(bill);
+            break;
+        } catch (error) {
+            console.warn('Bill submission failed, retrying:', error);
+        }
+    }
+    
+    if (result && !result.success) {
+        showAlert(result.message, 'danger');
+        return;
+    }
+    
+    // Hide modal
+    const modal = bootstrap.Modal.getInstance(document.getElementById('billConfirmationModal'));
+    modal.hide();
+    
+    // Clear current bill
+    currentBill = [];
+    updateBillDisplay();
+    
+    if (!result) {
+        // Keep the bill and let the outbox submit it once the server is back
+        try {
+            await outboxPut(bill);
+            requestOutboxReplay();
+            showAlert('Server not reachable. The bill is saved and will be submitted automatically.', 'warning');
+        } catch (error) {
+            console.error('Error queueing bill:', error);
+            currentBill = bill.items;
             updateBillDisplay();
-            
-            // Show success message
-            showAlert('Bill generated and saved successfully!', 'success');
-            
-            // Directly print two separate copies (Customer then Kitchen) as separate print jobs
-            printCopiesSequentially(result.bill_number);
-        } else {
-            showAlert(result.message, 'danger');
+            showAlert('Error generating bill', 'danger');
+        }
+        return;
+    }
+    
+    // Show success message
+    showAlert('Bill generated and saved successfully!', 'success');
+    printGeneratedBill(result);
+}
+
+function printGeneratedBill(result) {
+    // The server spools both copies to the thermal printer when one is configured;
+    // otherwise print two separate copies (Customer then Kitchen) through the browser
+    if (result.printing !== 'spooler') {
+        printCopiesSequentially(result.bill_number);
+    }
+}
+
+// Offline bill queue (see outbox.js): replayed by the service worker, or by
+// this page where service workers are unavailable
+let billOutboxWorker = null;
+
+function initBillOutbox() {
+    if (typeof indexedDB === 'undefined') {
+        return;
+    }
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register('/sw.js').then(registration => {
+            billOutboxWorker = registration;
+            requestOutboxReplay();
+        }).catch(error => {
+            console.warn('Service worker registration failed:', error);
+            requestOutboxReplay();
+        });
+        navigator.serviceWorker.addEventListener('message', event => {
+            if (event.data && event.data.type === 'bill-replayed') {
+                handleReplayedBill(event.data.bill, event.data.result);
+            }
+        });
+    } else {
+        requestOutboxReplay();
+    }
+    
+    window.addEventListener('online', requestOutboxReplay);
+    onLiveEvent('open', requestOutboxReplay);
+    setInterval(requestOutboxReplay, 15000);
+}
+
+async function requestOutboxReplay() {
+    try {
+        if ((await outboxAll()).length === 0) {
+            return;
         }
     } catch (error) {
-        console.error('Error generating bill:', error);
-        showAlert('Error generating bill', 'danger');
+        return;
+    }
+    
+    const worker = billOutboxWorker && billOutboxWorker.active;
+    if (worker) {
+        if (billOutboxWorker.sync) {
+            billOutboxWorker.sync.register(OUTBOX_SYNC_TAG).catch(() => worker.postMessage({ type: 'replay-outbox' }));
+        } else {
+            worker.postMessage({ type: 'replay-outbox' });
+        }
+        return;
+    }
+    replayOutbox(handleReplayedBill).catch(error => console.warn('Outbox replay failed:', error));
+}
+
+function handleReplayedBill(bill, result) {
+    if (result.success) {
+        showAlert(`Queued bill saved as ${result.bill_number}`, 'success');
+        printGeneratedBill(result);
+    } else {
+        showAlert(`A queued bill could not be saved: ${result.message}`, 'danger');
     }
 }
 
@@ -669,15 +821,20 @@ function handleImageUpload(input) {
 
 // Initialize page
 // Universal search for all menu items
+let searchTimer = null;
+let searchSequence = 0;
+
 function searchAllItems() {
     const searchInput = document.getElementById('menu-search');
-    const searchTerm = searchInput.value.toLowerCase().trim();
+    const searchTerm = searchInput.value.trim();
     const clearBtn = document.getElementById('search-clear');
     
     // Show/hide clear button
     clearBtn.style.display = searchTerm.length > 0 ? 'block' : 'none';
     
+    clearTimeout(searchTimer);
     if (searchTerm.length === 0) {
+        searchSequence++; // Drop any search still in flight
         // If search is empty, show current category or nothing
         if (currentCategory) {
             displayMenuItems(currentCategory);
@@ -685,13 +842,38 @@ function searchAllItems() {
         return;
     }
     
-    // Search across all menu items
-    const filteredItems = allMenuItems.filter(item => {
-        return item.name.toLowerCase().includes(searchTerm) ||
-               item.category.toLowerCase().includes(searchTerm) ||
-               (item.description && item.description.toLowerCase().includes(searchTerm));
-    });
+    // Wait for a pause in typing before asking the server
+    searchTimer = setTimeout(() => runMenuSearch(searchTerm), 120);
+}
+
+// Ranked server-side search (prefix, initials such as "cfr", typo fallback)
+async function runMenuSearch(searchTerm) {
+    const sequence = ++searchSequence;
+    let filteredItems;
+    try {
+        const response = await fetch(`/api/search?q=${encodeURIComponent(searchTerm)}&limit=50`);
+        if (!response.ok) {
+            throw new Error(`Search failed: ${response.status}`);
+        }
+        filteredItems = await response.json();
+    } catch (error) {
+        // Offline: fall back to a substring match over the cached menu
+        const needle = searchTerm.toLowerCase();
+        filteredItems = allMenuItems.filter(item => {
+            return item.name.toLowerCase().includes(needle) ||
+                   item.category.toLowerCase().includes(needle) ||
+                   (item.description && item.description.toLowerCase().includes(needle));
+        });
+    }
     
+    // A newer keystroke (or clearing the box) superseded this search
+    if (sequence !== searchSequence) {
+        return;
+    }
+    displaySearchResults(filteredItems);
+}
+
+function displaySearchResults(filteredItems) {
     // Update category title
     const categoryTitle = document.getElementById('current-category-title');
     if (categoryTitle) {
@@ -734,6 +916,8 @@ function clearSearch() {
     
     searchInput.value = '';
     clearBtn.style.display = 'none';
+    clearTimeout(searchTimer);
+    searchSequence++;
     
     // Show current category items or initial message
     if (currentCategory) {
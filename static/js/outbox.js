@@ -0,0 +1,123 @@
+// Bill outbox: bills that could not reach the server are kept in IndexedDB
+// and replayed later. Loaded by pages and by the service worker (sw.js).
+// Every bill carries a client-generated id that the server uses as an
+// idempotency key, so replaying a bill that did get saved returns the
+// original bill instead of creating a second one.
+
+const OUTBOX_DB = 'billing-outbox';
+const OUTBOX_STORE = 'bills';
+const OUTBOX_SYNC_TAG = 'bill-outbox';
+
+// Client id for a new bill (randomUUID is missing outside secure contexts, e.g. http://<lan-ip>)
+function newBillId() {
+    if (self.crypto && self.crypto.randomUUID) {
+        return self.crypto.randomUUID();
+    }
+    const bytes = self.crypto.getRandomValues(new Uint8Array(16));
+    bytes[6] = (bytes[6] & 0x0f) | 0x40;
+    bytes[8] = (bytes[8] & 0x3f) | 0x80;
+    const hex = Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+    return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+function openOutbox() {
+    return new Promise((resolve, reject) => {
+        const request = self.indexedDB.open(OUTBOX_DB, 1);
+        request.onupgradeneeded = () => {
+            request.result.createObjectStore(OUTBOX_STORE, { keyPath: 'client_id' });
+        };
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+async function outboxRequest(mode, operation) {
+    const db = await openOutbox();
+    try {
+        return await new Promise((resolve, reject) => {
+            const transaction = db.transaction(OUTBOX_STORE, mode);
+            const request = operation(transaction.objectStore(OUTBOX_STORE));
+            transaction.oncomplete = () => resolve(request.result);
+            transaction.onerror = () => reject(transaction.error);
+        });
+    } finally {
+        db.close();
+    }
+}
+
+function outboxPut(bill) {
+    return outboxRequest('readwrite', store => store.put(bill));
+}
+
+function outboxDelete(clientId) {
+    return outboxRequest('readwrite', store => store.delete(clientId));
+}
+
+async function outboxAll() {
+    const bills = await outboxRequest('readonly', store => store.getAll());
+    return bills.sort((a, b) => a.queued_at.localeCompare(b.queued_at));
+}
+
+// Bills sent per /api/bills/batch request when replaying
+const OUTBOX_BATCH_SIZE = 50;
+
+async function postJson(url, body) {
+    const response = await fetch(url, {
+        method: 'POST',
+        credentials: 'same-origin',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok || response.redirected) {
+        throw new Error(`Bill submission failed: ${response.status}`);
+    }
+    const result = await response.json();
+    if (!result.success && result.retryable) {
+        throw new Error(result.message);
+    }
+    return result;
+}
+
+// POST one bill. Resolves with the server's JSON; rejects when the request
+// should be retried later (network down, server restarting, database busy).
+function submitBill(bill) {
+    return postJson('/api/generate_bill', { client_id: bill.client_id, items: bill.items });
+}
+
+// POST queued bills in one request, stamped with the time they were rung up.
+// Resolves with one result per bill, in order; rejects like submitBill.
+async function submitBills(bills) {
+    const result = await postJson('/api/bills/batch', {
+        print: true,
+        bills: bills.map(bill => ({ client_id: bill.client_id, items: bill.items, created_at: bill.queued_at }))
+    });
+    if (!result.success) {
+        throw new Error(result.message);
+    }
+    return result.results;
+}
+
+// Send queued bills oldest first, a batch at a time, stopping at the first
+// batch the server can't take yet. onResult(bill, result) is called for
+// every bill the server answered.
+let outboxReplay = null;
+
+function replayOutbox(onResult) {
+    // One replay at a time, so a bill is never in flight twice from here
+    if (!outboxReplay) {
+        outboxReplay = (async () => {
+            const bills = await outboxAll();
+            for (let start = 0; start < bills.length; start += OUTBOX_BATCH_SIZE) {
+                const batch = bills.slice(start, start + OUTBOX_BATCH_SIZE);
+                const results = await submitBills(batch);
+                for (const [index, bill] of batch.entries()) {
+                    await outboxDelete(bill.client_id);
+                    if (onResult) {
+                        onResult(bill, results[index]);
+                    }
+                }
+            }
+        })().finally(() => { outboxReplay = null; });
+    }
+    return outboxReplay;
+}
@@ -0,0 +1,35 @@
+// Service worker: replays bills queued in the IndexedDB outbox once the
+// server is reachable again. Served from /sw.js so it covers every page.
+importScripts('/static/js/outbox.js');
+
+self.addEventListener('install', () => self.skipWaiting());
+self.addEventListener('activate', event => event.waitUntil(self.clients.claim()));
+
+// Tell one open billing window about each replayed bill, so it is printed once
+async function reportReplayedBill(bill, result) {
+    const windows = await self.clients.matchAll({ type: 'window' });
+    const target = windows.find(client => client.focused) ||
+        windows.find(client => new URL(client.url).pathname === '/billing') ||
+        windows[0];
+    if (target) {
+        target.postMessage({ type: 'bill-replayed', bill, result });
+    }
+}
+
+function replay() {
+    return replayOutbox((bill, result) => reportReplayedBill(bill, result));
+}
+
+// Background Sync retries this (with backoff) while the promise rejects
+self.addEventListener('sync', event => {
+    if (event.tag === OUTBOX_SYNC_TAG) {
+        event.waitUntil(replay());
+    }
+});
+
+// Pages ask for a replay directly where Background Sync is unavailable
+self.addEventListener('message', event => {
+    if (event.data && event.data.type === 'replay-outbox') {
+        event.waitUntil(replay().catch(error => console.warn('Outbox replay failed:', error)));
+    }
+});
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as restaurant  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def restaurant_app(tmp_path_factory):
+    """The app module on a fresh database built by init_db.
+
+    DATABASE_PATH is relative to the working directory and pooled
+    connections keep the file they were opened on, so the whole session
+    shares one database.
+    """
+    workdir = tmp_path_factory.mktemp('restaurant')
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        os.makedirs(os.path.dirname(restaurant.DATABASE_PATH), exist_ok=True)
+        restaurant.init_db(start_workers=False)
+        yield restaurant
+    finally:
+        os.chdir(previous)
+
+
+@pytest.fixture
+def admin_client(restaurant_app):
+    client = restaurant_app.app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+        session['username'] = 'admin'
+        session['role'] = 'admin'
+    return client
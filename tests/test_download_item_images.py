@@ -0,0 +1,160 @@
+"""download_item_images against a local stub image provider."""
+import _thread
+import io
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+from PIL import Image
+
+from utils import download_item_images as downloader
+
+ITEMS = ['Idly', 'Dosa', 'Vada', 'Upma', 'Pongal', 'Poori']
+
+
+def food_photo(seed):
+    """A PNG big enough to pass the downloader's size check, different per seed"""
+    noise = random.Random(seed)
+    image = Image.new('RGB', (64, 64))
+    image.putdata([tuple(noise.randrange(256) for _ in range(3)) for _ in range(64 * 64)])
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class StubProvider(ThreadingHTTPServer):
+    """loremflickr-style image server that records every request"""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.0):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.requests = []  # (start time, item name)
+        self.active = 0
+        self.max_active = 0
+        self.on_request = None
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        name = unquote(self.path.rsplit('/', 1)[-1]).split(',')[0]
+        with server._lock:
+            server.requests.append((time.monotonic(), name))
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+            count = len(server.requests)
+        if server.on_request:
+            server.on_request(count)
+        time.sleep(server.delay)
+        body = food_photo(name)
+        with server._lock:
+            server.active -= 1
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def provider():
+    server = StubProvider()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def menu_db(tmp_path, monkeypatch, provider):
+    """A menu database, images dir and journal in tmp_path, with loremflickr served by the stub"""
+    database = tmp_path / 'restaurant.db'
+    conn = sqlite3.connect(database)
+    conn.executescript('''
+        CREATE TABLE menu (id INTEGER PRIMARY KEY, name TEXT, category TEXT, image TEXT, image_variants TEXT);
+        CREATE TABLE cache_versions (name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0);
+    ''')
+    conn.executemany('INSERT INTO menu (name, category) VALUES (?, ?)', [(name, 'Tiffin') for name in ITEMS])
+    conn.commit()
+    monkeypatch.setattr(downloader, 'DATABASE_PATH', str(database))
+    monkeypatch.setattr(downloader, 'IMAGES_DIR', str(tmp_path / 'images'))
+    monkeypatch.setattr(downloader, 'JOURNAL_PATH', str(tmp_path / 'journal.jsonl'))
+    monkeypatch.setitem(downloader.PROVIDER_URLS, 'loremflickr', provider.url)
+    yield conn
+    conn.close()
+
+
+def download(**kwargs):
+    downloader.download_images(provider_order=['loremflickr'], **kwargs)
+
+
+def images(conn):
+    return dict(conn.execute('SELECT name, image FROM menu'))
+
+
+def requested(provider):
+    return [name for _, name in provider.requests]
+
+
+def test_fetches_concurrently_within_the_rate_limit(menu_db, provider):
+    provider.delay = 0.5
+    download(workers=4, delay=0.2)
+
+    starts = sorted(start for start, _ in provider.requests)
+    assert set(requested(provider)) == set(ITEMS)
+    # Requests start 0.2s apart; leave room for scheduling jitter on the server side
+    assert all(later - earlier >= 0.15 for earlier, later in zip(starts, starts[1:]))
+    assert provider.max_active > 1
+
+    assert all(images(menu_db).values())
+    # All rows are written in the one batched update, which bumps the menu cache once
+    assert menu_db.execute("SELECT version FROM cache_versions WHERE name = 'menu'").fetchone() == (1,)
+    assert not os.path.exists(downloader.JOURNAL_PATH)
+
+
+def test_interrupted_run_resumes_from_journal(menu_db, provider):
+    provider.delay = 0.2
+
+    def interrupt(count):
+        if count == 2:
+            _thread.interrupt_main()  # Ctrl-C once the first image is journaled
+
+    provider.on_request = interrupt
+    started = time.monotonic()
+    with pytest.raises(KeyboardInterrupt):
+        download(workers=1, delay=0)
+    assert time.monotonic() - started < 0.2 * len(ITEMS)  # Queued downloads were cancelled
+    assert not any(images(menu_db).values())
+
+    with open(downloader.JOURNAL_PATH) as journal:
+        journaled = [json.loads(line)['id'] for line in journal]
+    assert journaled
+    first_run = requested(provider)
+    assert len(first_run) < len(ITEMS)
+
+    provider.on_request = None
+    provider.requests.clear()
+    download(workers=2, delay=0)
+
+    resumed = {name for (item_id, name) in menu_db.execute('SELECT id, name FROM menu') if item_id in journaled}
+    assert resumed.isdisjoint(requested(provider))
+    assert resumed | set(requested(provider)) == set(ITEMS)
+    assert all(images(menu_db).values())
+    assert not os.path.exists(downloader.JOURNAL_PATH)
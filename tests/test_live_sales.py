@@ -0,0 +1,46 @@
+"""The live sales counter stays equal to the rollup while bills commit during resyncs."""
+import threading
+
+from app import LiveSalesCounter
+
+ITEMS = [{'id': None, 'name': 'Coffee', 'price': 15, 'quantity': 1}]
+
+
+def rollup_today(restaurant_app, cursor):
+    cursor.execute('SELECT bill_count, total FROM daily_sales WHERE day = ?', (restaurant_app.today_sale_day(),))
+    return cursor.fetchone() or (0, 0.0)
+
+
+def test_commits_during_resyncs_are_counted_once(restaurant_app, monkeypatch):
+    counter = LiveSalesCounter(resync_interval=0)  # Every snapshot resyncs
+    monkeypatch.setattr(restaurant_app, 'live_sales', counter)
+    counter.snapshot()
+    stop = threading.Event()
+    errors = []
+
+    def commit_bills():
+        try:
+            for _ in range(40):
+                restaurant_app.commit_bill(restaurant_app.get_db_connection(), ITEMS, 0.0, 0.0)
+        except Exception as e:
+            errors.append(e)
+
+    def resync():
+        while not stop.is_set():
+            counter.snapshot()
+
+    writers = [threading.Thread(target=commit_bills) for _ in range(3)]
+    reader = threading.Thread(target=resync)
+    reader.start()
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    stop.set()
+    reader.join()
+
+    assert not errors
+    expected_count, expected_total = rollup_today(restaurant_app, restaurant_app.get_db_connection().cursor())
+    # Compare the in-memory figures as they stand, without another resync
+    assert counter._bill_count == expected_count
+    assert round(counter._revenue, 2) == round(expected_total, 2)
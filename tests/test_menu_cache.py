@@ -0,0 +1,17 @@
+"""The menu catalogue cache only holds categories that exist."""
+
+
+def test_unknown_categories_are_not_cached(restaurant_app, admin_client):
+    admin_client.post('/api/add_menu_item', data={'name': 'Masala Dosa', 'category': 'Tiffin', 'price': '60'})
+
+    response = admin_client.get('/api/menu_items/Tiffin')
+    assert [item['name'] for item in response.get_json()] == ['Masala Dosa']
+
+    for number in range(50):
+        response = admin_client.get(f'/api/menu_items/no-such-category-{number}')
+        assert response.status_code == 200
+        assert response.get_json() == []
+
+    _, categories, entries = restaurant_app.menu_cache._snapshot()
+    assert set(entries) <= set(categories)
+    assert 'Tiffin' in entries
@@ -0,0 +1,135 @@
+"""Printer device validation, send timeouts and the spooler's claim lease."""
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from utils.print_spooler import (
+    PrintSpooler, _write_device, check_printer_device, migrate_print_jobs, send_to_printer
+)
+
+
+@pytest.mark.parametrize('device', [
+    'tcp://192.168.1.50:9100',
+    'tcp://printer.local',
+    '/dev/usb/lp0',
+    '/dev/lp1',
+    '\\\\localhost\\POS58',
+])
+def test_printers_are_accepted(device):
+    check_printer_device(device)
+
+
+@pytest.mark.parametrize('device', [
+    '/tmp/bills.txt',
+    'bills.txt',
+    '/dev/usb/lp0/../../etc/passwd',
+    '/dev/sda',
+    'tcp://printer:0',
+    'tcp://printer:99999',
+    'tcp://user@printer:9100',
+    'http://printer:9100',
+    '\\\\localhost\\POS58\\..\\x',
+    '\\\\..\\share',
+    '\\\\localhost\\..',
+])
+def test_other_devices_are_refused(device):
+    with pytest.raises(ValueError):
+        check_printer_device(device)
+
+
+def test_send_refuses_plain_files(tmp_path):
+    target = tmp_path / 'bills.txt'
+    with pytest.raises(ValueError):
+        send_to_printer(str(target), b'BILL')
+    assert not target.exists()
+
+
+def test_send_writes_to_tcp_printer():
+    received = []
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        def accept():
+            conn, _ = server.accept()
+            with conn:
+                received.append(conn.recv(1024))
+        thread = threading.Thread(target=accept)
+        thread.start()
+        send_to_printer(f'tcp://127.0.0.1:{server.getsockname()[1]}', b'BILL')
+        thread.join(5)
+    assert received == [b'BILL']
+
+
+def test_send_gives_up_on_a_printer_that_never_reads():
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            # Connected (the listen backlog accepts it) but nothing ever reads
+            send_to_printer(f'tcp://127.0.0.1:{server.getsockname()[1]}', b'x' * (32 << 20), timeout=0.5)
+    assert time.monotonic() - started < 5
+
+
+def test_device_write_gives_up_when_the_device_is_full(tmp_path):
+    fifo = str(tmp_path / 'lp0')
+    os.mkfifo(fifo)
+    reader = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)  # Holds the pipe open but never reads
+    try:
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            _write_device(fifo, b'x' * (1 << 20), timeout=0.5)
+        assert time.monotonic() - started < 5
+    finally:
+        os.close(reader)
+
+
+@pytest.fixture
+def spool_db(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'spool.db', check_same_thread=False)
+    migrate_print_jobs(conn.cursor())
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def claimed_job(conn, claimed_at):
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO print_jobs (bill_number, copy_type, payload, status, claimed_at)
+        VALUES ('A01-01-2025/001', 'customer', X'00', 'printing', ?)
+    ''', (claimed_at,))
+    conn.commit()
+    return cursor.lastrowid
+
+
+def job_status(conn, job_id):
+    return conn.execute('SELECT status FROM print_jobs WHERE id = ?', (job_id,)).fetchone()[0]
+
+
+def test_claim_within_its_lease_keeps_the_queue_waiting(spool_db):
+    spooler = PrintSpooler(lambda: spool_db, lambda: 'tcp://127.0.0.1:9', lease=60.0)
+    job_id = claimed_job(spool_db, time.time() - 5)
+    assert spooler._process_next() == spooler.retry_delay
+    assert job_status(spool_db, job_id) == 'printing'
+
+
+def test_claim_past_its_lease_is_taken_back_and_printed(spool_db):
+    received = []
+    with socket.create_server(('127.0.0.1', 0)) as server:
+        def accept():
+            conn, _ = server.accept()
+            with conn:
+                received.append(conn.recv(1024))
+        thread = threading.Thread(target=accept)
+        thread.start()
+        device = f'tcp://127.0.0.1:{server.getsockname()[1]}'
+        spooler = PrintSpooler(lambda: spool_db, lambda: device, lease=60.0)
+        job_id = claimed_job(spool_db, time.time() - 120)  # Its spooler hung two minutes ago
+
+        assert spooler._process_next() == 0
+        assert job_status(spool_db, job_id) == 'pending'
+        assert spooler._process_next() == 0
+        thread.join(5)
+    assert job_status(spool_db, job_id) == 'printed'
+    assert received == [b'\x00']
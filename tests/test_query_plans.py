@@ -0,0 +1,89 @@
+"""EXPLAIN QUERY PLAN checks for the date-range and keyset queries.
+
+Each query must SEARCH its table through the index init_db creates for it,
+so a schema or query change that falls back to a full scan fails here.
+"""
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def db(restaurant_app):
+    conn = sqlite3.connect(restaurant_app.DATABASE_PATH)
+    yield conn
+    conn.close()
+
+
+def query_plan(conn, sql, params=()):
+    """The plan's detail lines, e.g. 'SEARCH bills USING INDEX idx_bills_created_at (created_at>?)'"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def assert_searches(plan, table, index):
+    assert any(line.startswith(f'SEARCH {table} USING ') and f'INDEX {index} ' in line for line in plan), plan
+    assert not any(line.startswith(f'SCAN {table}') for line in plan), plan
+
+
+def test_month_filter_uses_created_at_index(db, restaurant_app):
+    bounds = restaurant_app.created_at_bounds(*restaurant_app.month_bounds('2024-02'))
+    where, params = restaurant_app.created_at_filter(*bounds)
+    plan = query_plan(db, f'SELECT COUNT(*), COALESCE(SUM(total), 0) FROM bills {where}', params)
+    assert_searches(plan, 'bills', 'idx_bills_created_at')
+
+
+def test_bills_keyset_page_uses_created_at_index(db, restaurant_app):
+    bounds = restaurant_app.created_at_bounds(*restaurant_app.date_bounds('2024-01-01', '2024-01-31'))
+    where, params = restaurant_app.created_at_filter(*bounds)
+    plan = query_plan(db, f'''
+        SELECT id, bill_number, subtotal, tax_amount, service_charge, total, created_at
+        FROM bills
+        {where} AND (created_at, id) < (?, ?)
+        ORDER BY created_at DESC, id DESC
+        LIMIT ?
+    ''', params + ['2024-01-15 12:00:00', 42, 51])
+    assert_searches(plan, 'bills', 'idx_bills_created_at')
+    assert not any('TEMP B-TREE' in line for line in plan), plan
+
+
+@pytest.mark.parametrize('table, time_column, index', [
+    ('user_activity_logs', 'created_at', 'idx_user_activity_logs_created_at'),
+    ('user_login_logs', 'login_time', 'idx_user_login_logs_login_time'),
+])
+def test_log_keyset_page_uses_timestamp_index(db, table, time_column, index):
+    plan = query_plan(db, f'''
+        SELECT id FROM {table}
+        WHERE ({time_column}, id) < (?, ?)
+        ORDER BY {time_column} DESC, id DESC
+        LIMIT ?
+    ''', ('2024-01-15 12:00:00', 42, 101))
+    assert_searches(plan, table, index)
+    assert not any('TEMP B-TREE' in line for line in plan), plan
+
+
+def test_open_login_lookup_uses_user_index(db):
+    plan = query_plan(db, '''
+        SELECT id, login_time FROM user_login_logs
+        WHERE username = ? AND logout_time IS NULL
+        ORDER BY login_time DESC LIMIT 1
+    ''', ('admin',))
+    assert_searches(plan, 'user_login_logs', 'idx_user_login_logs_user_open')
+    assert not any('TEMP B-TREE' in line for line in plan), plan
+
+
+def test_live_sales_resync_uses_sale_day_index(db):
+    plan = query_plan(db, 'SELECT COUNT(*), COALESCE(SUM(total), 0) FROM bills WHERE sale_day = ?', ('2024-01-15',))
+    assert_searches(plan, 'bills', 'idx_bills_sale_day')
+
+
+def test_item_analysis_range_uses_rollup_key(db, restaurant_app):
+    where, params = restaurant_app.created_at_filter('2024-01-01', '2024-02-01', column='s.day')
+    plan = query_plan(db, f'''
+        SELECT COALESCE(m.name, MAX(s.name)), SUM(s.qty), SUM(s.amount)
+        FROM daily_item_sales s
+        LEFT JOIN menu m ON m.id = s.menu_id
+        {where}
+        GROUP BY s.item_key
+        ORDER BY SUM(s.amount) DESC
+    ''', params)
+    assert_searches(plan, 's', 'sqlite_autoindex_daily_item_sales_1')
@@ -0,0 +1,76 @@
+"""Bills made just after local midnight belong to the day they are numbered for."""
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+ITEMS = [{'id': None, 'name': 'Tea', 'price': 10, 'quantity': 2}]
+
+
+@pytest.fixture
+def ist():
+    """Run the test with the server on Indian time (UTC+05:30)"""
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'Asia/Kolkata'
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+
+def daily_sales(restaurant_app, day):
+    cursor = restaurant_app.get_db_connection().cursor()
+    cursor.execute('SELECT bill_count, total FROM daily_sales WHERE day = ?', (day,))
+    return cursor.fetchone()
+
+
+def test_batch_bill_after_local_midnight(ist, restaurant_app, admin_client):
+    # 00:30 on 3 March in India is still 2 March in UTC
+    response = admin_client.post('/api/bills/batch', json={'bills': [
+        {'client_id': 'midnight-batch-1', 'items': ITEMS, 'created_at': '2025-03-02T19:00:00Z'}
+    ]})
+    bill = response.get_json()['results'][0]
+    assert bill['bill_number'].endswith('03-03-2025/001')
+    assert bill['created_at'] == '2025-03-02 19:00:00'
+
+    cursor = restaurant_app.get_db_connection().cursor()
+    cursor.execute('SELECT sale_day FROM bills WHERE bill_number = ?', (bill['bill_number'],))
+    assert cursor.fetchone() == ('2025-03-03',)
+    assert daily_sales(restaurant_app, '2025-03-03') == (1, bill['total'])
+    assert daily_sales(restaurant_app, '2025-03-02') is None
+
+    def listed(day):
+        result = admin_client.get('/api/bills', query_string={'from_date': day, 'to_date': day}).get_json()
+        return [row['bill_number'] for row in result['bills']], result['summary']['bill_count']
+
+    assert listed('2025-03-03') == ([bill['bill_number']], 1)
+    assert listed('2025-03-02') == ([], 0)
+
+    analysis = admin_client.get('/api/item_analysis',
+                                query_string={'from_date': '2025-03-03', 'to_date': '2025-03-03'}).get_json()
+    assert [(item['name'], item['quantity']) for item in analysis['item_analysis']] == [('Tea', 2)]
+
+    with restaurant_app.immediate_transaction(restaurant_app.get_db_connection()) as cursor:
+        restaurant_app.rebuild_sales_rollups(cursor)
+    assert daily_sales(restaurant_app, '2025-03-03') == (1, bill['total'])
+
+
+def test_bill_after_local_midnight_counts_as_today(ist, restaurant_app, monkeypatch):
+    class JustAfterMidnight(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            moment = datetime(2025, 4, 1, 0, 5).astimezone()  # 18:35 UTC on 31 March
+            return moment.astimezone(tz) if tz else moment.replace(tzinfo=None)
+
+    monkeypatch.setattr(restaurant_app, 'datetime', JustAfterMidnight)
+    bill = restaurant_app.commit_bill(restaurant_app.get_db_connection(), ITEMS, 0.0, 0.0)
+
+    assert bill['bill_number'].endswith('01-04-2025/001')
+    assert restaurant_app.today_sale_day() == '2025-04-01'
+    assert daily_sales(restaurant_app, '2025-04-01') == (1, bill['total'])
+    day, bill_count, revenue = restaurant_app.live_sales.snapshot()
+    assert (day, bill_count, revenue) == ('2025-04-01', 1, bill['total'])
@@ -5,11 +5,24 @@ This script will:
 2. Update names and prices for existing items
 3. Add new items that don't exist
 4. Ensure all categories exist in the database
+
+Options:
+  --file PATH read the menu from a .json, .ndjson or .csv file instead of MENU_DATA
+  --dry-run   print the changes the sync would make without writing them
+  --prune     also delete menu items that are not in the source data
 """
 
+import os
+import csv
 import sqlite3
 import json
 from datetime import datetime
+from itertools import islice
+
+from utils.menu_keys import (
+    menu_key, category_key, merge_duplicate_menu_items, migrate_menu_keys,
+    migrate_categories, assign_menu_categories
+)
 
 # JSON menu data
 MENU_DATA = {
@@ -240,80 +253,31 @@ MENU_DATA = {
 }
 
 
+def bump_menu_version(cursor):
+    """Bump the menu cache version so running app processes reload the catalogue"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO cache_versions (name, version) VALUES ('menu', 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''')
+
 def format_category_name(category_key):
     """Convert category key (with underscores) to display name"""
     # Replace underscores with spaces and title case
     return category_key.replace('_', ' ').title()
 
-def normalize_category_name(category_name):
-    """Normalize category name to match JSON format"""
-    # Remove spaces around parentheses and normalize
-    normalized = category_name.strip()
-    
-    # Map variations to canonical format from JSON
-    category_mapping = {
-        # Exact matches first
-        'Break Fast': 'Break Fast',
-        'Breakfast': 'Break Fast',
-        'Continental Veg': 'Continental Veg',
-        'Continental (Veg)': 'Continental Veg',
-        'Continental Non Veg': 'Continental Non Veg',
-        'Continental (Non-Veg)': 'Continental Non Veg',
-        'Biryanis Veg': 'Biryanis Veg',
-        'Biryanis (Veg)': 'Biryanis Veg',
-        'Biryanis Non Veg': 'Biryanis Non Veg',
-        'Biryanis (Non-Veg)': 'Biryanis Non Veg',
-        'Curries Veg': 'Curries Veg',
-        'Curries (Veg)': 'Curries Veg',
-        'Curries Non Veg': 'Curries Non Veg',
-        'Curries (Non-Veg)': 'Curries Non Veg',
-        'Fried Rice Veg': 'Fried Rice Veg',
-        'Fried Rice (Veg)': 'Fried Rice Veg',
-        'Fried Rice Non Veg': 'Fried Rice Non Veg',
-        'Fried Rice (Non-Veg)': 'Fried Rice Non Veg',
-        'Noodles Veg': 'Noodles Veg',
-        'Noodles (Veg)': 'Noodles Veg',
-        'Noodles Non Veg': 'Noodles Non Veg',
-        'Noodles (Non-Veg)': 'Noodles Non Veg',
-        'Soups Veg': 'Soups Veg',
-        'Soups (Veg)': 'Soups Veg',
-        'Soups Non Veg': 'Soups Non Veg',
-        'Soups (Non-Veg)': 'Soups Non Veg',
-        'Starters Veg': 'Starters Veg',
-        'Starters (Veg)': 'Starters Veg',
-        'Starters Non Veg': 'Starters Non Veg',
-        'Starters (Non-Veg)': 'Starters Non Veg',
-        'Tandoori Veg': 'Tandoori Veg',
-        'Tandoori (Veg)': 'Tandoori Veg',
-        'Tandoori Non Veg': 'Tandoori Non Veg',
-        'Tandoori (Non-Veg)': 'Tandoori Non Veg',
-        'Pasta Pizza': 'Pasta Pizza',
-        'Pasta': 'Pasta Pizza',
-        'Pizza': 'Pasta Pizza',
-    }
-    
-    # Try exact match first
-    if normalized in category_mapping:
-        return category_mapping[normalized]
-    
-    # Try case-insensitive match
-    normalized_upper = normalized.upper()
-    for key, mapped_value in category_mapping.items():
-        if key.upper() == normalized_upper:
-            return mapped_value
-    
-    # Remove spaces around parentheses
-    normalized = normalized.replace(' (', '(').replace('( ', '(').replace(' )', ')').replace(') ', ')')
-    
-    # Try again with cleaned name
-    if normalized in category_mapping:
-        return category_mapping[normalized]
-    
-    # Return original if no mapping found
-    return normalized
-
 def cleanup_category_duplicates():
-    """Merge duplicate categories and update items to use canonical category names"""
+    """Rename spelling variants of each category to its canonical name.
+
+    Variants share a ``category_key`` (and so one ``categories`` row), so a
+    single UPDATE joined on the key rewrites ``menu.category`` to the
+    category's name and links ``category_id``.
+    """
     db_path = 'database/restaurant.db'
     
     try:
@@ -325,89 +289,37 @@ def cleanup_category_duplicates():
         print("=" * 60)
         print()
         
-        # Get all unique categories
-        cursor.execute('SELECT DISTINCT category FROM menu ORDER BY category')
-        all_categories = [row[0] for row in cursor.fetchall()]
-        
-        # Group categories by normalized name
-        category_groups = {}
-        for category in all_categories:
-            normalized = normalize_category_name(category)
-            if normalized not in category_groups:
-                category_groups[normalized] = []
-            category_groups[normalized].append(category)
+        # Key columns and the categories table on first run
+        migrate_menu_keys(cursor)
+        migrate_categories(cursor)
         
-        # Find duplicate groups (categories that normalize to the same name)
-        duplicates_found = 0
-        items_moved = 0
-        categories_deleted = 0
+        cursor.execute('''
+            SELECT COUNT(*) FROM (
+                SELECT category_key FROM menu GROUP BY category_key HAVING COUNT(DISTINCT category) > 1
+            )
+        ''')
+        duplicates_found = cursor.fetchone()[0]
+        cursor.execute('''
+            UPDATE menu SET category = c.name, category_id = c.id
+            FROM categories c
+            WHERE c.category_key = menu.category_key
+              AND (menu.category != c.name OR menu.category_id IS NOT c.id)
+        ''')
+        items_moved = cursor.rowcount
         
-        for canonical_category, category_variants in category_groups.items():
-            if len(category_variants) > 1:
-                duplicates_found += 1
-                print(f"\nDuplicate categories found for: '{canonical_category}'")
-                print(f"  Variants: {', '.join(category_variants)}")
-                
-                # Choose the canonical category (prefer the one matching JSON format)
-                # Check which variant matches the JSON format exactly
-                canonical_variant = None
-                for variant in category_variants:
-                    if variant == canonical_category:
-                        canonical_variant = variant
-                        break
-                
-                # If no exact match, prefer the one closest to JSON format
-                if not canonical_variant:
-                    # Prefer variants without parentheses, then shorter names
-                    category_variants_sorted = sorted(category_variants, 
-                                                      key=lambda x: (
-                                                          '(' in x,  # False (no parentheses) comes first
-                                                          len(x),    # Shorter names preferred
-                                                          x          # Alphabetical tiebreaker
-                                                      ))
-                    canonical_variant = category_variants_sorted[0]
-                
-                # But always use the canonical category name from JSON (not the variant)
-                # This ensures consistency with JSON format
-                canonical_variant = canonical_category
-                
-                print(f"  Using canonical: '{canonical_variant}'")
-                
-                # Update all items from duplicate categories to use canonical category
-                for variant in category_variants:
-                    if variant != canonical_variant:
-                        # Get count of items in this variant
-                        cursor.execute('SELECT COUNT(*) FROM menu WHERE category = ?', (variant,))
-                        count = cursor.fetchone()[0]
-                        
-                        if count > 0:
-                            # Update items to use canonical category
-                            cursor.execute(
-                                'UPDATE menu SET category = ? WHERE category = ?',
-                                (canonical_variant, variant)
-                            )
-                            items_moved += count
-                            print(f"  Moved {count} items from '{variant}' to '{canonical_variant}'")
-                        
-                        # Check if category is now empty
-                        cursor.execute('SELECT COUNT(*) FROM menu WHERE category = ?', (variant,))
-                        if cursor.fetchone()[0] == 0:
-                            # Category is empty (all items moved), but we can't delete it
-                            # because categories are just strings in the menu table
-                            categories_deleted += 1
-                            print(f"  Category '{variant}' is now empty")
+        if items_moved:
+            bump_menu_version(cursor)
+        conn.commit()
+        conn.close()
         
-        if duplicates_found == 0:
+        if duplicates_found == 0 and items_moved == 0:
             print("No duplicate categories found!")
         else:
-            conn.commit()
-            print()
             print("=" * 60)
             print(f"Merged {duplicates_found} duplicate category groups")
             print(f"Moved {items_moved} items to canonical categories")
             print("=" * 60)
         
-        conn.close()
         return duplicates_found, items_moved
         
     except sqlite3.Error as e:
@@ -418,7 +330,7 @@ def cleanup_category_duplicates():
         return 0, 0
 
 def cleanup_duplicates():
-    """Remove duplicate menu items (case-insensitive duplicates)"""
+    """Remove duplicate menu items (same normalized name and category key)"""
     db_path = 'database/restaurant.db'
     
     try:
@@ -430,63 +342,22 @@ def cleanup_duplicates():
         print("=" * 60)
         print()
         
-        # Find duplicates (case-insensitive by name and category)
-        cursor.execute('''
-            SELECT 
-                UPPER(name) as upper_name,
-                UPPER(category) as upper_category,
-                COUNT(*) as count
-            FROM menu
-            GROUP BY UPPER(name), UPPER(category)
-            HAVING COUNT(*) > 1
-        ''')
+        def report(keep_item, delete_items):
+            print(f"Duplicate: '{keep_item[5]}' in '{keep_item[4]}'")
+            print(f"  Keeping: {keep_item[1]} (₹{keep_item[3]}) [ID: {keep_item[0]}]")
+            for item in delete_items:
+                print(f"  Deleting: {item[1]} (₹{item[3]}) [ID: {item[0]}]")
+            print()
         
-        duplicates = cursor.fetchall()
+        # Adds the key columns and UNIQUE index on first run; afterwards the
+        # index rejects duplicates and only rows without keys can collide
+        total_deleted = migrate_menu_keys(cursor)
+        total_deleted += merge_duplicate_menu_items(cursor, report)
         
-        if not duplicates:
+        if total_deleted:
+            bump_menu_version(cursor)
+        else:
             print("No duplicates found!")
-            conn.close()
-            return 0
-        
-        print(f"Found {len(duplicates)} duplicate groups\n")
-        
-        total_deleted = 0
-        
-        for upper_name, upper_category, count in duplicates:
-            # Get all items with this name (case-insensitive) and category
-            cursor.execute('''
-                SELECT id, name, category, price 
-                FROM menu 
-                WHERE UPPER(name) = ? AND UPPER(category) = ?
-                ORDER BY id
-            ''', (upper_name, upper_category))
-            
-            items = cursor.fetchall()
-            
-            if len(items) > 1:
-                # Prefer uppercase names from JSON (like "BOOST/HORLICKS" over "Boost/Horlicks")
-                uppercase_item = next((x for x in items if x[1].isupper()), None)
-                
-                if uppercase_item:
-                    # Keep the uppercase version (from JSON)
-                    keep_item = uppercase_item
-                    delete_items = [x for x in items if x[0] != uppercase_item[0]]
-                else:
-                    # No uppercase version, keep the first one
-                    keep_item = items[0]
-                    delete_items = items[1:]
-                
-                print(f"Duplicate: '{upper_name}' in '{upper_category}'")
-                print(f"  Keeping: {keep_item[1]} (₹{keep_item[3]}) [ID: {keep_item[0]}]")
-                
-                # Delete duplicates
-                for item in delete_items:
-                    print(f"  Deleting: {item[1]} (₹{item[3]}) [ID: {item[0]}]")
-                    cursor.execute('DELETE FROM menu WHERE id = ?', (item[0],))
-                    total_deleted += 1
-                
-                print()
-        
         conn.commit()
         conn.close()
         
@@ -503,107 +374,387 @@ def cleanup_duplicates():
         print(f"\n✗ Unexpected error: {e}")
         return 0
 
-def update_menu_database():
-    """Update menu database from JSON data"""
+SYNC_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 50
+MENU_FILE_FORMATS = {'.json': 'json', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.csv': 'csv'}
+
+def expand_menu_item(category_name, item_data):
+    """Validate one source item and return its (category, name, price) rows.
+
+    Items priced as ``price_bone``/``price_boneless`` become two rows,
+    "<NAME> (BONE)" and "<NAME> (BONELESS)". Raises ValueError for rows
+    without a category, name or valid price.
+    """
+    category_name = str(category_name or '').strip()
+    item_name = str(item_data.get('item') or item_data.get('name') or '').strip()
+    if not category_name:
+        raise ValueError('missing category')
+    if not item_name:
+        raise ValueError('missing item name')
+    
+    def parse_price(field):
+        value = item_data.get(field)
+        if value in (None, ''):
+            return None
+        try:
+            price = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"'{item_name}': {field} {value!r} is not a number")
+        if price <= 0:
+            raise ValueError(f"'{item_name}': {field} must be positive")
+        return price
+    
+    # Handle items with multiple price options
+    price = parse_price('price')
+    price_bone = parse_price('price_bone')
+    price_boneless = parse_price('price_boneless')
+    
+    if price_bone and price_boneless:
+        # Remove "BONE/BONELESS" from name if present, then add (BONE) and (BONELESS)
+        base_name = item_name.replace(" BONE/BONELESS", "").replace("BONE/BONELESS", "").strip()
+        return [
+            (category_name, f"{base_name} (BONE)", price_bone),
+            (category_name, f"{base_name} (BONELESS)", price_boneless)
+        ]
+    if price:
+        return [(category_name, item_name, price)]
+    raise ValueError(f"'{item_name}': no price information")
+
+def menu_source_rows(menu_data):
+    """Flatten menu data ({category_key: [items]}) into (category, name, price) rows"""
+    for category_key, items in menu_data.items():
+        category_name = format_category_name(category_key)
+        for item_data in items:
+            try:
+                yield from expand_menu_item(category_name, item_data)
+            except ValueError as e:
+                print(f"  ⚠ Skipping {e}")
+
+class JsonStream:
+    """Incremental reader for one large JSON document.
+
+    Only the current array element is held in memory, so a catalogue of
+    any size is read in roughly constant space.
+    """
+    
+    def __init__(self, f, chunk_size=65536):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """Return the next non-whitespace character ('' at end of input)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+    
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected {char!r}")
+        self.pos += 1
+    
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+    
+    def array_items(self):
+        """Yield the elements of the array starting at the current position"""
+        self.expect('[')
+        while self.peek() != ']':
+            yield self.value()
+            if self.peek() == ',':
+                self.pos += 1
+        self.expect(']')
+
+def iter_json_menu(f):
+    """Yield (category, item) from {category_key: [items]} or [{category, item, ...}] JSON"""
+    stream = JsonStream(f)
+    first = stream.peek()
+    if first == '[':
+        for item_data in stream.array_items():
+            yield item_data.get('category'), item_data
+    elif first == '{':
+        stream.expect('{')
+        while stream.peek() != '}':
+            category_key = stream.value()
+            stream.expect(':')
+            if stream.peek() == '[':
+                for item_data in stream.array_items():
+                    yield format_category_name(category_key), item_data
+            else:
+                stream.value()  # Not a category list; ignore
+            if stream.peek() == ',':
+                stream.pos += 1
+        stream.expect('}')
+    else:
+        raise ValueError('Invalid JSON: expected an object or array')
+
+def iter_ndjson_menu(f):
+    """Yield (category, item) from one JSON object per line"""
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item_data = json.loads(line)
+        except ValueError as e:
+            # Reported as an invalid row instead of aborting the whole file
+            yield None, ValueError(f"invalid JSON ({e})")
+            continue
+        yield (item_data.get('category') if isinstance(item_data, dict) else None), item_data
+
+def iter_csv_menu(f):
+    """Yield (category, item) from CSV with category,item,price[,price_bone,price_boneless] columns"""
+    for item_data in csv.DictReader(f):
+        yield item_data.get('category'), item_data
+
+def menu_format_for(filename):
+    """Pick the parser format from a file name (None if unsupported)"""
+    return MENU_FILE_FORMATS.get(os.path.splitext(filename.lower())[1])
+
+class MenuFileReader:
+    """Iterate validated (category, name, price) rows from a JSON, NDJSON or CSV text stream.
+
+    Invalid rows are skipped and counted in ``invalid``; the first
+    MAX_REPORTED_ERRORS messages are kept in ``errors``.
+    """
+    
+    readers = {'json': iter_json_menu, 'ndjson': iter_ndjson_menu, 'csv': iter_csv_menu}
+    
+    def __init__(self, f, file_format):
+        self.f = f
+        self.file_format = file_format
+        self.invalid = 0
+        self.errors = []
+    
+    def __iter__(self):
+        for index, (category, item_data) in enumerate(self.readers[self.file_format](self.f), start=1):
+            try:
+                if isinstance(item_data, ValueError):
+                    raise item_data
+                if not isinstance(item_data, dict):
+                    raise ValueError('expected an object')
+                yield from expand_menu_item(category, item_data)
+            except ValueError as e:
+                self.invalid += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append(f"Row {index}: {e}")
+
+def print_menu_change(change):
+    """Default diff printer for sync_menu()"""
+    action, item_id, category, old_name, old_price, name, price = change
+    if action == 'add':
+        print(f"  + Added: {name} (₹{price}) in {category}")
+    elif action == 'update':
+        print(f"  ✓ Updated: {old_name} → {name} (₹{old_price} → ₹{price}) in {category}")
+    else:
+        print(f"  - Deleted: {old_name} (₹{old_price}) in {category} [ID: {item_id}]")
+
+def _fetch_batches(cursor, size=SYNC_BATCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            return
+        yield from rows
+
+def sync_menu(conn, rows, dry_run=False, prune=False, on_change=print_menu_change):
+    """Bring the menu table in line with source rows using set-based SQL.
+
+    Rows are streamed into a temp table keyed on ``category_key``/
+    ``name_key`` in batches of SYNC_BATCH_SIZE. Inserts, updates and
+    (with ``prune``) deletes are computed with one query each against the
+    UNIQUE key index on ``menu`` into a temp diff table, reported through
+    ``on_change`` and applied with ``executemany`` in a single transaction,
+    so memory use does not grow with the size of the source. With
+    ``dry_run`` the transaction is rolled back. Returns a dict of counts.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        migrate_menu_keys(cursor)
+        migrate_categories(cursor)
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS menu_source (
+                category_key TEXT NOT NULL,
+                name_key TEXT NOT NULL,
+                category TEXT NOT NULL,
+                name TEXT NOT NULL,
+                price REAL NOT NULL,
+                PRIMARY KEY (category_key, name_key)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS menu_sync_diff (
+                action TEXT NOT NULL,
+                item_id INTEGER,
+                category TEXT,
+                old_name TEXT,
+                old_price REAL,
+                name TEXT,
+                price REAL,
+                category_key TEXT,
+                name_key TEXT
+            )
+        ''')
+        cursor.execute('DELETE FROM menu_source')
+        cursor.execute('DELETE FROM menu_sync_diff')
+        
+        # Later rows win if the source lists an item twice
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, SYNC_BATCH_SIZE))
+            if not batch:
+                break
+            cursor.executemany(
+                'INSERT OR REPLACE INTO menu_source VALUES (?, ?, ?, ?, ?)',
+                ((category_key(category), menu_key(name), category, name, price)
+                 for category, name, price in batch)
+            )
+        
+        cursor.execute('''
+            INSERT INTO menu_sync_diff (action, category, name, price, category_key, name_key)
+            SELECT 'add', s.category, s.name, s.price, s.category_key, s.name_key FROM menu_source s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM menu m
+                WHERE m.category_key = s.category_key AND m.name_key = s.name_key
+            )
+        ''')
+        cursor.execute('''
+            INSERT INTO menu_sync_diff (action, item_id, category, old_name, old_price, name, price)
+            SELECT 'update', m.id, m.category, m.name, m.price, s.name, s.price
+            FROM menu_source s
+            JOIN menu m ON m.category_key = s.category_key AND m.name_key = s.name_key
+            WHERE m.name != s.name OR m.price != s.price
+        ''')
+        if prune:
+            cursor.execute('''
+                INSERT INTO menu_sync_diff (action, item_id, category, old_name, old_price)
+                SELECT 'delete', m.id, m.category, m.name, m.price FROM menu m
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM menu_source s
+                    WHERE s.category_key = m.category_key AND s.name_key = m.name_key
+                )
+            ''')
+        
+        cursor.execute('SELECT action, COUNT(*) FROM menu_sync_diff GROUP BY action')
+        counts = dict(cursor.fetchall())
+        cursor.execute('SELECT COUNT(*) FROM menu_source')
+        source_count = cursor.fetchone()[0]
+        
+        if on_change:
+            cursor.execute('''
+                SELECT action, item_id, category, old_name, old_price, name, price
+                FROM menu_sync_diff ORDER BY category, COALESCE(name, old_name)
+            ''')
+            for change in _fetch_batches(cursor):
+                on_change(change)
+        
+        if not dry_run:
+            # Separate cursors stream the diff while the writes go through ``cursor``
+            reader = conn.cursor()
+            reader.execute('''
+                SELECT name, category, price, name_key, category_key
+                FROM menu_sync_diff WHERE action = 'add'
+            ''')
+            cursor.executemany(
+                "INSERT INTO menu (name, category, price, description, name_key, category_key) VALUES (?, ?, ?, '', ?, ?)",
+                _fetch_batches(reader)
+            )
+            # New rows (and new categories) get their category_id in one pass
+            assign_menu_categories(cursor)
+            reader.execute("SELECT name, price, item_id FROM menu_sync_diff WHERE action = 'update'")
+            cursor.executemany('UPDATE menu SET name = ?, price = ? WHERE id = ?', _fetch_batches(reader))
+            reader.execute("SELECT item_id FROM menu_sync_diff WHERE action = 'delete'")
+            cursor.executemany('DELETE FROM menu WHERE id = ?', _fetch_batches(reader))
+            if counts:
+                bump_menu_version(cursor)
+            conn.commit()
+        else:
+            conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # Temp tables live as long as the connection, which may be pooled
+        cursor.execute('DROP TABLE IF EXISTS temp.menu_source')
+        cursor.execute('DROP TABLE IF EXISTS temp.menu_sync_diff')
+    
+    return {
+        'added': counts.get('add', 0),
+        'updated': counts.get('update', 0),
+        'deleted': counts.get('delete', 0),
+        'unchanged': source_count - counts.get('add', 0) - counts.get('update', 0)
+    }
+
+def update_menu_database(dry_run=False, prune=False, source_path=None):
+    """Update menu database from a menu file (JSON/NDJSON/CSV) or the built-in MENU_DATA"""
     db_path = 'database/restaurant.db'
     
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        stats = {
-            'updated': 0,
-            'added': 0,
-            'skipped': 0,
-            'errors': 0
-        }
-        
         print("=" * 60)
-        print("MENU DATABASE UPDATE SCRIPT")
+        print("MENU DATABASE UPDATE SCRIPT" + (" (DRY RUN - nothing will be written)" if dry_run else ""))
         print("=" * 60)
         print()
         
-        # Process each category
-        for category_key, items in MENU_DATA.items():
-            category_name = format_category_name(category_key)
-            print(f"\nProcessing category: {category_name}")
-            print("-" * 60)
-            
-            # Process each item in the category
-            for item_data in items:
-                item_name = item_data.get('item', '').strip()
-                if not item_name:
-                    stats['skipped'] += 1
-                    continue
-                
-                # Handle items with multiple price options
-                price = item_data.get('price')
-                price_bone = item_data.get('price_bone')
-                price_boneless = item_data.get('price_boneless')
-                
-                if price_bone and price_boneless:
-                    # Create separate entries for bone and boneless
-                    # Remove "BONE/BONELESS" from name if present, then add (BONE) and (BONELESS)
-                    base_name = item_name.replace(" BONE/BONELESS", "").replace("BONE/BONELESS", "").strip()
-                    items_to_process = [
-                        (f"{base_name} (BONE)", price_bone),
-                        (f"{base_name} (BONELESS)", price_boneless)
-                    ]
-                elif price:
-                    items_to_process = [(item_name, price)]
-                else:
-                    print(f"  ⚠ Skipping '{item_name}': No price information")
-                    stats['skipped'] += 1
-                    continue
-                
-                for processed_name, processed_price in items_to_process:
-                    try:
-                        # Check if item exists in this category (case-insensitive comparison)
-                        cursor.execute(
-                            'SELECT id, name, price FROM menu WHERE UPPER(name) = UPPER(?) AND UPPER(category) = UPPER(?)',
-                            (processed_name, category_name)
-                        )
-                        existing = cursor.fetchone()
-                        
-                        if existing:
-                            item_id, db_name, db_price = existing
-                            # Update if name (case) or price changed
-                            if db_name.upper() != processed_name.upper() or db_price != processed_price:
-                                cursor.execute(
-                                    'UPDATE menu SET name = ?, price = ? WHERE id = ?',
-                                    (processed_name, processed_price, item_id)
-                                )
-                                print(f"  ✓ Updated: {db_name} → {processed_name} (₹{db_price} → ₹{processed_price})")
-                                stats['updated'] += 1
-                            else:
-                                print(f"  - No change: {processed_name} (₹{processed_price})")
-                                stats['skipped'] += 1
-                        else:
-                            # Item doesn't exist, add it
-                            cursor.execute(
-                                'INSERT INTO menu (name, category, price, description) VALUES (?, ?, ?, ?)',
-                                (processed_name, category_name, processed_price, '')
-                            )
-                            print(f"  + Added: {processed_name} (₹{processed_price})")
-                            stats['added'] += 1
-                            
-                    except sqlite3.Error as e:
-                        print(f"  ✗ Error processing '{processed_name}': {e}")
-                        stats['errors'] += 1
-                        continue
-        
-        # Commit all changes
-        conn.commit()
+        if source_path:
+            file_format = menu_format_for(source_path)
+            if not file_format:
+                raise ValueError(f"Unsupported menu file type: {source_path} (use .json, .ndjson or .csv)")
+            print(f"Reading menu from {source_path}")
+            with open(source_path, encoding='utf-8-sig', newline='') as f:
+                reader = MenuFileReader(f, file_format)
+                stats = sync_menu(conn, reader, dry_run=dry_run, prune=prune)
+            for error in reader.errors:
+                print(f"  ⚠ Skipped {error}")
+            if reader.invalid > len(reader.errors):
+                print(f"  ⚠ ... and {reader.invalid - len(reader.errors)} more invalid rows")
+        else:
+            stats = sync_menu(conn, menu_source_rows(MENU_DATA), dry_run=dry_run, prune=prune)
         
         # Print summary
         print()
         print("=" * 60)
-        print("UPDATE SUMMARY")
+        print("UPDATE SUMMARY" + (" (DRY RUN)" if dry_run else ""))
         print("=" * 60)
         print(f"Items Updated:  {stats['updated']}")
         print(f"Items Added:    {stats['added']}")
-        print(f"Items Skipped:  {stats['skipped']}")
-        print(f"Errors:         {stats['errors']}")
+        print(f"Items Deleted:  {stats['deleted']}")
+        print(f"Unchanged:      {stats['unchanged']}")
         print("=" * 60)
         print("\nDatabase update completed successfully!")
         
@@ -627,6 +778,10 @@ def update_menu_database():
 if __name__ == '__main__':
     import sys
     
+    dry_run = '--dry-run' in sys.argv
+    prune = '--prune' in sys.argv
+    source_path = sys.argv[sys.argv.index('--file') + 1] if '--file' in sys.argv[:-1] else None
+    
     # Check if user wants to only cleanup duplicates
     if len(sys.argv) > 1 and sys.argv[1] == '--cleanup-only':
         deleted = cleanup_duplicates()
@@ -634,26 +789,16 @@ if __name__ == '__main__':
     elif len(sys.argv) > 1 and sys.argv[1] == '--cleanup-categories-only':
         duplicates, items_moved = cleanup_category_duplicates()
         print(f"\n✓ Category cleanup completed! Merged {duplicates} duplicate category groups.")
+    elif dry_run:
+        # Show what the sync would change; the cleanup steps are skipped
+        success = update_menu_database(dry_run=True, prune=prune, source_path=source_path)
     else:
-        # First cleanup duplicate categories
-        print("Step 1: Cleaning up duplicate categories...")
-        print()
-        duplicates, items_moved = cleanup_category_duplicates()
-        print()
-        
-        # Then cleanup duplicate items
-        print("Step 2: Cleaning up duplicate menu items...")
-        print()
-        deleted = cleanup_duplicates()
-        print()
-        
-        # Finally update the database
-        print("Step 3: Updating menu database...")
-        print()
-        success = update_menu_database()
+        # sync_menu runs the key and category migrations itself, which merge
+        # duplicate items and link spelling variants to one category; --cleanup-only and
+        # --cleanup-categories-only run those passes on their own
+        success = update_menu_database(prune=prune, source_path=source_path)
         
         if success:
             print("\n✓ Script completed successfully!")
         else:
             print("\n✗ Script completed with errors!")
-
@@ -1,16 +1,94 @@
 import os
+import json
 import sqlite3
 import time
 import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlparse
 
 import requests
 import imghdr
+from requests.adapters import HTTPAdapter
+
+try:
+    from utils.thumbnails import generate_thumbnails
+    from utils.image_store import store_image
+except ImportError:  # run as a script from utils/
+    from thumbnails import generate_thumbnails
+    from image_store import store_image
 
 
 DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'restaurant.db')
 IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images')
+# Progress of the current run; deleted once its DB updates are committed
+JOURNAL_PATH = os.path.join(os.path.dirname(DATABASE_PATH), 'image_download_journal.jsonl')
+
+# Provider endpoints; override with --provider-url NAME=URL (e.g. a local stub server)
+PROVIDER_URLS = {
+    'wikipedia': 'https://en.wikipedia.org/w/api.php',
+    'unsplash': 'https://source.unsplash.com',
+    'loremflickr': 'https://loremflickr.com',
+    'placehold': 'https://placehold.co',
+}
+
+DEFAULT_WORKERS = 8
+
+
+class RateLimiter:
+    """Spaces out requests so at most one starts every ``interval`` seconds"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.interval
+        if start_at > now:
+            time.sleep(start_at - now)
+
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiters = {}
+_request_interval = 0.5
+
+
+def configure_http(workers=DEFAULT_WORKERS, interval=0.5):
+    """Size the shared connection pool and set the per-provider request interval"""
+    global _session, _request_interval
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=len(PROVIDER_URLS) * 2, pool_maxsize=max(workers, 1))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = 'FoodEngine-ImageFetcher/1.0 (+https://local.app)'
+    with _session_lock:
+        _session = session
+        _request_interval = interval
+        _rate_limiters.clear()
+
+
+def _get_session():
+
+    if _session is None:
+        configure_http()
+    return _session
+
+
+def _rate_limiter_for(url):
+
+    # One limiter per host, so each provider (and its image CDN) is throttled separately
+    host = urlparse(url).netloc
+    with _session_lock:
+        limiter = _rate_limiters.get(host)
+        if limiter is None:
+            limiter = _rate_limiters[host] = RateLimiter(_request_interval)
+    return limiter
 
 
 def ensure_directories():
@@ -36,10 +114,8 @@ def slugify(value):
 
 def _http_get(url, timeout):
 
-    headers = {
-        'User-Agent': 'FoodEngine-ImageFetcher/1.0 (+https://local.app)'
-    }
-    response = requests.get(url, timeout=timeout, allow_redirects=True, headers=headers)
+    _rate_limiter_for(url).wait()
+    response = _get_session().get(url, timeout=timeout, allow_redirects=True)
     response.raise_for_status()
     return response
 
@@ -59,7 +135,7 @@ def _fetch_from_wikipedia(query: str, width: int, height: int, timeout: int):
     # Use Wikipedia API to get a page thumbnail; no API key required
     cleaned = _clean_query(query)
     api = (
-        'https://en.wikipedia.org/w/api.php?'
+        f"{PROVIDER_URLS['wikipedia']}?"
         'action=query&format=json&prop=pageimages&piprop=thumbnail&'
         f'pithumbsize={max(width, height)}&redirects=1&'
         f'generator=search&gsrsearch={quote_plus(cleaned)}&gsrlimit=1'
@@ -97,11 +173,11 @@ def fetch_image_for_query(query, width=640, height=480, timeout=15, retries=3, p
     if 'wikipedia' in provider_order:
         providers.append(lambda: ('wikipedia', None))
     if 'unsplash' in provider_order:
-        providers.append(lambda: f"https://source.unsplash.com/{width}x{height}/?{encoded_query}")
+        providers.append(lambda: f"{PROVIDER_URLS['unsplash']}/{width}x{height}/?{encoded_query}")
     if 'loremflickr' in provider_order:
         # LoremFlickr supports comma-separated tags
         alt_query = encoded_query.replace('+', ',')
-        providers.append(lambda: f"https://loremflickr.com/{width}/{height}/{alt_query}")
+        providers.append(lambda: f"{PROVIDER_URLS['loremflickr']}/{width}/{height}/{alt_query}")
 
     for make_url in providers:
         backoff = 0.75
@@ -146,7 +222,7 @@ def fetch_image_for_query(query, width=640, height=480, timeout=15, retries=3, p
 
     # Final fallback: small generated image from placehold.co to avoid failure
     try:
-        fallback = _http_get(f"https://placehold.co/{width}x{height}.jpg?text=Food", timeout)
+        fallback = _http_get(f"{PROVIDER_URLS['placehold']}/{width}x{height}.jpg?text=Food", timeout)
         return fallback.content, 'image/jpeg'
     except Exception:
         if last_error:
@@ -154,10 +230,16 @@ def fetch_image_for_query(query, width=640, height=480, timeout=15, retries=3, p
         raise RuntimeError('All providers failed and no placeholder available')
 
 
-def update_menu_image(conn, item_id, filename):
+def update_menu_images(conn, updates):
 
+    # One transaction for the whole run instead of a commit per item
     cursor = conn.cursor()
-    cursor.execute('UPDATE menu SET image=? WHERE id=?', (filename, item_id))
+    cursor.executemany('UPDATE menu SET image=?, image_variants=? WHERE id=?', updates)
+    # Let running app processes reload the catalogue
+    cursor.execute('''
+        INSERT INTO cache_versions (name, version) VALUES ('menu', 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''')
     conn.commit()
 
 
@@ -168,24 +250,93 @@ def get_menu_items(conn):
     return cursor.fetchall()
 
 
-def download_images(overwrite=False, delay=0.5, only_missing=True):
+def load_journal(path=None):
+
+    # Items fetched by an interrupted run whose DB update was never committed
+    path = path or JOURNAL_PATH
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partial last line from an interrupted write
+            if os.path.exists(os.path.join(IMAGES_DIR, record['filename'])):
+                done[record['id']] = record
+    return done
+
+
+def download_item_image(item_id, name, category, provider_order=None):
+
+    query = f"{name} {category} food"
+    content, content_type = fetch_image_for_query(query, provider_order=provider_order)
+
+    # Validate image bytes via imghdr and size
+    detected = imghdr.what(None, h=content)
+    min_bytes = 2048  # Avoid saving tiny/invalid responses
+    if not detected and content_type.startswith('image/'):
+        # Map some content types to imghdr names
+        if content_type.endswith('jpeg'):
+            detected = 'jpeg'
+        elif content_type.endswith('png'):
+            detected = 'png'
+        elif content_type.endswith('gif'):
+            detected = 'gif'
+
+    if not detected or len(content) < min_bytes:
+        raise ValueError(f"Invalid image (type={detected}, size={len(content)} bytes)")
+
+    # Enforce supported formats (jpeg/png/gif). Avoid webp as app disallows it.
+    if detected not in ('jpeg', 'png', 'gif'):
+        raise ValueError(f"Unsupported image format: {detected}")
+
+    # Stored under a hash of the bytes; providers often return the same photo for similar dishes
+    filename = store_image(IMAGES_DIR, content, detected)
+
+    variants = generate_thumbnails(IMAGES_DIR, filename)
+    return {
+        'id': item_id,
+        'filename': filename,
+        'image_variants': json.dumps(variants) if variants else None,
+        'detail': f"{detected}, {len(content)} bytes"
+    }
+
+
+def download_images(overwrite=False, delay=0.5, only_missing=True, workers=DEFAULT_WORKERS,
+                    provider_order=None, resume=True):
 
     ensure_directories()
 
     if not os.path.exists(DATABASE_PATH):
         raise FileNotFoundError(f"Database not found at {DATABASE_PATH}")
 
+    # delay is now the minimum gap between requests to the same provider
+    configure_http(workers=workers, interval=delay)
+
+    if not resume and os.path.exists(JOURNAL_PATH):
+        os.remove(JOURNAL_PATH)
+    journal = load_journal()
+
     conn = sqlite3.connect(DATABASE_PATH)
     try:
         items = get_menu_items(conn)
         total = len(items)
         print(f"Found {total} menu items")
 
-        downloaded = 0
         skipped = 0
         errors = 0
+        updates = []
+        pending = []
 
         for item_id, name, category, image in items:
+            if item_id in journal:
+                record = journal[item_id]
+                updates.append((record['filename'], record['image_variants'], item_id))
+                print(f"[RESUME] {name} -> {record['filename']}")
+                continue
+
             image_path_on_disk = os.path.join(IMAGES_DIR, image) if image else None
             has_db_image = bool(image)
             file_missing = has_db_image and not os.path.exists(image_path_on_disk)
@@ -201,53 +352,42 @@ def download_images(overwrite=False, delay=0.5, only_missing=True):
                 print(f"[SKIP] {name} -> {reason}")
                 continue
 
-            query = f"{name} {category} food"
-            base_filename = slugify(name)
-            filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_')}{base_filename}.jpg"
-            file_path = os.path.join(IMAGES_DIR, filename)
-
-            try:
-                content, content_type = fetch_image_for_query(query)
-
-                # Validate image bytes via imghdr and size
-                detected = imghdr.what(None, h=content)
-                min_bytes = 2048  # Avoid saving tiny/invalid responses
-                if not detected and content_type.startswith('image/'):
-                    # Map some content types to imghdr names
-                    if content_type.endswith('jpeg'):
-                        detected = 'jpeg'
-                    elif content_type.endswith('png'):
-                        detected = 'png'
-                    elif content_type.endswith('gif'):
-                        detected = 'gif'
-
-                if not detected or len(content) < min_bytes:
-                    raise ValueError(f"Invalid image (type={detected}, size={len(content)} bytes)")
-
-                # Enforce supported formats (jpeg/png/gif). Avoid webp as app disallows it.
-                if detected not in ('jpeg', 'png', 'gif'):
-                    raise ValueError(f"Unsupported image format: {detected}")
-
-                # Adjust extension based on detected type
-                ext = 'jpg' if detected == 'jpeg' else detected
-                filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_')}{base_filename}.{ext}"
-                file_path = os.path.join(IMAGES_DIR, filename)
-
-                with open(file_path, 'wb') as f:
-                    f.write(content)
-
-                update_menu_image(conn, item_id, filename)
-                downloaded += 1
-                print(f"[OK] {name} -> {filename} ({detected}, {len(content)} bytes)")
-            except Exception as e:
-                errors += 1
-                print(f"[ERR] {name}: {e}")
-
-            if delay > 0:
-                time.sleep(delay)
+            pending.append((item_id, name, category))
+
+        executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+        try:
+            with open(JOURNAL_PATH, 'a') as journal_file:
+                futures = {
+                    executor.submit(download_item_image, item_id, name, category, provider_order): name
+                    for item_id, name, category in pending
+                }
+                for done_count, future in enumerate(as_completed(futures), start=1):
+                    name = futures[future]
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        errors += 1
+                        print(f"[{done_count}/{len(pending)}] [ERR] {name}: {e}")
+                        continue
+
+                    journal_file.write(json.dumps(record) + '\n')
+                    journal_file.flush()
+                    updates.append((record['filename'], record['image_variants'], record['id']))
+                    print(f"[{done_count}/{len(pending)}] [OK] {name} -> {record['filename']} ({record['detail']})")
+        except KeyboardInterrupt:
+            # Drop the queued downloads instead of waiting for all of them;
+            # the journal lets the next run carry on from here
+            executor.shutdown(wait=False, cancel_futures=True)
+            print(f"\nInterrupted. Fetched images are kept in {JOURNAL_PATH}; run again to resume")
+            raise
+        executor.shutdown()
+
+        if updates:
+            update_menu_images(conn, updates)
+        os.remove(JOURNAL_PATH)
 
         print("")
-        print(f"Completed. Downloaded: {downloaded}, Skipped: {skipped}, Errors: {errors}")
+        print(f"Completed. Downloaded: {len(updates)}, Skipped: {skipped}, Errors: {errors}")
     finally:
         conn.close()
 
@@ -257,11 +397,24 @@ def main():
     parser = argparse.ArgumentParser(description='Download images for menu items and update database')
     parser.add_argument('--overwrite', action='store_true', help='Overwrite existing images')
     parser.add_argument('--no-only-missing', action='store_true', help='Process all items, not only those missing images')
-    parser.add_argument('--delay', type=float, default=0.5, help='Delay between downloads (seconds)')
+    parser.add_argument('--delay', type=float, default=0.5, help='Minimum delay between requests to the same provider (seconds)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Number of concurrent downloads')
+    parser.add_argument('--providers', help='Comma-separated provider order (default: wikipedia,unsplash,loremflickr)')
+    parser.add_argument('--provider-url', action='append', default=[], metavar='NAME=URL',
+                        help='Override a provider endpoint, e.g. loremflickr=http://127.0.0.1:8000')
+    parser.add_argument('--no-resume', action='store_true', help='Discard the journal of an interrupted run')
     args = parser.parse_args()
 
+    for override in args.provider_url:
+        provider, _, url = override.partition('=')
+        if provider not in PROVIDER_URLS or not url:
+            parser.error(f"Invalid --provider-url {override!r}")
+        PROVIDER_URLS[provider] = url.rstrip('/')
+
     only_missing = not args.no_only_missing
-    download_images(overwrite=args.overwrite, delay=args.delay, only_missing=only_missing)
+    provider_order = args.providers.split(',') if args.providers else None
+    download_images(overwrite=args.overwrite, delay=args.delay, only_missing=only_missing,
+                    workers=args.workers, provider_order=provider_order, resume=not args.no_resume)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,77 @@
+from datetime import datetime
+
+
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INITIALIZE = ESC + b'@'
+ALIGN_LEFT = ESC + b'a\x00'
+ALIGN_CENTER = ESC + b'a\x01'
+BOLD_ON = ESC + b'E\x01'
+BOLD_OFF = ESC + b'E\x00'
+DOUBLE_SIZE = GS + b'!\x11'
+NORMAL_SIZE = GS + b'!\x00'
+# Feed past the tear bar, then partial cut
+FEED_AND_CUT = ESC + b'd\x04' + GS + b'V\x01'
+
+# Characters per line in Font A: 32 on 58mm paper, 48 on 80mm
+PAPER_WIDTHS = {'58': 32, '80': 48}
+# Qty / Price / Amt column widths; the item name gets the rest
+NUMBER_COLUMNS = (4, 8, 9)
+
+
+def encode(text):
+    """Encode text for the printer's default code page (PC437).
+
+    The rupee sign is not in any common printer code page, so it is
+    spelled out; other unsupported characters (e.g. Telugu) print as '?'.
+    """
+    return str(text).replace('₹', 'Rs.').encode('cp437', errors='replace')
+
+
+def item_row(name, quantity, price, amount, width):
+    """One bill line; names too long for their column get a line of their own"""
+    name_width = width - sum(NUMBER_COLUMNS)
+    qty_width, price_width, amount_width = NUMBER_COLUMNS
+    numbers = f"{quantity:>{qty_width}}{price:>{price_width}}{amount:>{amount_width}}"
+    if len(name) <= name_width:
+        return [f"{name:<{name_width}}{numbers}"]
+    return [name[:width], f"{'':<{name_width}}{numbers}"]
+
+
+def render_bill(bill, settings, copy_type='student', width=32, printed_at=None):
+    """Render the bill_print.html layout as ESC/POS bytes for a thermal printer.
+
+    ``bill`` and ``settings`` are the dicts the template receives. Like the
+    HTML page, date and time are those of printing.
+    """
+    printed_at = printed_at or datetime.now()
+    divider = '-' * width
+    out = [INITIALIZE, ALIGN_CENTER]
+
+    out += [encode('Original' if copy_type != 'kitchen' else 'Duplicate'), b'\n']
+    out += [BOLD_ON, DOUBLE_SIZE, encode(settings.get('restaurant_name', '')), b'\n', NORMAL_SIZE, BOLD_OFF]
+    if settings.get('restaurant_phone'):
+        out += [encode(settings['restaurant_phone']), b'\n']
+    if settings.get('restaurant_gst'):
+        out += [encode(f"GST: {settings['restaurant_gst']}"), b'\n']
+
+    out.append(ALIGN_LEFT)
+    lines = [
+        f"Bill No: {bill['bill_number']}",
+        f"Date: {printed_at.strftime('%d/%m/%Y')}",
+        f"Time: {printed_at.strftime('%I:%M:%S %p')}",
+        divider,
+        *item_row('Item', 'Qty', 'Price', 'Amt', width),
+    ]
+    for item in bill['bill_items']:
+        price = item.get('price') or 0
+        quantity = item.get('quantity') or 0
+        lines += item_row(str(item.get('name', '')), quantity, f"{price:.2f}", f"{price * quantity:.2f}", width)
+    lines.append(divider)
+    out += [encode('\n'.join(lines)), b'\n']
+
+    total = f"Rs.{bill['total']:.2f}"
+    out += [BOLD_ON, encode(f"{'TOTAL:':<{width - len(total)}}{total}"), b'\n', BOLD_OFF]
+    out.append(FEED_AND_CUT)
+    return b''.join(out)
@@ -0,0 +1,157 @@
+import os
+import re
+import json
+import hashlib
+import sqlite3
+import argparse
+import threading
+
+try:
+    from utils.thumbnails import generate_thumbnails, THUMBNAIL_DIR
+except ImportError:  # run as a script from utils/
+    from thumbnails import generate_thumbnails, THUMBNAIL_DIR
+
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'restaurant.db')
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images')
+
+HASH_LENGTH = 32
+# <hash>.<ext> originals and <hash>-<width>.<ext> thumbnails; safe to cache forever
+CONTENT_ADDRESSED_NAME = re.compile(r'^[0-9a-f]{%d}(-\d+)?\.[a-z0-9]+$' % HASH_LENGTH)
+# Names written before the store existed (%Y%m%d_%H%M%S_name)
+LEGACY_UPLOAD_NAME = re.compile(r'^\d{8}_\d{6}_')
+
+
+def store_image(images_dir, data, extension):
+    """Save image bytes under a hash of their content and return the filename.
+
+    Identical bytes map to the same name, so re-uploading or re-downloading
+    a photo reuses the existing file instead of adding another copy.
+    """
+    extension = extension.lower().lstrip('.')
+    if extension == 'jpeg':
+        extension = 'jpg'
+    filename = f"{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}.{extension}"
+    path = os.path.join(images_dir, filename)
+    if not os.path.exists(path):
+        os.makedirs(images_dir, exist_ok=True)
+        # Write then rename so a reader never sees a partial file under the final name
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # Unique per writer thread
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    return filename
+
+
+def is_managed_image(filename):
+    """True for files the store owns (hash-named or legacy timestamped uploads)"""
+    return bool(CONTENT_ADDRESSED_NAME.match(filename) or LEGACY_UPLOAD_NAME.match(filename))
+
+
+def _bump_menu_version(cursor):
+
+    # Let running app processes reload the catalogue
+    cursor.execute('''
+        INSERT INTO cache_versions (name, version) VALUES ('menu', 1)
+        ON CONFLICT(name) DO UPDATE SET version = version + 1
+    ''')
+
+
+def migrate_images(conn, images_dir=IMAGES_DIR, dry_run=False):
+    """Move menu images from timestamped names into the content-addressed store"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, name, image FROM menu WHERE image IS NOT NULL')
+    updates = []
+    for item_id, name, image in cursor.fetchall():
+        if CONTENT_ADDRESSED_NAME.match(image):
+            continue
+        path = os.path.join(images_dir, image)
+        if not os.path.exists(path):
+            print(f"[SKIP] {name} -> {image} not found")
+            continue
+        extension = os.path.splitext(image)[1] or '.jpg'
+        if dry_run:
+            print(f"[DRY] {name} -> {image}")
+            updates.append(None)
+            continue
+
+        with open(path, 'rb') as f:
+            filename = store_image(images_dir, f.read(), extension)
+        variants = generate_thumbnails(images_dir, filename)
+        updates.append((filename, json.dumps(variants) if variants else None, item_id))
+        print(f"[OK] {name} -> {filename}")
+
+    if updates and not dry_run:
+        cursor.executemany('UPDATE menu SET image = ?, image_variants = ? WHERE id = ?', updates)
+        _bump_menu_version(cursor)
+        conn.commit()
+    return len(updates)
+
+
+def referenced_images(conn):
+    """Filenames (relative to the images dir) referenced by any menu row"""
+    cursor = conn.cursor()
+    cursor.execute('SELECT image, image_variants FROM menu WHERE image IS NOT NULL')
+    referenced = set()
+    for image, image_variants in cursor.fetchall():
+        referenced.add(image)
+        try:
+            variants = json.loads(image_variants) if image_variants else []
+        except ValueError:
+            variants = []
+        referenced.update(variant['file'] for variant in variants)
+    return referenced
+
+
+def collect_garbage(conn, images_dir=IMAGES_DIR, dry_run=False):
+    """Delete managed image files that no menu row references"""
+    referenced = referenced_images(conn)
+    removed = 0
+    freed = 0
+    for subdir in ('', THUMBNAIL_DIR):
+        directory = os.path.join(images_dir, subdir)
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            relative = f"{subdir}/{filename}" if subdir else filename
+            path = os.path.join(directory, filename)
+            if not os.path.isfile(path) or relative in referenced:
+                continue
+            # Thumbnails are always generated; originals only if the store wrote them
+            if not subdir and not is_managed_image(filename):
+                continue
+            size = os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+            removed += 1
+            freed += size
+            print(f"[{'DRY' if dry_run else 'DEL'}] {relative} ({size // 1024} KB)")
+    return removed, freed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Manage the content-addressed menu image store')
+    parser.add_argument('command', choices=['migrate', 'gc'],
+                        help='migrate: rename existing images to content hashes; gc: delete unreferenced images')
+    parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+    args = parser.parse_args()
+
+    if not os.path.exists(DATABASE_PATH):
+        raise FileNotFoundError(f"Database not found at {DATABASE_PATH}")
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        if args.command == 'migrate':
+            count = migrate_images(conn, dry_run=args.dry_run)
+            print(f"Completed. {'Would migrate' if args.dry_run else 'Migrated'} {count} images")
+        else:
+            removed, freed = collect_garbage(conn, dry_run=args.dry_run)
+            print(f"Completed. {'Would remove' if args.dry_run else 'Removed'} {removed} files ({freed // 1024} KB)")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+
+    main()
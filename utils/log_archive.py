@@ -0,0 +1,252 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+
+# Archived log tables: (timestamp column, columns, archive DDL)
+ARCHIVED_LOGS = {
+    'user_activity_logs': ('created_at', (
+        'id', 'username', 'activity_type', 'activity_description', 'bill_number', 'created_at'
+    ), '''
+        CREATE TABLE IF NOT EXISTS {schema}.user_activity_logs (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            activity_description TEXT NOT NULL,
+            bill_number TEXT,
+            created_at TIMESTAMP
+        )
+    '''),
+    'user_login_logs': ('login_time', (
+        'id', 'username', 'role', 'login_time', 'logout_time', 'session_duration', 'ip_address', 'user_agent'
+    ), '''
+        CREATE TABLE IF NOT EXISTS {schema}.user_login_logs (
+            id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL,
+            login_time TIMESTAMP,
+            logout_time TIMESTAMP,
+            session_duration INTEGER,
+            ip_address TEXT,
+            user_agent TEXT
+        )
+    '''),
+}
+
+# Rows moved per transaction, so billing never waits long on the write lock
+ARCHIVE_CHUNK_ROWS = 5000
+
+# Archive month for rows whose timestamp is missing or not 'YYYY-MM-...';
+# it sorts before every real month, so these rows are read last
+UNDATED_MONTH = '0000-00'
+DATED = "{column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-*'"
+
+
+def archive_path(archive_dir, month):
+    """Archive database for a 'YYYY-MM' month"""
+    return os.path.join(archive_dir, f'logs-{month}.db')
+
+
+def archive_files(archive_dir):
+    """[(month, path)] of existing archives, newest first"""
+    paths = glob.glob(os.path.join(archive_dir, 'logs-????-??.db'))
+    return sorted(((os.path.basename(path)[5:12], path) for path in paths), reverse=True)
+
+
+def next_month(month):
+    year, number = map(int, month.split('-'))
+    return f'{year + number // 12:04d}-{number % 12 + 1:02d}'
+
+
+def archive_logs(conn, archive_dir, retention_days, chunk_rows=ARCHIVE_CHUNK_ROWS):
+    """Move log rows older than ``retention_days`` into monthly archive databases.
+
+    Rows go to ``logs-YYYY-MM.db`` by the month of their timestamp, keeping
+    their ids. Rows with a NULL or malformed timestamp can't be dated, so
+    they are treated as old and go to ``logs-0000-00.db``. Each chunk is
+    copied and committed before it is deleted from the main database, so
+    an interrupted run leaves at worst rows in both places, which the next
+    run skips (``INSERT OR IGNORE``) and deletes. Returns the number of
+    rows moved per table.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    os.makedirs(archive_dir, exist_ok=True)
+    if conn.in_transaction:
+        conn.commit()
+    cursor = conn.cursor()
+
+    moved = {}
+    for table, (time_column, columns, _) in ARCHIVED_LOGS.items():
+        moved[table] = 0
+        dated = DATED.format(column=time_column)
+        cursor.execute(f'''
+            SELECT DISTINCT substr({time_column}, 1, 7) FROM {table} WHERE {time_column} < ? AND {dated}
+        ''', (cutoff,))
+        for (month,) in cursor.fetchall():
+            # Rows of this month that are past the cutoff
+            moved[table] += _move_rows(conn, archive_dir, table, month,
+                                       f'{time_column} >= ? AND {time_column} < ? AND {time_column} < ?',
+                                       (f'{month}-01', f'{next_month(month)}-01', cutoff), chunk_rows)
+        moved[table] += _move_rows(conn, archive_dir, table, UNDATED_MONTH,
+                                   f'{time_column} IS NULL OR NOT ({dated})', (), chunk_rows)
+    return moved
+
+
+def _move_rows(conn, archive_dir, table, month, condition, params, chunk_rows):
+    """Move the rows of ``table`` matching ``condition`` into the archive for ``month``"""
+    time_column, columns, _ = ARCHIVED_LOGS[table]
+    column_list = ', '.join(columns)
+    select_ids = f'SELECT id FROM main.{table} WHERE ({condition}) ORDER BY {time_column}, id LIMIT ?'
+    if month == UNDATED_MONTH:
+        # Don't create an empty archive on every run
+        if conn.execute(f'SELECT 1 FROM main.{table} WHERE ({condition}) LIMIT 1', params).fetchone() is None:
+            return 0
+
+    moved = 0
+    conn.execute('ATTACH DATABASE ? AS log_archive', (archive_path(archive_dir, month),))
+    try:
+        for _, _, ddl in ARCHIVED_LOGS.values():
+            conn.execute(ddl.format(schema='log_archive'))
+        conn.execute(f'CREATE INDEX IF NOT EXISTS log_archive.idx_{table}_{time_column} ON {table}({time_column})')
+        conn.commit()
+        while True:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute(select_ids, (*params, chunk_rows))
+                ids = json.dumps([row[0] for row in cursor.fetchall()])
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO log_archive.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table} WHERE id IN (SELECT value FROM json_each(?))
+                ''', (ids,))
+                conn.commit()
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.execute(f'DELETE FROM main.{table} WHERE id IN (SELECT value FROM json_each(?))', (ids,))
+                count = cursor.rowcount
+                conn.commit()
+            except sqlite3.Error:
+                conn.rollback()
+                raise
+            moved += count
+            if count < chunk_rows:
+                return moved
+    finally:
+        conn.execute('DETACH DATABASE log_archive')
+
+
+def compact_database(conn, convert=False):
+    """Return free pages to the filesystem and truncate the WAL.
+
+    Free pages can only be released once the database uses incremental
+    auto-vacuum. New databases are created with it (see ConnectionPool in
+    app.py); an older database needs one full VACUUM, which rewrites the
+    file under an exclusive lock, so that only happens with
+    ``convert=True`` (``python app.py --archive-logs``). Until then only
+    the WAL is truncated.
+    """
+    if conn.in_transaction:
+        conn.commit()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        # Frees one page per step; execute() would only take the first
+        conn.executescript('PRAGMA incremental_vacuum')
+    elif convert:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+
+
+def read_archived_logs(archive_dir, table, limit, before=None):
+    """Newest rows of a log table from the archives, newest first.
+
+    ``before`` is a ``(timestamp, id)`` keyset cursor: only rows that sort
+    after it (older, or as old with a lower id) are returned. Archives are
+    opened read-only, newest month first, until ``limit`` rows are found.
+    Rows are tuples in the order of ``ARCHIVED_LOGS[table]`` columns.
+    """
+    time_column, columns, _ = ARCHIVED_LOGS[table]
+    where, params = '', []
+    if before is not None:
+        where = f'WHERE ({time_column}, id) < (?, ?)'
+        params = list(before)
+    rows = []
+    for month, path in archive_files(archive_dir):
+        if len(rows) >= limit:
+            break
+        if before is not None and f'{month}-01' > before[0]:
+            continue
+        with closing(sqlite3.connect(f'{Path(path).resolve().as_uri()}?mode=ro', uri=True)) as archive:
+            try:
+                rows += archive.execute(f'''
+                    SELECT {', '.join(columns)} FROM {table}
+                    {where}
+                    ORDER BY {time_column} DESC, id DESC LIMIT ?
+                ''', params + [limit - len(rows)]).fetchall()
+            except sqlite3.OperationalError as e:
+                print(f"Error reading log archive {path}: {e}")
+    return rows
+
+
+class LogArchiver:
+    """Background thread that archives old log rows once a day.
+
+    ``get_retention_days`` returns the configured retention (0 keeps logs
+    forever). The database is compacted after a run that moved rows; the
+    daily run never does the one-time VACUUM (see ``compact_database``).
+    """
+
+    def __init__(self, connect, archive_dir, get_retention_days, interval=24 * 60 * 60, first_delay=60.0):
+        self.connect = connect
+        self.archive_dir = archive_dir
+        self.get_retention_days = get_retention_days
+        self.interval = interval
+        self.first_delay = first_delay
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def run_once(self, convert=False):
+        """Archive and compact now; returns rows moved per table ({} when retention is off).
+
+        ``convert`` is for the command-line run: it compacts even when
+        nothing was moved and lets compact_database switch on incremental
+        auto-vacuum with a full VACUUM.
+        """
+        with self._lock:
+            retention_days = self.get_retention_days()
+            if retention_days <= 0:
+                return {}
+            conn = self.connect()
+            moved = archive_logs(conn, self.archive_dir, retention_days)
+            if convert or any(moved.values()):
+                compact_database(conn, convert)
+            return moved
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='log-archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        wait = self.first_delay
+        while not self._wake.wait(wait) and not self._stopping:
+            try:
+                moved = self.run_once()
+                if any(moved.values()):
+                    print(f"Archived old logs: {moved}")
+            except Exception as e:
+                print(f"Log archiving error: {e}")
+            wait = self.interval
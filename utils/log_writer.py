@@ -0,0 +1,162 @@
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# Columns written for each log table; the last one is the row's timestamp
+LOG_INSERTS = {
+    'user_activity_logs': '''
+        INSERT INTO user_activity_logs (username, activity_type, activity_description, bill_number, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+    'user_login_logs': '''
+        INSERT INTO user_login_logs (username, role, ip_address, user_agent, login_time)
+        VALUES (?, ?, ?, ?, ?)
+    ''',
+}
+
+
+def log_timestamp():
+    """Current UTC time in the format of SQLite's CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class LogWriter:
+    """Background thread that writes log rows in batches.
+
+    ``write()`` puts a row on a bounded queue and returns; the thread
+    inserts queued rows with one ``executemany`` per table and a single
+    commit once ``max_rows`` have built up or ``flush_interval`` seconds
+    have passed since the first of them. Rows are timestamped when they
+    are queued, not when they are written.
+
+    When the queue is full the caller waits up to ``put_timeout`` for room
+    and then writes its row itself, so a stalled writer slows requests
+    down rather than losing rows. ``stop()`` writes whatever is still
+    queued.
+
+    ``connect`` returns a database connection usable from the writer
+    thread. ``pool`` (``acquire()``/``release(conn)``) lends the caller a
+    connection of its own for the full-queue fallback, so the row is never
+    committed on the caller's connection in the middle of its work.
+    """
+
+    def __init__(self, connect, pool, max_rows=200, flush_interval=0.25, max_queue=5000, put_timeout=0.5,
+                 retry_delay=0.5, stop_attempts=3):
+        self.connect = connect
+        self.pool = pool
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_delay = retry_delay
+        self.stop_attempts = stop_attempts
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stopping = False
+        self._thread = None
+
+    def write(self, table, row):
+        """Queue a row (without its timestamp) for ``table``, one of LOG_INSERTS"""
+        item = (table, (*row, log_timestamp()))
+        self.start()
+        try:
+            self._queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            # The writer can't keep up: write on the caller's thread rather than drop the row
+            conn = self.pool.acquire()
+            try:
+                self._insert(conn, [item])
+            finally:
+                self.pool.release(conn)
+
+    def flush(self, timeout=5.0):
+        """Wait until the rows queued so far are written; False on timeout"""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        written = threading.Event()
+        try:
+            self._queue.put(written, timeout=timeout)
+        except queue.Full:
+            return False
+        return written.wait(timeout)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Write the queued rows and stop the thread"""
+        if self._thread is None:
+            return
+        self._stopping = True
+        try:
+            self._queue.put_nowait(None)  # Wake the thread if it is idle
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            rows, waiters = self._collect()
+            if rows:
+                self._write(rows)
+            for written in waiters:
+                written.set()
+
+    def _collect(self):
+        """Take the next batch off the queue: (rows, flush events to signal after writing it)"""
+        rows, waiters = [], []
+        try:
+            item = self._queue.get(timeout=None if not self._stopping else 0)
+        except queue.Empty:
+            return rows, waiters
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                break  # Someone is waiting on this batch: write it now
+            if item is not None:
+                rows.append(item)
+            if len(rows) >= self.max_rows:
+                break
+            try:
+                # Once stopping, only take what is already queued
+                remaining = 0 if self._stopping else max(deadline - time.monotonic(), 0)
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+        return rows, waiters
+
+    def _write(self, rows):
+        """Insert a batch, retrying while the database is busy"""
+        attempts = 0
+        while True:
+            try:
+                self._insert(self.connect(), rows)
+                return
+            except sqlite3.Error as e:
+                attempts += 1
+                print(f"Log writer error (attempt {attempts}, {len(rows)} rows): {e}")
+                if self._stopping and attempts >= self.stop_attempts:
+                    print(f"Log writer stopping: {len(rows)} log rows were not written")
+                    return
+                time.sleep(self.retry_delay)
+
+    @staticmethod
+    def _insert(conn, rows):
+        cursor = conn.cursor()
+        try:
+            for table, sql in LOG_INSERTS.items():
+                table_rows = [row for row_table, row in rows if row_table == table]
+                if table_rows:
+                    cursor.executemany(sql, table_rows)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
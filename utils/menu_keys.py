@@ -0,0 +1,255 @@
+import re
+import sqlite3
+from functools import lru_cache
+from itertools import groupby
+
+
+def menu_key(text):
+    """Normalized form of a menu name for case/spacing-insensitive matching.
+
+    Upper-cases, collapses runs of whitespace and standardizes spacing
+    around parentheses, so "Idly(2)", "IDLY (2)" and "idly ( 2 )" share
+    one key.
+    """
+    key = ' '.join(str(text or '').upper().split())
+    key = re.sub(r'\(\s*', '(', key)
+    key = re.sub(r'\s*\)', ')', key)
+    key = re.sub(r'\s*\(', ' (', key)
+    return key.strip()
+
+
+def normalize_category_name(category_name):
+    """Normalize category name to match JSON format"""
+    # Remove spaces around parentheses and normalize
+    normalized = category_name.strip()
+    
+    # Map variations to canonical format from JSON
+    category_mapping = {
+        # Exact matches first
+        'Break Fast': 'Break Fast',
+        'Breakfast': 'Break Fast',
+        'Continental Veg': 'Continental Veg',
+        'Continental (Veg)': 'Continental Veg',
+        'Continental Non Veg': 'Continental Non Veg',
+        'Continental (Non-Veg)': 'Continental Non Veg',
+        'Biryanis Veg': 'Biryanis Veg',
+        'Biryanis (Veg)': 'Biryanis Veg',
+        'Biryanis Non Veg': 'Biryanis Non Veg',
+        'Biryanis (Non-Veg)': 'Biryanis Non Veg',
+        'Curries Veg': 'Curries Veg',
+        'Curries (Veg)': 'Curries Veg',
+        'Curries Non Veg': 'Curries Non Veg',
+        'Curries (Non-Veg)': 'Curries Non Veg',
+        'Fried Rice Veg': 'Fried Rice Veg',
+        'Fried Rice (Veg)': 'Fried Rice Veg',
+        'Fried Rice Non Veg': 'Fried Rice Non Veg',
+        'Fried Rice (Non-Veg)': 'Fried Rice Non Veg',
+        'Noodles Veg': 'Noodles Veg',
+        'Noodles (Veg)': 'Noodles Veg',
+        'Noodles Non Veg': 'Noodles Non Veg',
+        'Noodles (Non-Veg)': 'Noodles Non Veg',
+        'Soups Veg': 'Soups Veg',
+        'Soups (Veg)': 'Soups Veg',
+        'Soups Non Veg': 'Soups Non Veg',
+        'Soups (Non-Veg)': 'Soups Non Veg',
+        'Starters Veg': 'Starters Veg',
+        'Starters (Veg)': 'Starters Veg',
+        'Starters Non Veg': 'Starters Non Veg',
+        'Starters (Non-Veg)': 'Starters Non Veg',
+        'Tandoori Veg': 'Tandoori Veg',
+        'Tandoori (Veg)': 'Tandoori Veg',
+        'Tandoori Non Veg': 'Tandoori Non Veg',
+        'Tandoori (Non-Veg)': 'Tandoori Non Veg',
+        'Pasta Pizza': 'Pasta Pizza',
+        'Pasta': 'Pasta Pizza',
+        'Pizza': 'Pasta Pizza',
+    }
+    
+    # Try exact match first
+    if normalized in category_mapping:
+        return category_mapping[normalized]
+    
+    # Try case-insensitive match
+    normalized_upper = normalized.upper()
+    for key, mapped_value in category_mapping.items():
+        if key.upper() == normalized_upper:
+            return mapped_value
+    
+    # Remove spaces around parentheses
+    normalized = normalized.replace(' (', '(').replace('( ', '(').replace(' )', ')').replace(') ', ')')
+    
+    # Try again with cleaned name
+    if normalized in category_mapping:
+        return category_mapping[normalized]
+    
+    # Return original if no mapping found
+    return normalized
+
+
+@lru_cache(maxsize=1024)
+def category_key(category_name):
+    """Normalized category key; spelling variants of one category share it"""
+    return menu_key(normalize_category_name(' '.join(str(category_name or '').split())))
+
+
+def _preferred_item(items):
+    # Prefer uppercase names from JSON (like "BOOST/HORLICKS" over "Boost/Horlicks"), then the oldest row
+    return next((item for item in items if item[1].isupper()), items[0])
+
+
+def merge_duplicate_menu_items(cursor, report=None):
+    """Delete all but one row of each (category_key, name_key) group.
+
+    Bill lines and item rollups that point at a removed row are repointed
+    at the kept one. ``report(kept, removed)`` is called per group.
+    Returns the number of rows deleted.
+    """
+    cursor.execute('''
+        SELECT id, name, category, price, category_key, name_key
+        FROM menu
+        WHERE (category_key, name_key) IN (
+            SELECT category_key, name_key FROM menu
+            GROUP BY category_key, name_key
+            HAVING COUNT(*) > 1
+        )
+        ORDER BY category_key, name_key, id
+    ''')
+    repoint = []
+    for _, group in groupby(cursor.fetchall(), key=lambda row: (row[4], row[5])):
+        items = list(group)
+        keep = _preferred_item(items)
+        removed = [item for item in items if item[0] != keep[0]]
+        repoint.extend((keep[0], item[0]) for item in removed)
+        if report:
+            report(keep, removed)
+
+    if repoint:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bill_lines'")
+        if cursor.fetchone():
+            cursor.executemany('UPDATE bill_lines SET menu_id = ? WHERE menu_id = ?', repoint)
+        _merge_item_sales(cursor, repoint)
+        cursor.executemany('DELETE FROM menu WHERE id = ?', [(old_id,) for _, old_id in repoint])
+    return len(repoint)
+
+
+def _merge_item_sales(cursor, repoint):
+    """Fold the daily_item_sales rows of merged menu items into the kept item's rows"""
+    cursor.execute("SELECT name FROM pragma_table_info('daily_item_sales')")
+    columns = {row[0] for row in cursor.fetchall()}
+    if not columns:
+        return
+    if 'item_key' not in columns:
+        # Name-keyed table from before item_key; init_db rebuilds it from bill_lines
+        cursor.executemany('UPDATE daily_item_sales SET menu_id = ? WHERE menu_id = ?', repoint)
+        return
+    cursor.executemany('''
+        INSERT INTO daily_item_sales (day, item_key, menu_id, name, qty, amount)
+        SELECT day, 'id:' || ?1, ?1, name, qty, amount FROM daily_item_sales WHERE menu_id = ?2
+        ON CONFLICT(day, item_key) DO UPDATE SET
+            qty = qty + excluded.qty,
+            amount = amount + excluded.amount
+    ''', repoint)
+    cursor.executemany('DELETE FROM daily_item_sales WHERE menu_id = ?', [(old_id,) for _, old_id in repoint])
+
+
+def migrate_menu_keys(cursor):
+    """Add and backfill menu.name_key/category_key and enforce their uniqueness.
+
+    Safe to run repeatedly; only rows without keys are backfilled. Existing
+    duplicates are merged before the UNIQUE index is created. Returns the
+    number of duplicate rows merged.
+    """
+    for column in ('name_key', 'category_key'):
+        try:
+            cursor.execute(f'ALTER TABLE menu ADD COLUMN {column} TEXT')
+        except sqlite3.OperationalError:
+            pass  # Column already exists
+
+    cursor.execute('SELECT id, name, category FROM menu WHERE name_key IS NULL OR category_key IS NULL')
+    rows = cursor.fetchall()
+    if rows:
+        cursor.executemany(
+            'UPDATE menu SET name_key = ?, category_key = ? WHERE id = ?',
+            [(menu_key(name), category_key(category), item_id) for item_id, name, category in rows]
+        )
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_menu_key'")
+    if cursor.fetchone():
+        return 0
+
+    merged = merge_duplicate_menu_items(cursor)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_menu_key ON menu(category_key, name_key)')
+    # Superseded by the stored keys
+    cursor.execute('DROP INDEX IF EXISTS idx_menu_match_key')
+    return merged
+
+
+def ensure_category(cursor, name):
+    """Return the categories.id for name, creating the category at the end of the order"""
+    key = category_key(name)
+    cursor.execute('SELECT id FROM categories WHERE category_key = ?', (key,))
+    row = cursor.fetchone()
+    if row:
+        return row[0]
+    cursor.execute('''
+        INSERT INTO categories (name, category_key, sort_order)
+        VALUES (?, ?, (SELECT COALESCE(MAX(sort_order), 0) + 1 FROM categories))
+    ''', (normalize_category_name(' '.join(name.split())), key))
+    return cursor.lastrowid
+
+
+def assign_menu_categories(cursor):
+    """Link menu rows without a category_id to their category, creating missing ones.
+
+    New categories are appended after the existing order, alphabetically
+    among themselves. Returns the number of categories created.
+    """
+    cursor.execute('''
+        SELECT DISTINCT m.category_key, m.category FROM menu m
+        WHERE m.category_id IS NULL
+          AND NOT EXISTS (SELECT 1 FROM categories c WHERE c.category_key = m.category_key)
+        ORDER BY m.category
+    ''')
+    names = {}
+    for key, category in cursor.fetchall():
+        names.setdefault(key, normalize_category_name(' '.join(category.split())))
+
+    if names:
+        cursor.execute('SELECT COALESCE(MAX(sort_order), 0) FROM categories')
+        start = cursor.fetchone()[0] + 1
+        cursor.executemany(
+            'INSERT INTO categories (name, category_key, sort_order) VALUES (?, ?, ?)',
+            [(name, key, start + position)
+             for position, (key, name) in enumerate(sorted(names.items(), key=lambda entry: entry[1]))]
+        )
+
+    cursor.execute('''
+        UPDATE menu SET category_id = (SELECT c.id FROM categories c WHERE c.category_key = menu.category_key)
+        WHERE category_id IS NULL
+    ''')
+    return len(names)
+
+
+def migrate_categories(cursor):
+    """Create the categories table and link every menu row to it via menu.category_id.
+
+    Requires the key columns from migrate_menu_keys. Safe to run
+    repeatedly; existing categories keep their names and order.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            name_te TEXT,
+            sort_order INTEGER NOT NULL DEFAULT 0,
+            category_key TEXT NOT NULL UNIQUE
+        )
+    ''')
+    try:
+        cursor.execute('ALTER TABLE menu ADD COLUMN category_id INTEGER REFERENCES categories(id)')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+
+    created = assign_menu_categories(cursor)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_menu_category_name ON menu(category_id, name)')
+    return created
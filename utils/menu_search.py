@@ -0,0 +1,172 @@
+import re
+import sqlite3
+import unicodedata
+
+
+SEARCH_COLUMNS = ('name', 'name_te', 'description', 'description_te')
+# bm25() weights per column: a hit in a name outranks one in a description
+COLUMN_WEIGHTS = (10.0, 10.0, 1.0, 1.0)
+
+# unicode61 treats combining marks as separators, which would split Telugu
+# words at every vowel sign and virama; keep them inside tokens instead
+TELUGU_MARKS = ''.join(
+    chr(codepoint) for codepoint in range(0x0C00, 0x0C80)
+    if unicodedata.category(chr(codepoint)).startswith('M')
+)
+TOKENIZER = f"unicode61 remove_diacritics 2 tokenchars '{TELUGU_MARKS}'"
+
+# Characters with meaning in FTS5 query syntax (or that never form tokens)
+QUERY_PUNCTUATION = re.compile(r'["*^:()+\-/\\,.&]+')
+SHORT_CODE = re.compile(r'^[a-z]{2,6}$')
+# Scoring every hit of a one- or two-letter prefix costs more than the
+# ranking is worth; above this many matches results come back unranked
+RANKED_MATCH_LIMIT = 2000
+NAME_COLUMNS = '{name name_te}'
+
+
+def migrate_menu_search(cursor):
+    """Create the menu_fts full-text index over menu and the triggers that keep it in sync.
+
+    menu_fts is an external-content FTS5 table (rowid = menu.id), so the
+    text is stored once in ``menu``. The index is rebuilt from ``menu``
+    when first created. Returns False if this SQLite build lacks FTS5.
+    """
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'menu_fts'")
+    exists = cursor.fetchone() is not None
+    columns = ', '.join(SEARCH_COLUMNS)
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS menu_fts USING fts5(
+                {columns},
+                content='menu', content_rowid='id',
+                prefix='1 2 3',
+                tokenize="{TOKENIZER}"
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"Menu search index unavailable: {e}")
+        return False
+    # Term list for the typo-tolerant fallback
+    cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS menu_fts_vocab USING fts5vocab(menu_fts, 'row')")
+
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS menu_fts_insert AFTER INSERT ON menu BEGIN
+            INSERT INTO menu_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS menu_fts_delete AFTER DELETE ON menu BEGIN
+            INSERT INTO menu_fts (menu_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+        END
+    ''')
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS menu_fts_update AFTER UPDATE OF {columns} ON menu BEGIN
+            INSERT INTO menu_fts (menu_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO menu_fts (rowid, {columns}) VALUES (new.id, {new_values});
+        END
+    ''')
+
+    if not exists:
+        cursor.execute("INSERT INTO menu_fts (menu_fts) VALUES ('rebuild')")
+    return True
+
+
+def query_terms(query):
+    """Split a search box string into lower-case terms safe to quote in FTS5"""
+    return QUERY_PUNCTUATION.sub(' ', query.lower()).split()
+
+
+def _match(cursor, expression, limit, exclude=()):
+    cursor.execute('SELECT COUNT(*) FROM menu_fts WHERE menu_fts MATCH ?', (expression,))
+    if cursor.fetchone()[0] > RANKED_MATCH_LIMIT:
+        order = ''
+    else:
+        order = f"ORDER BY bm25(menu_fts, {', '.join(str(weight) for weight in COLUMN_WEIGHTS)})"
+    cursor.execute(f'''
+        SELECT rowid FROM menu_fts
+        WHERE menu_fts MATCH ?
+        {order}
+        LIMIT ?
+    ''', (expression, limit + len(exclude)))
+    return [row[0] for row in cursor.fetchall() if row[0] not in exclude][:limit]
+
+
+def _match_names_first(cursor, expression, limit, exclude=()):
+    """Hits in name/name_te, then hits found only in the descriptions"""
+    ids = _match(cursor, f'{NAME_COLUMNS} : ({expression})', limit, exclude)
+    if len(ids) < limit:
+        ids += _match(cursor, expression, limit - len(ids), set(exclude) | set(ids))
+    return ids
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _closest_term(cursor, term):
+    """Nearest indexed term to a misspelt one, or None.
+
+    Only terms sharing the first character are considered (a range scan
+    on the vocabulary), allowing one edit for short words and two for
+    longer ones. A term the word merely starts with also counts, so a
+    half-typed misspelling still finds its word.
+    """
+    limit = 1 if len(term) <= 4 else 2
+    first = term[0]
+    cursor.execute('SELECT term, doc FROM menu_fts_vocab WHERE term >= ? AND term < ?',
+                   (first, chr(ord(first) + 1)))
+    best = None
+    for candidate, documents in cursor.fetchall():
+        if len(candidate) < len(term) - limit:
+            continue
+        distance = min(edit_distance(term, candidate, limit),
+                       edit_distance(term, candidate[:len(term)], limit))
+        if distance <= limit and (best is None or (distance, -documents) < best[0]):
+            best = ((distance, -documents), candidate)
+    return best[1] if best else None
+
+
+def search_menu_ids(cursor, query, limit=20):
+    """Ranked menu ids for a search box query.
+
+    1. Every term as a prefix ("chick fri"); matches in the names come
+       before matches only in the descriptions.
+    2. A single 2-6 letter term as the initials of consecutive words
+       ("cfr" -> CHICKEN FRIED RICE), ranked after the prefix hits.
+    3. Only if both find nothing: each term replaced by its closest
+       indexed spelling ("chiken" -> chicken) and matched as a prefix.
+
+    Returns None when the search index does not exist.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    try:
+        ids = _match_names_first(cursor, ' '.join(f'"{term}"*' for term in terms), limit)
+        if len(terms) == 1 and SHORT_CODE.match(terms[0]) and len(ids) < limit:
+            initials = ' + '.join(f'"{char}"*' for char in terms[0])
+            ids += _match(cursor, f'{NAME_COLUMNS} : ({initials})', limit - len(ids), exclude=set(ids))
+        if ids:
+            return ids
+
+        corrected = [_closest_term(cursor, term) for term in terms]
+        if None in corrected:
+            return []
+        return _match_names_first(cursor, ' '.join(f'"{term}"*' for term in corrected), limit)
+    except sqlite3.OperationalError as e:
+        if 'no such table' in str(e):
+            return None
+        raise
@@ -0,0 +1,264 @@
+import os
+import re
+import select
+import socket
+import sqlite3
+import threading
+import time
+
+
+def migrate_print_jobs(cursor):
+    """Create the print_jobs queue table"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS print_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            bill_number TEXT NOT NULL,
+            copy_type TEXT NOT NULL,
+            payload BLOB NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            printed_at TIMESTAMP
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_print_jobs_status ON print_jobs(status, id)')
+    # When the job was claimed (time.time()), for the spooler's lease
+    try:
+        cursor.execute('ALTER TABLE print_jobs ADD COLUMN claimed_at REAL')
+    except sqlite3.OperationalError:
+        pass  # Column already exists
+
+
+# Printers send_to_printer accepts: a raw TCP port, a local printer
+# device node, or a shared Windows printer. Plain file paths are refused.
+TCP_PRINTER = re.compile(r'tcp://(?P<host>[A-Za-z0-9][A-Za-z0-9.-]*)(?::(?P<port>\d{1,5}))?')
+DEVICE_PRINTER = re.compile(r'/dev/(?:usb/)?lp\d+')
+SHARED_PRINTER = re.compile(r'\\\\[A-Za-z0-9][A-Za-z0-9.-]*\\[A-Za-z0-9][^\\/:*?"<>|]*')
+
+
+def check_printer_device(device):
+    """Raise ValueError unless ``device`` is a printer send_to_printer may write to"""
+    match = TCP_PRINTER.fullmatch(device)
+    if match:
+        if not 0 < int(match['port'] or 9100) < 65536:
+            raise ValueError(f'Invalid printer port in {device!r}')
+    elif not (DEVICE_PRINTER.fullmatch(device) or SHARED_PRINTER.fullmatch(device)):
+        raise ValueError('Printer must be tcp://host:port, a /dev/usb/lpN or /dev/lpN device, '
+                         'or a shared printer such as \\\\localhost\\POS58')
+
+
+def send_to_printer(device, payload, timeout=10.0):
+    """Write raw bytes to the printer.
+
+    ``device`` is either ``tcp://host[:port]`` for a network printer (port
+    9100 by default), a device node such as ``/dev/usb/lp0`` or a shared
+    Windows printer (``\\\\localhost\\POS58``); anything else is refused
+    with ValueError (see check_printer_device). A printer that doesn't take
+    the whole payload within ``timeout`` seconds raises TimeoutError.
+    """
+    check_printer_device(device)
+    tcp = TCP_PRINTER.fullmatch(device)
+    if tcp:
+        # The timeout covers connecting and the whole sendall()
+        with socket.create_connection((tcp['host'], int(tcp['port'] or 9100)), timeout=timeout) as sock:
+            sock.sendall(payload)
+    elif DEVICE_PRINTER.fullmatch(device):
+        _write_device(device, payload, timeout)
+    elif os.name == 'nt':
+        _write_share(device, payload, timeout)
+    else:
+        raise OSError('Shared printers are only available on Windows')
+
+
+def _write_device(path, payload, timeout):
+    """Write to a device node without blocking for longer than ``timeout``"""
+    deadline = time.monotonic() + timeout
+    fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    try:
+        view = memoryview(payload)
+        while view:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([], [fd], [], remaining)[1]:
+                raise TimeoutError(f'Printer {path} did not take the job within {timeout}s')
+            try:
+                view = view[os.write(fd, view):]
+            except BlockingIOError:
+                continue
+    finally:
+        os.close(fd)
+
+
+def _write_share(path, payload, timeout):
+    """Write to a Windows printer share from a helper thread, giving up after ``timeout``.
+
+    Windows has no non-blocking writes to a share, so a stuck write is
+    left behind on its daemon thread and the job is retried.
+    """
+    errors = []
+
+    def write():
+        try:
+            with open(path, 'ab') as printer:
+                printer.write(payload)
+        except OSError as e:
+            errors.append(e)
+
+    writer = threading.Thread(target=write, name='printer-share-write', daemon=True)
+    writer.start()
+    writer.join(timeout)
+    if writer.is_alive():
+        raise TimeoutError(f'Printer {path} did not take the job within {timeout}s')
+    if errors:
+        raise errors[0]
+
+
+class PrintSpooler:
+    """Background thread that sends queued jobs to the printer in order.
+
+    Jobs are rows in ``print_jobs``, so copies that have not printed yet
+    survive a restart (``resume()``). The oldest pending job blocks the
+    ones behind it, which keeps copies in order; a failed write is retried
+    with exponential backoff (capped at ``max_delay``) and the job is
+    marked ``failed`` after ``max_attempts``. A job is claimed (``pending``
+    to ``printing``) before it is sent, so a second spooler on the same
+    database never prints it again. Each send gives up after
+    ``send_timeout``; a claim held longer than ``lease`` seconds (its
+    spooler hung or died) is taken back and the job printed again.
+
+    ``connect`` returns a database connection usable from the spooler
+    thread; ``get_device`` returns the configured printer (empty when
+    server-side printing is off).
+    """
+
+    def __init__(self, connect, get_device, max_attempts=10, retry_delay=2.0, max_delay=60.0, idle_wait=30.0,
+                 send_timeout=10.0, lease=60.0):
+        self.connect = connect
+        self.get_device = get_device
+        self.send_timeout = send_timeout
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.idle_wait = idle_wait
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+    def enqueue(self, conn, jobs):
+        """Queue ``(bill_number, copy_type, payload)`` jobs in one transaction and wake the spooler"""
+        conn.cursor().executemany(
+            'INSERT INTO print_jobs (bill_number, copy_type, payload) VALUES (?, ?, ?)', jobs
+        )
+        conn.commit()
+        self.start()
+        self._wake.set()
+
+    def resume(self, conn):
+        """Start the thread if jobs were left pending by a previous run.
+
+        Jobs a previous run claimed but never finished go back to pending.
+        """
+        cursor = conn.cursor()
+        cursor.execute("UPDATE print_jobs SET status = 'pending' WHERE status = 'printing'")
+        conn.commit()
+        cursor.execute("SELECT 1 FROM print_jobs WHERE status = 'pending' LIMIT 1")
+        if cursor.fetchone():
+            self.start()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='print-spooler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop after the current job; pending jobs stay queued"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping:
+            try:
+                wait = self._process_next()
+            except Exception as e:
+                print(f"Print spooler error: {e}")
+                wait = self.retry_delay
+            if wait:
+                self._wake.wait(wait)
+                self._wake.clear()
+
+    def _process_next(self):
+        """Print the oldest pending job; returns seconds to wait before trying again (0 = go on)"""
+        conn = self.connect()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, bill_number, copy_type, payload, attempts, next_attempt_at, status, claimed_at
+            FROM print_jobs WHERE status IN ('pending', 'printing')
+            ORDER BY id LIMIT 1
+        ''')
+        job = cursor.fetchone()
+        conn.commit()  # End the read so the writer isn't held up while we print
+        if job is None:
+            # Nothing to do: drop printed jobs once they are a week old
+            cursor.execute("DELETE FROM print_jobs WHERE status = 'printed' AND printed_at < datetime('now', '-7 days')")
+            conn.commit()
+            return self.idle_wait
+        job_id, bill_number, copy_type, payload, attempts, next_attempt_at, status, claimed_at = job
+        if status == 'printing':
+            if time.time() - (claimed_at or 0) < self.lease:
+                return self.retry_delay  # Another spooler is printing it; keep the order behind it
+            # The claim outlived its lease: take the job back, unless its claim changed meanwhile
+            cursor.execute('''
+                UPDATE print_jobs SET status = 'pending'
+                WHERE id = ? AND status = 'printing' AND claimed_at IS ?
+            ''', (job_id, claimed_at))
+            conn.commit()
+            print(f"Reclaimed print job {job_id} ({bill_number} {copy_type}) after its {self.lease}s lease")
+            return 0
+        if next_attempt_at > time.time():
+            return next_attempt_at - time.time()
+
+        # Claim the job; if another spooler got there first, move on
+        cursor.execute('''
+            UPDATE print_jobs SET status = 'printing', claimed_at = ? WHERE id = ? AND status = 'pending'
+        ''', (time.time(), job_id))
+        claimed = cursor.rowcount == 1
+        conn.commit()
+        if not claimed:
+            return 0
+
+        device = self.get_device()
+        try:
+            if not device:
+                raise OSError('no printer configured')
+            send_to_printer(device, payload, self.send_timeout)
+        except (OSError, ValueError) as e:
+            attempts += 1
+            failed = attempts >= self.max_attempts
+            delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_delay)
+            cursor.execute('''
+                UPDATE print_jobs SET attempts = ?, next_attempt_at = ?, last_error = ?, status = ?
+                WHERE id = ?
+            ''', (attempts, time.time() + delay, str(e), 'failed' if failed else 'pending', job_id))
+            conn.commit()
+            print(f"Printing {bill_number} ({copy_type}) failed (attempt {attempts}): {e}")
+            return 0 if failed else delay
+        except Exception:
+            # Release the claim so the job is tried again
+            cursor.execute("UPDATE print_jobs SET status = 'pending' WHERE id = ?", (job_id,))
+            conn.commit()
+            raise
+
+        cursor.execute('''
+            UPDATE print_jobs SET status = 'printed', attempts = ?, printed_at = CURRENT_TIMESTAMP, payload = X''
+            WHERE id = ?
+        ''', (attempts + 1, job_id))
+        conn.commit()
+        return 0
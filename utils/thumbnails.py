@@ -0,0 +1,171 @@
+import os
+import json
+import sqlite3
+import argparse
+import threading
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+
+DATABASE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'database', 'restaurant.db')
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'images')
+
+# Menu cards are 110-250px wide; 480 covers the widest card on 2x screens
+THUMBNAIL_WIDTHS = (160, 320, 480)
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_FORMATS = (
+    ('webp', 'webp', {'quality': 75, 'method': 4}),
+    ('jpeg', 'jpg', {'quality': 78, 'optimize': True, 'progressive': True}),
+)
+
+# One lock per image stem, so parallel downloads of the same photo render it once
+_stem_locks = {}
+_stem_locks_guard = threading.Lock()
+
+
+def _stem_lock(stem):
+    with _stem_locks_guard:
+        return _stem_locks.setdefault(stem, threading.Lock())
+
+
+def generate_thumbnails(images_dir, filename, overwrite=False):
+    """Write downscaled WebP/JPEG copies of images_dir/filename.
+
+    Returns a list of ``{'file', 'format', 'width', 'height'}`` dicts with
+    paths relative to images_dir, or an empty list when Pillow is not
+    installed or the image cannot be read (callers then keep using the
+    original file).
+
+    Thumbnails are named after the original, which the image store names
+    after its content, so when every one already exists they are reused
+    unless ``overwrite`` is set. Each file is written under a temporary
+    name and renamed into place, so readers never see a partial image.
+    """
+    if Image is None:
+        print("Pillow not installed - skipping thumbnails (pip install Pillow)")
+        return []
+
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    output_dir = os.path.join(images_dir, THUMBNAIL_DIR)
+    os.makedirs(output_dir, exist_ok=True)
+
+    variants = []
+    try:
+        with _stem_lock(stem), Image.open(os.path.join(images_dir, filename)) as source:
+            if not overwrite:
+                existing = _existing_thumbnails(source, stem, output_dir)
+                if existing:
+                    return existing
+            image = ImageOps.exif_transpose(source)
+            if image.mode != 'RGB':
+                # Flatten transparency onto white; JPEG has no alpha channel
+                rgba = image.convert('RGBA')
+                image = Image.new('RGB', rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.split()[3])
+
+            widths = [width for width in THUMBNAIL_WIDTHS if width < image.width] or [image.width]
+            for width in widths:
+                height = max(1, round(image.height * width / image.width))
+                resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+                for image_format, extension, options in THUMBNAIL_FORMATS:
+                    name = f"{stem}-{width}.{extension}"
+                    path = os.path.join(output_dir, name)
+                    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    resized.save(temp_path, image_format.upper(), **options)
+                    os.replace(temp_path, path)
+                    variants.append({
+                        'file': f"{THUMBNAIL_DIR}/{name}",
+                        'format': image_format,
+                        'width': width,
+                        'height': height
+                    })
+    except Exception as e:
+        print(f"Error generating thumbnails for {filename}: {e}")
+        return []
+
+    return variants
+
+
+def _existing_thumbnails(source, stem, output_dir):
+    """Variants for source if all of its thumbnails are already on disk, else None.
+
+    Only the image header is read (size and EXIF orientation), not the pixels.
+    """
+    width, height = source.size
+    orientation = source.getexif().get(0x0112, 1)
+    if orientation in (5, 6, 7, 8):  # Rotated 90 degrees: exif_transpose swaps the sides
+        width, height = height, width
+
+    variants = []
+    for thumb_width in [w for w in THUMBNAIL_WIDTHS if w < width] or [width]:
+        thumb_height = max(1, round(height * thumb_width / width))
+        for image_format, extension, _ in THUMBNAIL_FORMATS:
+            name = f"{stem}-{thumb_width}.{extension}"
+            if not os.path.exists(os.path.join(output_dir, name)):
+                return None
+            variants.append({
+                'file': f"{THUMBNAIL_DIR}/{name}",
+                'format': image_format,
+                'width': thumb_width,
+                'height': thumb_height
+            })
+    return variants
+
+
+def build_srcset(variants, url_prefix='/static/images/'):
+    """Group stored variants into ``{format: 'url 160w, url 320w'}`` strings"""
+    srcset = {}
+    for variant in sorted(variants, key=lambda v: v['width']):
+        srcset.setdefault(variant['format'], []).append(f"{url_prefix}{variant['file']} {variant['width']}w")
+    return {image_format: ', '.join(entries) for image_format, entries in srcset.items()}
+
+
+def backfill_thumbnails(overwrite=False):
+    """Generate thumbnails for menu images that don't have any yet"""
+    if not os.path.exists(DATABASE_PATH):
+        raise FileNotFoundError(f"Database not found at {DATABASE_PATH}")
+
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, name, image, image_variants FROM menu WHERE image IS NOT NULL')
+        updates = []
+        for item_id, name, image, image_variants in cursor.fetchall():
+            if image_variants and not overwrite:
+                continue
+            if not os.path.exists(os.path.join(IMAGES_DIR, image)):
+                print(f"[SKIP] {name} -> {image} not found")
+                continue
+            variants = generate_thumbnails(IMAGES_DIR, image, overwrite=overwrite)
+            if variants:
+                updates.append((json.dumps(variants), item_id))
+                print(f"[OK] {name} -> {len(variants)} thumbnails")
+
+        if updates:
+            cursor.executemany('UPDATE menu SET image_variants = ? WHERE id = ?', updates)
+            # Let running app processes reload the catalogue
+            cursor.execute('''
+                INSERT INTO cache_versions (name, version) VALUES ('menu', 1)
+                ON CONFLICT(name) DO UPDATE SET version = version + 1
+            ''')
+            conn.commit()
+        print(f"Completed. Updated {len(updates)} items")
+    finally:
+        conn.close()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='Generate thumbnails for menu item images')
+    parser.add_argument('--overwrite', action='store_true', help='Regenerate thumbnails that already exist')
+    args = parser.parse_args()
+
+    backfill_thumbnails(overwrite=args.overwrite)
+
+
+if __name__ == '__main__':
+
+    main()